@@ -1,6 +1,7 @@
 from django.db import models
 from django.contrib.auth.models import User
 from apps.cadastros.models import Cadastro
+from apps.cadastros.status_mapping import SincronizaStatusUnificado
 # Remove unused import
 
 
@@ -22,7 +23,7 @@ class TipoAnalise(models.TextChoices):
     COMPLETA = 'completa', 'Análise Completa'
 
 
-class AnaliseProcesso(models.Model):
+class AnaliseProcesso(SincronizaStatusUnificado, models.Model):
     """
     Modelo principal para controle da esteira de análise de cadastros.
     
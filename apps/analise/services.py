@@ -2,10 +2,36 @@
 # Count import removed as it is not used
 from django.utils import timezone
 from django.contrib.auth import get_user_model
-from datetime import timedelta
+from datetime import datetime, timedelta
+
+from django.db.models import Q
+
+from apps.cadastros.busca import condicao_busca
+from apps.common.calendario import somar_dias_uteis
 
 User = get_user_model()
 
+# Prazo da análise (SLA) em dias úteis; depois dele o processo está em atraso
+PRAZO_ANALISE_DIAS_UTEIS = 3
+
+
+def filtrar_busca(qs, termo):
+    """
+    Busca da esteira sobre AnaliseProcesso: número do processo ou associado
+    (nome, CPF/CNPJ, matrícula; ver apps.cadastros.busca).
+    """
+    from apps.cadastros.models import Cadastro
+
+    q, _ = condicao_busca(termo)
+    if q is None:
+        return qs
+    # Subconsulta em vez de junção: o OR com o id não impede os índices do cadastro
+    filtro = Q(cadastro__in=Cadastro.objects.filter(q).values("pk"))
+    termo = termo.strip()
+    if termo.isdigit():
+        filtro |= Q(id=int(termo))
+    return qs.filter(filtro)
+
 
 class KPIService:
     """Serviço para cálculo de KPIs da esteira de análise"""
@@ -27,6 +53,18 @@ class KPIService:
         data_inicio_anterior = data_fim_anterior - periodo_atual
         return data_inicio_anterior, data_fim_anterior
     
+    @staticmethod
+    def limite_atraso(referencia):
+        """
+        Processos que entraram antes deste instante estão há mais de
+        PRAZO_ANALISE_DIAS_UTEIS dias úteis na esteira em `referencia`.
+        """
+        if isinstance(referencia, datetime):
+            dia = (timezone.localtime(referencia) if timezone.is_aware(referencia) else referencia).date()
+        else:
+            dia = referencia
+        return referencia - (dia - somar_dias_uteis(dia, -PRAZO_ANALISE_DIAS_UTEIS))
+
     @classmethod
     def get_processos_pendentes(cls, data_inicio=None, data_fim=None):
         """KPI: Processos pendentes de análise"""
@@ -236,7 +274,7 @@ class KPIService:
             data_conclusao__isnull=True,
             status__in=[StatusAnalise.PENDENTE, StatusAnalise.EM_ANALISE, StatusAnalise.CORRECAO_REALIZADA]
         ).filter(
-            data_entrada__lt=timezone.now() - timedelta(days=3)  # Considera em atraso após 3 dias
+            data_entrada__lt=cls.limite_atraso(timezone.now())  # Em atraso após o prazo em dias úteis
         ).count()
         
         # Período anterior
@@ -246,7 +284,7 @@ class KPIService:
             data_conclusao__isnull=True,
             status__in=[StatusAnalise.PENDENTE, StatusAnalise.EM_ANALISE, StatusAnalise.CORRECAO_REALIZADA]
         ).filter(
-            data_entrada__lt=data_fim_ant - timedelta(days=3)
+            data_entrada__lt=cls.limite_atraso(data_fim_ant)
         ).count()
         
         variacao = cls._calcular_variacao(atual, anterior)
@@ -276,7 +314,6 @@ class KPIService:
     def get_filtered_kpis(cls, analista_id=None, agente_id=None, data_inicio=None, data_fim=None, search=None):
         """Retorna KPIs filtrados com base nos parâmetros fornecidos"""
         from .models import AnaliseProcesso, StatusAnalise
-        from django.db.models import Q
         
         # Construir queryset base com filtros
         qs = AnaliseProcesso.objects.all()
@@ -289,23 +326,7 @@ class KPIService:
             qs = qs.filter(cadastro__agente_responsavel_id=agente_id)
         
         if search:
-            search_fields = [
-                "id",
-                "cadastro__nome_completo",
-                "cadastro__cpf_cnpj",
-                "observacoes_analista",
-                "feedback_agente",
-            ]
-            search_q = Q()
-            for field in search_fields:
-                if field == "id":
-                    try:
-                        search_q |= Q(**{f"{field}__exact": int(search)})
-                    except ValueError:
-                        pass
-                else:
-                    search_q |= Q(**{f"{field}__icontains": search})
-            qs = qs.filter(search_q)
+            qs = filtrar_busca(qs, search)
         
         # Aplicar filtro de data
         if data_inicio or data_fim:
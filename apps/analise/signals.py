@@ -1,10 +1,11 @@
-from django.db.models.signals import post_save, pre_save
+from django.db.models.signals import post_save
 from django.dispatch import receiver
 # Removed unused timezone import
 from django.contrib.auth import get_user_model
 from django.db import transaction
 from apps.cadastros.models import Cadastro
 from apps.cadastros.choices import StatusCadastro
+from apps.cadastros.status_mapping import atualizar_status_unificado
 from .models import AnaliseProcesso, StatusAnalise
 from .services import devolver_para_analista_correcao_feita
 
@@ -19,43 +20,46 @@ def criar_processo_analise(sender, instance, created, **kwargs):
 
     NOVA VERSÃO: Usa transaction.on_commit() e service centralizado.
     """
-    # Cria processo apenas quando o status muda para SENT_REVIEW
-    if instance.status == StatusCadastro.SENT_REVIEW:
-        # Verifica se já existe um processo para este cadastro
-        if not hasattr(instance, 'analise_processo') or not AnaliseProcesso.objects.filter(cadastro=instance).exists():
-            # Cria o processo de análise automaticamente
-            AnaliseProcesso.objects.create(
-                cadastro=instance,
-                status=StatusAnalise.PENDENTE,
-                prioridade=2  # Normal
-            )
-
-    # CORREÇÃO: Quando cadastro é reenviado após correção
-    elif instance.status == StatusCadastro.RESUBMITTED:
-        # Usar transaction.on_commit() para garantir visibilidade após commit
-        transaction.on_commit(
-            lambda: devolver_para_analista_correcao_feita(
-                cadastro=instance,
-                ator=instance.agente_responsavel
-            )
-        )
+    aplicar_efeitos_status([instance])
 
     # REMOVIDO: A detecção automática de atualizações estava causando mudança prematura de status
     # O status só deve mudar para CORRECAO_REALIZADA quando o agente explicitamente reenviar via RESUBMITTED
 
 
-@receiver(pre_save, sender=Cadastro)
-def detectar_mudanca_status(sender, instance, **kwargs):
+def aplicar_efeitos_status(cadastros):
     """
-    Signal para detectar mudanças de status do cadastro.
-    Simplificado - a lógica principal está no post_save.
+    Efeitos do status na esteira de análise, também usado em lote pela
+    importação de planilhas (bulk_create não dispara o post_save).
     """
-    if instance.pk:  # Só para atualizações
-        try:
-            cadastro_anterior = Cadastro.objects.get(pk=instance.pk)
-            # Marcar se o status mudou para RESUBMITTED para processamento no post_save
-            if (cadastro_anterior.status != StatusCadastro.RESUBMITTED and
-                instance.status == StatusCadastro.RESUBMITTED):
-                instance._status_changed_to_resubmitted = True
-        except Cadastro.DoesNotExist:
-            pass
\ No newline at end of file
+    cadastros = list({c.pk: c for c in cadastros}.values())
+
+    # Cria processo apenas quando o status muda para SENT_REVIEW
+    enviados = [c for c in cadastros if c.status == StatusCadastro.SENT_REVIEW]
+    if enviados:
+        # Verifica se já existe um processo para estes cadastros
+        com_processo = set(
+            AnaliseProcesso.objects.filter(cadastro__in=enviados).values_list("cadastro_id", flat=True)
+        )
+        # Cria o processo de análise automaticamente
+        novos = [c for c in enviados if c.pk not in com_processo]
+        AnaliseProcesso.objects.bulk_create([
+            AnaliseProcesso(
+                cadastro=c,
+                status=StatusAnalise.PENDENTE,
+                prioridade=2  # Normal
+            )
+            for c in novos
+        ])
+        # bulk_create não passa pelo save() do processo
+        atualizar_status_unificado(novos)
+
+    # CORREÇÃO: Quando cadastro é reenviado após correção
+    for c in cadastros:
+        if c.status == StatusCadastro.RESUBMITTED:
+            # Usar transaction.on_commit() para garantir visibilidade após commit
+            transaction.on_commit(
+                lambda c=c: devolver_para_analista_correcao_feita(
+                    cadastro=c,
+                    ator=c.agente_responsavel
+                )
+            )
@@ -11,9 +11,8 @@ from django.views.decorators.http import require_http_methods
 from django.db import transaction
 # json import removed as it was unused
 
-from core.utils.model_paths import is_valid_text_path
 from .models import AnaliseProcesso, HistoricoAnalise, StatusAnalise, ChecklistAnalise
-from .services import KPIService
+from .services import KPIService, filtrar_busca
 from apps.cadastros.choices import StatusCadastro
 from apps.tesouraria.models import ProcessoTesouraria
 from apps.accounts.decorators import analista_required
@@ -51,15 +50,6 @@ STATUS_MAP = {
     ],
 }
 
-# Campos candidatos para busca textual (apenas os válidos serão aplicados)
-SEARCH_FIELDS = [
-    "id",
-    "cadastro__nome_completo",
-    "cadastro__cpf_cnpj",
-    "observacoes_analista",
-    "feedback_agente",
-]
-
 def _status_q(status_list):
     q = Q()
     # Trabalhar com os status como estão (sem conversão para maiúsculo)
@@ -74,19 +64,6 @@ def _status_q(status_list):
         q |= Q(status__icontains=s.replace("_", " "))
     return q
 
-def _apply_search(model, qs, term):
-    if not term:
-        return qs
-    q = Q()
-    for path in SEARCH_FIELDS:
-        # id não precisa ser textual
-        if path == "id" and term.isdigit():
-            q |= Q(id=int(term))
-            continue
-        if is_valid_text_path(model, path):
-            q |= Q(**{f"{path}__icontains": term})
-    return qs.filter(q)
-
 def _apply_analista(qs, analista_id):
     if not analista_id:
         return qs
@@ -142,7 +119,7 @@ def _base_queryset(request):
     data_inicio = request.GET.get("data_inicio") or ""
     data_fim = request.GET.get("data_fim") or ""
 
-    qs = _apply_search(AnaliseProcesso, qs, search)
+    qs = filtrar_busca(qs, search)
     qs = _apply_analista(qs, analista)
     qs = _apply_agente(qs, agente)
     
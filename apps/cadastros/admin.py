@@ -40,9 +40,9 @@ def export_csv(modeladmin, request, queryset):
 class CadastroAdmin(admin.ModelAdmin):
     list_display = (
         "id","nome_completo","doc","matricula_servidor",
-        "orgao_publico","status","valor_total_antecipacao","created_at"
+        "orgao_publico","status","status_atual","valor_total_antecipacao","created_at"
     )
-    list_filter = ("status","tipo_pessoa","situacao_servidor","orgao_publico","created_at")
+    list_filter = ("status","status_unificado_origem","tipo_pessoa","situacao_servidor","orgao_publico","created_at")
     search_fields = ("nome_completo","cpf","cnpj","matricula_servidor","orgao_publico")
     date_hierarchy = "created_at"
     inlines = [ParcelaInline, DocumentoInline]
@@ -51,14 +51,24 @@ class CadastroAdmin(admin.ModelAdmin):
     autocomplete_fields = ()  # habilite se usar ForeignKeys longas (ex.: agente_responsavel)
     readonly_fields = (
         "trinta_porcento_bruto","margem_liquido_menos_30_bruto",
-        "valor_total_antecipacao","doacao_associado","disponivel"
+        "valor_total_antecipacao","doacao_associado","disponivel",
+        "status_unificado","status_unificado_origem","status_unificado_data"
     )
 
+    def get_queryset(self, request):
+        return super().get_queryset(request).with_unified_status()
+
     def doc(self, obj: Cadastro):
         return obj.cpf or obj.cnpj or "—"
     doc.short_description = "CPF/CNPJ"
 
+    def status_atual(self, obj: Cadastro):
+        return obj.get_current_status_display()
+    status_atual.short_description = "Status atual"
+    status_atual.admin_order_field = "status_atual"
+
 @admin.register(ParcelaAntecipacao)
 class ParcelaAntecipacaoAdmin(admin.ModelAdmin):
     list_display = ['cadastro', 'numero', 'valor', 'vencimento', 'status']
+    list_select_related = ['cadastro']
     list_filter = ['status', 'numero']
\ No newline at end of file
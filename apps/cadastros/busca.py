@@ -0,0 +1,128 @@
+"""
+Busca de associados compartilhada pelas listagens (cadastros, análise,
+tesouraria).
+
+O termo digitado é classificado antes de virar filtro:
+
+- documento: só dígitos e pontuação de CPF/CNPJ. Busca por prefixo do CPF,
+  do CNPJ e da matrícula (btree varchar_pattern_ops, que o Django cria para
+  os campos com db_index);
+- matrícula: uma palavra só, com algum dígito. Prefixo da matrícula;
+- nome: o resto. Sem acento e sem caixa, cada palavra precisa aparecer no
+  nome, ou o termo precisa ser parecido com alguma parte do nome (similaridade
+  de trigramas, tolera erro de digitação). Usa o índice GIN de trigramas
+  sobre f_unaccent(lower(nome_completo)).
+
+O resultado vem anotado com `relevancia` (maior é melhor) para ordenação.
+"""
+import re
+import unicodedata
+
+from django.contrib.postgres.lookups import TrigramWordSimilar
+from django.contrib.postgres.search import TrigramWordSimilarity
+from django.db import models
+from django.db.models import Case, F, Q, Value, When
+from django.db.models.functions import Lower
+from django.db.models.lookups import Contains
+
+DOCUMENTO = "documento"
+MATRICULA = "matricula"
+NOME = "nome"
+
+# Menos dígitos que isso não identifica documento (casaria meia base)
+MIN_DIGITOS = 3
+
+# Palavras do nome menores que isso só entram se não houver outras
+MIN_PALAVRA = 3
+
+_DOCUMENTO_RE = re.compile(r"^[\d.\-/\s]+$")
+
+
+class FUnaccent(models.Func):
+    """
+    f_unaccent(texto): unaccent() com o dicionário fixo, declarada IMMUTABLE
+    (migração cadastros 0013) para poder entrar em índice de expressão.
+    """
+    function = "f_unaccent"
+    output_field = models.TextField()
+
+
+def nome_normalizado(expressao):
+    """Expressão indexada do nome: sem acento e em minúsculas."""
+    return FUnaccent(Lower(expressao))
+
+
+def normalizar_texto(texto):
+    """O termo como nome_normalizado() o deixaria: sem acento, minúsculo."""
+    texto = unicodedata.normalize("NFKD", texto)
+    texto = "".join(c for c in texto if not unicodedata.combining(c))
+    return " ".join(texto.lower().split())
+
+
+def tipo_da_busca(termo):
+    """
+    (tipo, valor) do termo: (DOCUMENTO, dígitos), (MATRICULA, termo sem
+    espaços nas pontas), (NOME, termo normalizado) ou (None, "") se não há
+    o que buscar.
+    """
+    termo = (termo or "").strip()
+    digitos = re.sub(r"\D", "", termo)
+    if _DOCUMENTO_RE.match(termo) and len(digitos) >= MIN_DIGITOS:
+        return DOCUMENTO, digitos
+    if " " not in termo and digitos:
+        return MATRICULA, termo
+    nome = normalizar_texto(termo)
+    return (NOME, nome) if nome else (None, "")
+
+
+def condicao_busca(termo, prefixo=""):
+    """
+    (Q, relevancia) da busca de `termo` em Cadastro. `prefixo` é o caminho
+    até o cadastro a partir do modelo filtrado ("cadastro__" para processos).
+    Sem termo, devolve (None, None).
+    """
+    tipo, valor = tipo_da_busca(termo)
+    if tipo is None:
+        return None, None
+
+    if tipo == DOCUMENTO:
+        q = (
+            Q(**{f"{prefixo}cpf__startswith": valor})
+            | Q(**{f"{prefixo}cnpj__startswith": valor})
+            | Q(**{f"{prefixo}matricula_servidor__startswith": valor})
+        )
+        exato = (
+            Q(**{f"{prefixo}cpf": valor})
+            | Q(**{f"{prefixo}cnpj": valor})
+            | Q(**{f"{prefixo}matricula_servidor": valor})
+        )
+        relevancia = Case(When(exato, then=Value(1.0)), default=Value(0.5))
+    elif tipo == MATRICULA:
+        q = Q(**{f"{prefixo}matricula_servidor__startswith": valor})
+        if valor.upper() != valor:
+            q |= Q(**{f"{prefixo}matricula_servidor__startswith": valor.upper()})
+        relevancia = Case(
+            When(Q(**{f"{prefixo}matricula_servidor__iexact": valor}), then=Value(1.0)),
+            default=Value(0.5),
+        )
+    else:
+        nome = nome_normalizado(F(f"{prefixo}nome_completo"))
+        # Palavras curtas ("da", "de") não têm trigrama para o índice
+        palavras = [p for p in valor.split() if len(p) >= MIN_PALAVRA] or valor.split()
+        todas_as_palavras = Q()
+        for palavra in palavras:
+            todas_as_palavras &= Q(Contains(nome, palavra))
+        q = todas_as_palavras | Q(TrigramWordSimilar(nome, valor))
+        relevancia = TrigramWordSimilarity(Value(valor), nome)
+    return q, relevancia
+
+
+def buscar_cadastros(qs, termo, prefixo=""):
+    """
+    Filtra `qs` pelos cadastros que casam com `termo` (ver condicao_busca) e
+    anota `relevancia`. Sem termo, devolve `qs` como está.
+    """
+    q, relevancia = condicao_busca(termo, prefixo)
+    if q is None:
+        return qs
+    return qs.filter(q).annotate(relevancia=relevancia)
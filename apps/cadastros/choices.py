@@ -45,6 +45,12 @@ class StatusParcela(models.TextChoices):
     PENDENTE = "PENDENTE", "Pendente"
     LIQUIDADA = "LIQUIDADA", "Liquidada"
 
+class OrigemStatus(models.TextChoices):
+    """Módulo de onde vem o status unificado do cadastro"""
+    TESOURARIA = "tesouraria", "Tesouraria"
+    ANALISE = "analise", "Análise"
+    CADASTRO = "cadastro", "Cadastro"
+
 ESTADO_CHOICES = [
     ('AC', 'Acre'),
     ('AL', 'Alagoas'),
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-17 21:13
+
+from django.db import migrations, models
+from django.db.models.functions import TruncMonth
+
+
+def preencher_competencia(apps, schema_editor):
+    ParcelaAntecipacao = apps.get_model("cadastros", "ParcelaAntecipacao")
+    ParcelaAntecipacao.objects.filter(vencimento__isnull=False).update(competencia=TruncMonth("vencimento"))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cadastros', '0010_cadastro_tipo_chave_pix_alter_cadastro_chave_pix'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='parcelaantecipacao',
+            name='competencia',
+            field=models.DateField(blank=True, editable=False, null=True, verbose_name='Competência'),
+        ),
+        migrations.RunPython(preencher_competencia, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='parcelaantecipacao',
+            index=models.Index(fields=['competencia', 'cadastro'], name='cadastros_parcela_comp_idx'),
+        ),
+    ]
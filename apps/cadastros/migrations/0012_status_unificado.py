@@ -0,0 +1,57 @@
+# Generated by Django 5.2.18 on 2026-10-17 22:00
+
+from django.db import migrations, models
+from django.db.models import Case, Exists, F, OuterRef, Subquery, Value, When
+from django.db.models.functions import Coalesce
+
+
+def preencher_status_unificado(apps, schema_editor):
+    Cadastro = apps.get_model("cadastros", "Cadastro")
+    AnaliseProcesso = apps.get_model("analise", "AnaliseProcesso")
+    ProcessoTesouraria = apps.get_model("tesouraria", "ProcessoTesouraria")
+    tesouraria = ProcessoTesouraria.objects.filter(cadastro=OuterRef("pk")).order_by()
+    analise = AnaliseProcesso.objects.filter(cadastro=OuterRef("pk")).order_by()
+    Cadastro.objects.update(
+        status_unificado=Coalesce(
+            Subquery(tesouraria.values("status")[:1]),
+            Subquery(analise.values("status")[:1]),
+            F("status"),
+        ),
+        status_unificado_origem=Case(
+            When(Exists(tesouraria), then=Value("tesouraria")),
+            When(Exists(analise), then=Value("analise")),
+            default=Value("cadastro"),
+        ),
+        status_unificado_data=Coalesce(
+            Subquery(tesouraria.values("data_entrada")[:1]),
+            Subquery(analise.values("data_entrada")[:1]),
+        ),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cadastros', '0011_parcelaantecipacao_competencia'),
+        ('analise', '0005_alter_analiseprocesso_status_and_more'),
+        ('tesouraria', '0011_alter_processotesouraria_status'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cadastro',
+            name='status_unificado',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=32),
+        ),
+        migrations.AddField(
+            model_name='cadastro',
+            name='status_unificado_data',
+            field=models.DateTimeField(blank=True, db_index=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='cadastro',
+            name='status_unificado_origem',
+            field=models.CharField(choices=[('tesouraria', 'Tesouraria'), ('analise', 'Análise'), ('cadastro', 'Cadastro')], default='cadastro', editable=False, max_length=12),
+        ),
+        migrations.RunPython(preencher_status_unificado, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.2.18 on 2026-10-17 22:10
+
+import apps.cadastros.busca
+import django.contrib.postgres.indexes
+import django.contrib.postgres.operations
+import django.db.models.functions.text
+from django.conf import settings
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cadastros', '0012_status_unificado'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        django.contrib.postgres.operations.TrigramExtension(),
+        django.contrib.postgres.operations.UnaccentExtension(),
+        # unaccent() é STABLE (o dicionário pode mudar) e não entra em índice;
+        # com o dicionário fixado, a função é declarada IMMUTABLE
+        migrations.RunSQL(
+            sql="""
+                CREATE OR REPLACE FUNCTION f_unaccent(text) RETURNS text
+                LANGUAGE sql IMMUTABLE PARALLEL SAFE STRICT
+                AS $$ SELECT public.unaccent('public.unaccent'::regdictionary, $1) $$
+            """,
+            reverse_sql="DROP FUNCTION IF EXISTS f_unaccent(text)",
+        ),
+        migrations.AddIndex(
+            model_name='cadastro',
+            index=django.contrib.postgres.indexes.GinIndex(django.contrib.postgres.indexes.OpClass(apps.cadastros.busca.FUnaccent(django.db.models.functions.text.Lower('nome_completo')), name='gin_trgm_ops'), name='cadastros_nome_trgm_idx'),
+        ),
+    ]
@@ -0,0 +1,24 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cadastros', '0013_busca_trigramas'),
+    ]
+
+    operations = [
+        # Antes do auto_now, bulk_create, bulk_update, .update() e admin
+        # gravavam parcelas sem a marca (ou deixavam uma antiga): todas recebem
+        # a data da migração e a próxima reconciliação incremental reprocessa
+        # todos os CPFs com parcelas, como uma varredura completa.
+        migrations.RunSQL(
+            "UPDATE cadastros_parcelaantecipacao SET atualizado_em = now()",
+            migrations.RunSQL.noop,
+        ),
+        migrations.AlterField(
+            model_name='parcelaantecipacao',
+            name='atualizado_em',
+            field=models.DateTimeField(auto_now=True, db_index=True),
+        ),
+    ]
@@ -1,40 +1,61 @@
+from django.contrib.postgres.indexes import GinIndex, OpClass
 from django.db import models
+from django.db.models.functions import Coalesce
 from django.contrib.auth import get_user_model
 from django.core.validators import MinValueValidator, MaxValueValidator
 from decimal import Decimal
-from datetime import date, timedelta
 from .choices import (
     StatusCadastro, TipoPessoa, EstadoCivil, TipoConta,
-    SituacaoServidor, StatusParcela, TipoChavePix
+    SituacaoServidor, StatusParcela, TipoChavePix, OrigemStatus
 )
+from apps.common.calendario import dia_util_do_mes
+from apps.common.models import RastreiaAlteracoes
+from .busca import nome_normalizado
+from .status_mapping import rotulo_status
 
 def calcular_quinto_dia_util(ano, mes):
     """
     Calcula o 5º dia útil de um mês específico.
-    Considera segunda a sexta como dias úteis.
+    Dias úteis e feriados vêm do calendário de apps.common.calendario.
     """
-    primeiro_dia = date(ano, mes, 1)
-    dias_uteis_encontrados = 0
-    data_atual = primeiro_dia
-    
-    while dias_uteis_encontrados < 5:
-        # Segunda = 0, Domingo = 6
-        if data_atual.weekday() < 5:  # Segunda a sexta
-            dias_uteis_encontrados += 1
-            if dias_uteis_encontrados == 5:
-                return data_atual
-        data_atual += timedelta(days=1)
-    
-    return data_atual
+    return dia_util_do_mes(ano, mes, 5)
+
+def vencimento_parcela(data_base, numero):
+    """
+    Vencimento da parcela `numero` a partir da data da primeira contribuição:
+    a 1ª vence na própria data; as seguintes, no 5º dia útil dos meses
+    seguintes.
+    """
+    if numero == 1:
+        return data_base
+    meses = data_base.year * 12 + data_base.month - 1 + (numero - 1)
+    return calcular_quinto_dia_util(meses // 12, meses % 12 + 1)
 
 User = get_user_model()
 
-class Cadastro(models.Model):
+class CadastroQuerySet(models.QuerySet):
+    def with_unified_status(self):
+        """
+        Anota status_atual, status_atual_origem e status_atual_data a partir
+        das colunas desnormalizadas (sem consultar análise e tesouraria), para
+        filtrar e ordenar listas pelo status unificado.
+        """
+        return self.annotate(
+            status_atual=models.F("status_unificado"),
+            status_atual_origem=models.F("status_unificado_origem"),
+            status_atual_data=Coalesce("status_unificado_data", "created_at"),
+        )
+
+class Cadastro(RastreiaAlteracoes, models.Model):
     """
     Cadastro do associado (sem campos de observação).
-    Cálculos automáticos são atualizados ao salvar.
+    Cálculos automáticos são atualizados ao salvar; save() grava só os campos
+    alterados desde a carga (RastreiaAlteracoes).
     """
 
+    # Sem campos mutáveis (JSON/array); poupa reescrever a linha inteira
+    salvar_so_alterados = True
+
     # ---- Dados cadastrais ----
     tipo_pessoa          = models.CharField(max_length=2, choices=TipoPessoa.choices, default=TipoPessoa.PF)
     cpf                  = models.CharField("CPF", max_length=11, blank=True, db_index=True)   # PF
@@ -101,12 +122,20 @@ class Cadastro(models.Model):
     status                 = models.CharField(max_length=32, choices=StatusCadastro.choices, db_index=True, default=StatusCadastro.DRAFT)
     cadastro_anterior      = models.ForeignKey("self", null=True, blank=True, on_delete=models.SET_NULL, related_name="renovacoes")
 
+    # Status unificado (Tesouraria > Análise > Cadastro), desnormalizado: mantido
+    # pelo save() e pelos processos de análise/tesouraria (status_mapping)
+    status_unificado        = models.CharField(max_length=32, blank=True, db_index=True, editable=False)
+    status_unificado_origem = models.CharField(max_length=12, choices=OrigemStatus.choices, default=OrigemStatus.CADASTRO, editable=False)
+    status_unificado_data   = models.DateTimeField(null=True, blank=True, db_index=True, editable=False)
+
     # ---- Timestamps ----
     created_at             = models.DateTimeField(auto_now_add=True)
     updated_at             = models.DateTimeField(auto_now=True)
     approved_at            = models.DateTimeField(null=True, blank=True)
     paid_at                = models.DateTimeField(null=True, blank=True)
 
+    objects = CadastroQuerySet.as_manager()
+
     class Meta:
         ordering = ["-created_at"]
         indexes = [
@@ -115,6 +144,11 @@ class Cadastro(models.Model):
             models.Index(fields=["matricula_servidor"]),
             models.Index(fields=["status"]),
             models.Index(fields=["created_at"]),
+            # Busca por nome (apps.cadastros.busca): trigramas do nome sem acento
+            GinIndex(
+                OpClass(nome_normalizado("nome_completo"), name="gin_trgm_ops"),
+                name="cadastros_nome_trgm_idx",
+            ),
         ]
 
     # ---- Cálculos automáticos ----
@@ -132,23 +166,54 @@ class Cadastro(models.Model):
         self.auxilio_agente_taxa_percent = Decimal("10.00")  # sempre 10%
         self.auxilio_agente_valor = (self.disponivel * Decimal("0.10")).quantize(Decimal("0.01"))
 
+    def sincronizar_status_unificado(self, update_fields=None):
+        """
+        Sem processo de análise ou tesouraria (origem CADASTRO) o status
+        unificado é o próprio status do cadastro; com processo, quem mantém as
+        colunas é o save() dos processos (SincronizaStatusUnificado) e o signal
+        de exclusão. Cadastro novo ainda não tem processo. Em cadastro já
+        gravado cuja mudança de status vai ser gravada, a origem é conferida no
+        próprio UPDATE (a instância pode estar desatualizada), sem consulta a
+        mais. Retorna os campos a acrescentar ao update_fields.
+        """
+        if self._state.adding:
+            self.status_unificado_origem = OrigemStatus.CADASTRO
+            self.status_unificado, self.status_unificado_data = self.status, None
+            return set()
+        if update_fields is not None and "status" not in update_fields:
+            return set()
+        if self.status == self.previous("status"):
+            return set()
+        self.status_unificado = models.Case(
+            models.When(status_unificado_origem=OrigemStatus.CADASTRO, then=models.Value(self.status)),
+            default=models.F("status_unificado"),
+            output_field=models.CharField(),
+        )
+        return {"status_unificado"}
+
     def save(self, *args, **kwargs):
         self.recalc()
+        update_fields = kwargs.get("update_fields")
+        campos_status = self.sincronizar_status_unificado(update_fields)
+        if update_fields is not None and campos_status:
+            kwargs["update_fields"] = {*update_fields, *campos_status}
+        anterior = self.previous("status_unificado")
         super().save(*args, **kwargs)
+        if isinstance(self.status_unificado, models.Expression):
+            # Na instância, o valor que o CASE gravou se a origem em memória vale
+            if self.status_unificado_origem == OrigemStatus.CADASTRO:
+                self.status_unificado = self.status
+            else:
+                self.status_unificado = anterior
+            self._guardar_valores(["status_unificado"])
 
     def atualizar_vencimento_parcelas(self):
         """
         Atualiza as datas de vencimento das parcelas existentes.
         Usado quando o cadastro é editado e a data_primeira_mensalidade é preenchida.
         """
-        if not self.data_primeira_mensalidade:
-            return
-
-        parcelas = self.parcelas.all()
-        for parcela in parcelas:
-            # Força recálculo do vencimento zerando o campo atual
-            parcela.vencimento = None
-            parcela.save()  # Dispara o cálculo automático no save() da parcela
+        from .parcelas import regerar_vencimentos
+        regerar_vencimentos([self])
 
     @property
     def cpf_cnpj(self):
@@ -158,40 +223,17 @@ class Cadastro(models.Model):
     def get_current_status(self):
         """
         Retorna o status atual unificado do processo.
-        Prioridade: Tesouraria > Análise > Cadastro
+        Prioridade: Tesouraria > Análise > Cadastro. Lido das colunas
+        status_unificado*, sem consultar os processos.
         """
-        # 1. Verificar se existe processo na tesouraria (maior prioridade)
-        if hasattr(self, 'processo_tesouraria'):
-            try:
-                processo_tesouraria = self.processo_tesouraria
-                return {
-                    'status': processo_tesouraria.status,
-                    'display': processo_tesouraria.get_status_display(),
-                    'source': 'tesouraria',
-                    'date': processo_tesouraria.data_entrada
-                }
-            except:
-                pass
-
-        # 2. Verificar se existe processo na análise
-        if hasattr(self, 'analise_processo'):
-            try:
-                analise_processo = self.analise_processo
-                return {
-                    'status': analise_processo.status,
-                    'display': analise_processo.get_status_display(),
-                    'source': 'analise',
-                    'date': analise_processo.data_entrada
-                }
-            except:
-                pass
-
-        # 3. Fallback para status do cadastro
+        origem = self.status_unificado_origem
+        # Sem processo vale o status em memória (pode ainda não ter sido salvo)
+        status = self.status if origem == OrigemStatus.CADASTRO else self.status_unificado
         return {
-            'status': self.status,
-            'display': self.get_status_display(),
-            'source': 'cadastro',
-            'date': self.created_at
+            'status': status,
+            'display': rotulo_status(origem, status),
+            'source': origem,
+            'date': self.status_unificado_data or self.created_at
         }
 
     def get_current_status_display(self):
@@ -242,34 +284,33 @@ class ParcelaAntecipacao(models.Model):
     vencimento = models.DateField("Vencimento", null=True, blank=True)
     status     = models.CharField("Status", max_length=12, choices=StatusParcela.choices, default=StatusParcela.PENDENTE)
     status_origem_txt = models.CharField(max_length=200, blank=True, default="")
-    atualizado_em = models.DateTimeField(null=True, blank=True)
+    # Marca de alteração lida pela reconciliação incremental (tesouraria):
+    # auto_now cobre save() e bulk_create; .update() e bulk_update gravam-na
+    # explicitamente.
+    atualizado_em = models.DateTimeField(auto_now=True, db_index=True)
+    # Primeiro dia do mês do vencimento, mantido pelo save(); permite filtrar
+    # por competência com índice em vez de vencimento__year/__month.
+    competencia = models.DateField("Competência", null=True, blank=True, editable=False)
 
 
     class Meta:
         unique_together = ("cadastro","numero")
         ordering = ["numero"]
+        indexes = [
+            models.Index(fields=["competencia", "cadastro"], name="cadastros_parcela_comp_idx"),
+        ]
         verbose_name = "Mensalidade"
         verbose_name_plural = "Mensalidades"
     
     def save(self, *args, **kwargs):
         # Calcula automaticamente o vencimento se não foi definido
         if not self.vencimento and self.cadastro.data_primeira_mensalidade:
-            data_base = self.cadastro.data_primeira_mensalidade
-
-            if self.numero == 1:
-                # A primeira parcela vence na data escolhida pelo usuário
-                self.vencimento = data_base
-            else:
-                # Para 2ª e 3ª parcelas, calcula o 5º dia útil dos meses seguintes
-                mes_vencimento = data_base.month + (self.numero - 1)
-                ano_vencimento = data_base.year
+            self.vencimento = vencimento_parcela(self.cadastro.data_primeira_mensalidade, self.numero)
 
-                # Ajusta ano se o mês passou de 12
-                while mes_vencimento > 12:
-                    mes_vencimento -= 12
-                    ano_vencimento += 1
-
-                self.vencimento = calcular_quinto_dia_util(ano_vencimento, mes_vencimento)
+        self.competencia = self.vencimento.replace(day=1) if self.vencimento else None
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None and "vencimento" in update_fields:
+            kwargs["update_fields"] = {*update_fields, "competencia"}
 
         super().save(*args, **kwargs)
     
@@ -281,22 +322,8 @@ class ParcelaAntecipacao(models.Model):
         """
         Cria automaticamente as 3 mensalidades para um cadastro.
         """
+        from .parcelas import criar_parcelas
+
         if not cadastro.data_primeira_mensalidade:
             return []
-        
-        parcelas_criadas = []
-        valor_parcela = cadastro.valor_total_antecipacao / 3 if cadastro.valor_total_antecipacao else Decimal('0.00')
-        
-        for numero in range(1, 4):  # 1, 2, 3
-            parcela, created = cls.objects.get_or_create(
-                cadastro=cadastro,
-                numero=numero,
-                defaults={
-                    'valor': valor_parcela,
-                    'status': StatusParcela.PENDENTE
-                }
-            )
-            if created:
-                parcelas_criadas.append(parcela)
-        
-        return parcelas_criadas
\ No newline at end of file
+        return criar_parcelas([cadastro])
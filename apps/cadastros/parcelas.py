@@ -0,0 +1,117 @@
+"""
+Agendamento das parcelas de antecipação (ParcelaAntecipacao) em lote.
+
+Os vencimentos são calculados em memória (vencimento_parcela, sobre o
+calendário de dias úteis) e gravados de uma vez (INSERT em lote e bulk_update):
+criar ou regerar as parcelas de N cadastros custa um número fixo de
+consultas, sem o save() de cada parcela (que relê o cadastro).
+"""
+from decimal import Decimal
+
+from django.db import connection
+from django.utils import timezone
+
+from .choices import StatusParcela
+from .models import ParcelaAntecipacao, vencimento_parcela
+
+NUMERO_PARCELAS = 3
+
+# Tamanho dos blocos de bulk_create/bulk_update
+BATCH_SIZE = 2000
+
+
+def valor_padrao(cadastro):
+    """Valor de cada parcela: um terço do total da antecipação."""
+    total = cadastro.valor_total_antecipacao
+    return total / NUMERO_PARCELAS if total else Decimal("0.00")
+
+
+def _agendar(parcela, data_base):
+    """Vencimento e competência da parcela (vazios sem data base)."""
+    parcela.vencimento = vencimento_parcela(data_base, parcela.numero) if data_base else None
+    parcela.competencia = parcela.vencimento.replace(day=1) if parcela.vencimento else None
+
+
+def _inserir_ignorando_conflitos(parcelas):
+    """
+    INSERT ... ON CONFLICT (cadastro_id, numero) DO NOTHING RETURNING id, em
+    blocos. O bulk_create com ignore_conflicts não diz quais linhas entraram;
+    aqui voltam só os ids das inseridas.
+    """
+    opts = ParcelaAntecipacao._meta
+    campos = [f for f in opts.concrete_fields if not f.primary_key]
+    agora = timezone.now()
+    ids = []
+    with connection.cursor() as cur:
+        for inicio in range(0, len(parcelas), BATCH_SIZE):
+            bloco = parcelas[inicio:inicio + BATCH_SIZE]
+            params = []
+            for parcela in bloco:
+                parcela.atualizado_em = agora
+                params.extend(f.get_db_prep_save(getattr(parcela, f.attname), connection) for f in campos)
+            linha = f"({', '.join(['%s'] * len(campos))})"
+            cur.execute(
+                f"INSERT INTO {opts.db_table} ({', '.join(f.column for f in campos)}) "
+                f"VALUES {', '.join([linha] * len(bloco))} "
+                "ON CONFLICT (cadastro_id, numero) DO NOTHING RETURNING id",
+                params,
+            )
+            ids.extend(pk for pk, in cur.fetchall())
+    return ids
+
+
+def criar_parcelas(cadastros, valor=valor_padrao):
+    """
+    Cria, pendentes, as parcelas 1 a NUMERO_PARCELAS que faltam aos cadastros
+    (já salvos), com o valor `valor(cadastro)` e o vencimento a partir de
+    data_primeira_mensalidade. Parcelas existentes não são alteradas (também
+    sob concorrência: ON CONFLICT DO NOTHING na chave única (cadastro, numero)).
+    Retorna as parcelas criadas: as linhas cujo id o INSERT devolveu
+    (RETURNING), relidas do banco.
+    """
+    cadastros = list({c.pk: c for c in cadastros}.values())
+    existentes = set(
+        ParcelaAntecipacao.objects.filter(cadastro__in=cadastros).values_list("cadastro_id", "numero")
+    )
+    novas = []
+    for cadastro in cadastros:
+        valor_parcela = valor(cadastro)
+        for numero in range(1, NUMERO_PARCELAS + 1):
+            if (cadastro.pk, numero) in existentes:
+                continue
+            parcela = ParcelaAntecipacao(
+                cadastro=cadastro, numero=numero, valor=valor_parcela, status=StatusParcela.PENDENTE,
+            )
+            _agendar(parcela, cadastro.data_primeira_mensalidade)
+            novas.append(parcela)
+    if not novas:
+        return []
+    ids = _inserir_ignorando_conflitos(novas)
+    return list(ParcelaAntecipacao.objects.filter(pk__in=ids).order_by("cadastro_id", "numero"))
+
+
+def regerar_vencimentos(cadastros):
+    """
+    Recalcula vencimento e competência das parcelas dos cadastros a partir
+    de data_primeira_mensalidade (cadastros sem a data ficam como estão) e
+    grava, num bulk_update, só as parcelas que mudaram (com atualizado_em,
+    que o bulk_update não preenche sozinho). Retorna quantas.
+    """
+    datas = {c.pk: c.data_primeira_mensalidade for c in cadastros if c.data_primeira_mensalidade}
+    if not datas:
+        return 0
+    agora = timezone.now()
+    alteradas = []
+    parcelas = ParcelaAntecipacao.objects.filter(cadastro_id__in=datas).only(
+        "id", "cadastro_id", "numero", "vencimento", "competencia"
+    )
+    for parcela in parcelas:
+        anterior = (parcela.vencimento, parcela.competencia)
+        _agendar(parcela, datas[parcela.cadastro_id])
+        if (parcela.vencimento, parcela.competencia) != anterior:
+            parcela.atualizado_em = agora
+            alteradas.append(parcela)
+    ParcelaAntecipacao.objects.bulk_update(
+        alteradas, ["vencimento", "competencia", "atualizado_em"], batch_size=BATCH_SIZE
+    )
+    return len(alteradas)
@@ -1,8 +1,10 @@
-from django.db.models.signals import pre_save
+from django.db.models.signals import post_delete, pre_save
 from django.dispatch import receiver
 from django.contrib.auth import get_user_model
+from django.db import transaction
 from .models import Cadastro
 from .choices import StatusCadastro
+from .status_mapping import atualizar_status_unificado
 from apps.notificacoes.service import notify
 
 User = get_user_model()
@@ -14,24 +16,48 @@ def _emails_grupo(nome_grupo):
 @receiver(pre_save, sender=Cadastro)
 def on_cadastro_status_change(sender, instance: Cadastro, **kwargs):
     """Signal disparado quando o status de um cadastro muda."""
-    if not instance.pk:
+    if instance._state.adding:
         return  # novo cadastro, deixa criar
-    
-    try:
-        old = Cadastro.objects.get(pk=instance.pk)
-    except Cadastro.DoesNotExist:
-        return
-    
-    if old.status == instance.status:
+
+    if instance.previous("status") == instance.status:
         return  # status não mudou
 
+    # Após o commit: não notifica mudança desfeita por rollback
+    transaction.on_commit(lambda: notificar_mudanca_status(instance))
+
+
+@receiver(post_delete, sender="analise.AnaliseProcesso")
+@receiver(post_delete, sender="tesouraria.ProcessoTesouraria")
+def on_processo_removido(sender, instance, **kwargs):
+    """Sem o processo, o status unificado volta a vir do módulo anterior."""
+    atualizar_status_unificado([instance.cadastro_id])
+
+
+def notificar_mudancas_status(cadastros):
+    """
+    Versão em lote (importação de planilhas): recebe cadastros cujo status já
+    mudou e consulta os e-mails de cada grupo uma única vez.
+    """
+    emails_grupo = {}
+
+    def _emails_grupo_cache(nome_grupo):
+        if nome_grupo not in emails_grupo:
+            emails_grupo[nome_grupo] = _emails_grupo(nome_grupo)
+        return emails_grupo[nome_grupo]
+
+    for cadastro in cadastros:
+        notificar_mudanca_status(cadastro, emails_grupo=_emails_grupo_cache)
+
+
+def notificar_mudanca_status(instance: Cadastro, emails_grupo=_emails_grupo):
+    """Notificações do novo status de um cadastro (o status já foi alterado)."""
     # Agente responsável:
     agente_email = getattr(instance.agente_responsavel, "email", None)
 
     # Dispara mensagens neutras baseadas no novo status
     if instance.status == StatusCadastro.SENT_REVIEW:
         notify(
-            to_emails=[agente_email] + _emails_grupo("ANALISTA"),
+            to_emails=[agente_email] + emails_grupo("ANALISTA"),
             subject="ABASE • Cadastro enviado para avaliação",
             body=f"O cadastro #{instance.id} foi enviado para avaliação."
         )
@@ -43,7 +69,7 @@ def on_cadastro_status_change(sender, instance: Cadastro, **kwargs):
         )
     elif instance.status == StatusCadastro.APPROVED_REVIEW:
         notify(
-            to_emails=[agente_email] + _emails_grupo("TESOURARIA"),
+            to_emails=[agente_email] + emails_grupo("TESOURARIA"),
             subject="ABASE • Cadastro aprovado para efetivação",
             body=f"O cadastro #{instance.id} foi aprovado. Prosseguir com a efetivação na associação."
         )
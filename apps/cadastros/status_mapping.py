@@ -7,7 +7,14 @@ Este arquivo centraliza a lógica de conversão de status entre:
 - Tesouraria (tesouraria.StatusProcessoTesouraria)
 """
 
-from .choices import StatusCadastro
+from django.db import transaction
+from django.db.models import Case, Exists, F, OuterRef, Subquery, Value, When
+from django.db.models.functions import Coalesce
+
+from .choices import OrigemStatus, StatusCadastro
+
+# Colunas desnormalizadas de Cadastro com o status unificado
+CAMPOS_STATUS_UNIFICADO = ('status_unificado', 'status_unificado_origem', 'status_unificado_data')
 
 # Mapeamento: Status da Tesouraria -> Status do Cadastro
 TESOURARIA_TO_CADASTRO = {
@@ -79,6 +86,86 @@ def sync_cadastro_status(cadastro):
             cadastro.status = new_status
             cadastro.save(update_fields=['status'])
 
+def expressoes_status_unificado():
+    """
+    Expressões SQL do status unificado de Cadastro (Tesouraria > Análise >
+    Cadastro), uma por coluna de CAMPOS_STATUS_UNIFICADO, para .update() ou
+    .annotate(). A data é a de entrada do processo; sem processo fica nula.
+    """
+    from apps.analise.models import AnaliseProcesso
+    from apps.tesouraria.models import ProcessoTesouraria
+
+    tesouraria = ProcessoTesouraria.objects.filter(cadastro=OuterRef('pk')).order_by()
+    analise = AnaliseProcesso.objects.filter(cadastro=OuterRef('pk')).order_by()
+    return {
+        'status_unificado': Coalesce(
+            Subquery(tesouraria.values('status')[:1]),
+            Subquery(analise.values('status')[:1]),
+            F('status'),
+        ),
+        'status_unificado_origem': Case(
+            When(Exists(tesouraria), then=Value(OrigemStatus.TESOURARIA)),
+            When(Exists(analise), then=Value(OrigemStatus.ANALISE)),
+            default=Value(OrigemStatus.CADASTRO),
+        ),
+        'status_unificado_data': Coalesce(
+            Subquery(tesouraria.values('data_entrada')[:1]),
+            Subquery(analise.values('data_entrada')[:1]),
+        ),
+    }
+
+
+def atualizar_status_unificado(cadastros):
+    """
+    Recalcula o status unificado dos cadastros (instâncias ou ids) com um único
+    UPDATE. As instâncias recebidas ficam com os valores gravados.
+    """
+    from .models import Cadastro
+
+    instancias = {c.pk: c for c in cadastros if isinstance(c, Cadastro)}
+    ids = {getattr(c, 'pk', c) for c in cadastros}
+    if not ids:
+        return
+    Cadastro.objects.filter(pk__in=ids).update(**expressoes_status_unificado())
+    if instancias:
+        gravados = Cadastro.objects.filter(pk__in=instancias).values_list('pk', *CAMPOS_STATUS_UNIFICADO)
+        for pk, *valores in gravados:
+            for campo, valor in zip(CAMPOS_STATUS_UNIFICADO, valores):
+                setattr(instancias[pk], campo, valor)
+
+
+class SincronizaStatusUnificado:
+    """
+    Para os processos com OneToOne `cadastro` (análise e tesouraria): gravar
+    o status do processo atualiza o status unificado do cadastro na mesma
+    transação.
+    """
+
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'status' not in update_fields:
+            return super().save(*args, **kwargs)
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            cadastro_em_memoria = type(self).cadastro.is_cached(self)
+            atualizar_status_unificado([self.cadastro if cadastro_em_memoria else self.cadastro_id])
+
+
+def rotulo_status(origem, status):
+    """Rótulo de um status unificado conforme o módulo de origem."""
+    from apps.analise.models import StatusAnalise
+    from apps.tesouraria.models import StatusProcessoTesouraria
+
+    choices = {
+        OrigemStatus.TESOURARIA: StatusProcessoTesouraria,
+        OrigemStatus.ANALISE: StatusAnalise,
+    }.get(origem, StatusCadastro)
+    try:
+        return choices(status).label
+    except ValueError:
+        return status
+
+
 def get_status_css_class(status_value):
     """
     Retorna a classe CSS apropriada para um status.
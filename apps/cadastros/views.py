@@ -8,7 +8,6 @@ from django.shortcuts import get_object_or_404, redirect, render
 from django.views.decorators.http import require_http_methods
 from django.utils import timezone
 from django.core.paginator import Paginator
-from django.db.models import Q
 from django.contrib.auth import get_user_model
 
 from apps.accounts.decorators import group_required
@@ -17,8 +16,10 @@ from apps.documentos.models import Documento, DocumentoRascunho
 from apps.documentos.views import ensure_draft_token
 
 from .choices import StatusCadastro, StatusParcela
+from .busca import buscar_cadastros
 from .forms import CadastroForm
-from .models import Cadastro, ParcelaAntecipacao
+from .models import Cadastro
+from .parcelas import criar_parcelas
 
 User = get_user_model()
 
@@ -75,7 +76,7 @@ def agente_list(request):
     """Lista todos os cadastros do agente logado"""
     cadastros = (
         Cadastro.objects.filter(agente_responsavel=request.user)
-        .select_related()
+        .with_unified_status()
         .order_by('-created_at')
     )
 
@@ -279,11 +280,7 @@ def agente_create(request):
             # Base de cálculo segura
             base = cad.valor_total_antecipacao or cad.mensalidade_associativa or Decimal('0.00')
             valor_parcela = (Decimal(base) / 3) if base else Decimal('0.00')
-            for n in (1, 2, 3):
-                ParcelaAntecipacao.objects.get_or_create(
-                    cadastro=cad, numero=n,
-                    defaults={"valor": valor_parcela, "status": StatusParcela.PENDENTE}
-                )
+            criar_parcelas([cad], valor=lambda c: valor_parcela)
     except Exception as e:
         messages.warning(request, f'Cadastro salvo, mas houve erro ao criar parcelas: {e}')
 
@@ -492,11 +489,7 @@ def renovar_cadastro(request, cadastro_id):
     renovacao.save()  # dispara recalc() no model
 
     # 3 parcelas padrão da renovação
-    for n in (1, 2, 3):
-        ParcelaAntecipacao.objects.get_or_create(
-            cadastro=renovacao, numero=n,
-            defaults={"valor": renovacao.mensalidade_associativa, "status": StatusParcela.PENDENTE}
-        )
+    criar_parcelas([renovacao], valor=lambda c: c.mensalidade_associativa)
 
     # Promove rascunhos para documentos definitivos
     for d in docs:
@@ -523,7 +516,7 @@ def todos_associados(request):
     Acessível para administradores, tesoureiros e analistas.
     """
     # Base queryset
-    cadastros = Cadastro.objects.select_related('agente_responsavel').order_by('-created_at')
+    cadastros = Cadastro.objects.with_unified_status().select_related('agente_responsavel').order_by('-created_at')
     
     # Aplicar filtros
     status_filter = request.GET.get('status')
@@ -544,11 +537,7 @@ def todos_associados(request):
     
     search = request.GET.get('search')
     if search:
-        cadastros = cadastros.filter(
-            Q(nome_completo__icontains=search) |
-            Q(cpf__icontains=search) |
-            Q(cnpj__icontains=search)
-        )
+        cadastros = buscar_cadastros(cadastros, search).order_by('-relevancia', '-created_at')
     
     # Calcular KPIs
     total_cadastros = Cadastro.objects.count()
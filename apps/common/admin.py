@@ -1,3 +1,17 @@
 from django.contrib import admin
+from .models import Feriado, ImportJob
 
-# Register your models here.
+@admin.register(ImportJob)
+class ImportJobAdmin(admin.ModelAdmin):
+    list_display = ('id', 'tipo', 'objeto_id', 'status', 'etapa', 'lidos', 'conciliados', 'gravados', 'criado_em', 'concluido_em')
+    list_filter = ('tipo', 'status', 'criado_em')
+    readonly_fields = ('criado_em', 'iniciado_em', 'concluido_em', 'atualizado_em')
+    ordering = ['-criado_em']
+
+
+@admin.register(Feriado)
+class FeriadoAdmin(admin.ModelAdmin):
+    list_display = ('data', 'descricao', 'uf', 'municipio', 'anual')
+    list_filter = ('anual', 'uf')
+    search_fields = ('descricao', 'municipio')
+    date_hierarchy = 'data'
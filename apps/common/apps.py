@@ -3,3 +3,6 @@ from django.apps import AppConfig
 class CommonConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "apps.common"
+
+    def ready(self):
+        from . import calendario  # noqa: limpa o cache do calendário quando um Feriado muda
@@ -0,0 +1,175 @@
+"""
+Calendário de dias úteis: segunda a sexta, fora os feriados.
+
+Feriados considerados: os nacionais de data fixa, os móveis derivados da
+Páscoa (Carnaval, Sexta-feira Santa e Corpus Christi, dias sem expediente
+bancário) e os cadastrados em Feriado para a localidade de
+settings.CALENDARIO_UF / CALENDARIO_MUNICIPIO.
+
+Cada ano é indexado uma única vez (memorizado): lista dos dias úteis,
+dias úteis de cada mês e, para cada dia do ano, quantos dias úteis o
+precedem. "n-ésimo dia útil do mês" e "somar N dias úteis" viram acesso a
+lista. Alterar um Feriado limpa o índice deste processo; os demais
+processos o recalculam ao reiniciar (ou com limpar_cache()).
+"""
+from datetime import date, timedelta
+from functools import lru_cache
+from typing import Dict, List, NamedTuple
+
+from django.conf import settings
+from django.db.models import Q
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import Feriado
+
+FERIADOS_FIXOS = (
+    ((1, 1), "Confraternização Universal"),
+    ((4, 21), "Tiradentes"),
+    ((5, 1), "Dia do Trabalho"),
+    ((9, 7), "Independência do Brasil"),
+    ((10, 12), "Nossa Senhora Aparecida"),
+    ((11, 2), "Finados"),
+    ((11, 15), "Proclamação da República"),
+    ((12, 25), "Natal"),
+)
+
+# Feriado nacional a partir de 2024 (Lei 14.759/2023)
+CONSCIENCIA_NEGRA = ((11, 20), "Dia Nacional de Zumbi e da Consciência Negra", 2024)
+
+# Dias em relação ao domingo de Páscoa
+FERIADOS_MOVEIS = (
+    (-48, "Carnaval"),
+    (-47, "Carnaval"),
+    (-2, "Sexta-feira Santa"),
+    (60, "Corpus Christi"),
+)
+
+
+class _Ano(NamedTuple):
+    dias_uteis: List[date]
+    por_mes: Dict[int, List[date]]
+    # Para cada dia do ano: nº de dias úteis do ano antes dele
+    anteriores: Dict[date, int]
+
+
+def pascoa(ano):
+    """Domingo de Páscoa (algoritmo de Meeus/Jones/Butcher, calendário gregoriano)."""
+    a, b, c = ano % 19, ano // 100, ano % 100
+    d, e = b // 4, b % 4
+    g = (8 * b + 13) // 25
+    h = (19 * a + b - d - g + 15) % 30
+    i, k = c // 4, c % 4
+    l = (32 + 2 * e + 2 * i - h - k) % 7
+    m = (a + 11 * h + 19 * l) // 433
+    mes = (h + l - 7 * m + 90) // 25
+    dia = (h + l - 7 * m + 33 * mes + 19) % 32
+    return date(ano, mes, dia)
+
+
+def _localidade():
+    return getattr(settings, "CALENDARIO_UF", ""), getattr(settings, "CALENDARIO_MUNICIPIO", "")
+
+
+@lru_cache(maxsize=None)
+def _feriados(ano, uf, municipio):
+    feriados = {date(ano, mes, dia): nome for (mes, dia), nome in FERIADOS_FIXOS}
+    (mes, dia), nome, desde = CONSCIENCIA_NEGRA
+    if ano >= desde:
+        feriados[date(ano, mes, dia)] = nome
+    domingo = pascoa(ano)
+    for deslocamento, nome in FERIADOS_MOVEIS:
+        feriados[domingo + timedelta(days=deslocamento)] = nome
+
+    local = Q(uf="")
+    if uf:
+        local |= Q(uf=uf, municipio="") | Q(uf=uf, municipio=municipio)
+    cadastrados = Feriado.objects.filter(local).filter(Q(anual=True) | Q(data__year=ano))
+    for data, descricao, anual in cadastrados.values_list("data", "descricao", "anual"):
+        if anual:
+            try:
+                data = data.replace(year=ano)
+            except ValueError:  # 29/02 em ano não bissexto
+                continue
+        feriados.setdefault(data, descricao)
+    return feriados
+
+
+@lru_cache(maxsize=None)
+def _ano(ano, uf, municipio):
+    feriados = _feriados(ano, uf, municipio)
+    dias_uteis, por_mes, anteriores = [], {mes: [] for mes in range(1, 13)}, {}
+    dia = date(ano, 1, 1)
+    while dia.year == ano:
+        anteriores[dia] = len(dias_uteis)
+        if dia.weekday() < 5 and dia not in feriados:
+            dias_uteis.append(dia)
+            por_mes[dia.month].append(dia)
+        dia += timedelta(days=1)
+    return _Ano(dias_uteis, por_mes, anteriores)
+
+
+def _indice(ano):
+    return _ano(ano, *_localidade())
+
+
+def feriados(ano):
+    """{data: descrição} dos feriados do ano na localidade configurada."""
+    return dict(_feriados(ano, *_localidade()))
+
+
+def eh_dia_util(dia):
+    indice = _indice(dia.year)
+    posicao = indice.anteriores[dia]
+    return posicao < len(indice.dias_uteis) and indice.dias_uteis[posicao] == dia
+
+
+def dia_util_do_mes(ano, mes, n):
+    """O n-ésimo dia útil (n >= 1) do mês."""
+    return _indice(ano).por_mes[mes][n - 1]
+
+
+def somar_dias_uteis(dia, n):
+    """
+    O n-ésimo dia útil depois de `dia` (antes, com n negativo); `dia` não
+    precisa ser útil. Com n = 0 devolve o próprio dia.
+    """
+    if n == 0:
+        return dia
+    ano = dia.year
+    indice = _indice(ano)
+    posicao = indice.anteriores[dia] + n
+    if n > 0:
+        posicao -= 0 if eh_dia_util(dia) else 1
+    while posicao >= len(indice.dias_uteis):
+        posicao -= len(indice.dias_uteis)
+        ano += 1
+        indice = _indice(ano)
+    while posicao < 0:
+        ano -= 1
+        indice = _indice(ano)
+        posicao += len(indice.dias_uteis)
+    return indice.dias_uteis[posicao]
+
+
+def dias_uteis_entre(inicio, fim):
+    """Nº de dias úteis em (inicio, fim]; negativo se fim < inicio."""
+    if fim < inicio:
+        return -dias_uteis_entre(fim, inicio)
+    total = 0
+    for ano in range(inicio.year, fim.year):
+        total += len(_indice(ano).dias_uteis)
+    total += _indice(fim.year).anteriores[fim] + eh_dia_util(fim)
+    total -= _indice(inicio.year).anteriores[inicio] + eh_dia_util(inicio)
+    return total
+
+
+def limpar_cache():
+    _feriados.cache_clear()
+    _ano.cache_clear()
+
+
+@receiver(post_save, sender=Feriado)
+@receiver(post_delete, sender=Feriado)
+def _feriado_alterado(sender, **kwargs):
+    limpar_cache()
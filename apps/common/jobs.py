@@ -0,0 +1,281 @@
+"""
+Fila de jobs de importação no próprio Postgres.
+
+- `enfileirar()` grava o ImportJob e dispara NOTIFY no canal `import_jobs`;
+- o worker (`manage.py processar_importacoes`) faz LISTEN nesse canal, reserva
+  jobs com SELECT ... FOR UPDATE SKIP LOCKED e executa o handler do tipo;
+- o progresso é gravado por uma conexão própria, em autocommit, para ficar
+  visível ao endpoint de polling mesmo com a importação dentro de transação;
+- enquanto o job executa, uma thread grava `heartbeat_em` periodicamente. Só
+  volta à fila o job EXECUTANDO cujo heartbeat parou (worker morto), não o
+  que está apenas demorando;
+- se a conexão do LISTEN cai, o worker a reabre com espera crescente e varre
+  a fila em seguida (os NOTIFY da queda se perderam).
+
+Não depende de Celery/Redis: basta o Postgres da aplicação.
+"""
+import logging
+import select
+import threading
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import (
+    DatabaseError, InterfaceError, OperationalError, close_old_connections, connection, connections, transaction,
+)
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .models import ImportJob, StatusJob, EtapaJob, TipoJob
+
+log = logging.getLogger("apps")
+
+CANAL = "import_jobs"
+
+# Handler de cada tipo de job: callable(job, progresso)
+HANDLERS = {
+    TipoJob.CONTRIBUICOES: "apps.importador.service.executar_job",
+    TipoJob.CADASTROS: "apps.importar_cadastros.services.executar_job",
+    TipoJob.LOTE_CONTRIBUICOES: "apps.importador.service.executar_job_lote",
+}
+
+# Intervalo mínimo entre gravações de progresso (segundos)
+PROGRESSO_INTERVALO = 1.0
+
+# Intervalo entre gravações do heartbeat do job em execução (segundos)
+HEARTBEAT_INTERVALO = 30.0
+
+# Espera entre tentativas de reabrir a conexão do LISTEN (segundos), dobrando até o máximo
+RECONEXAO_ESPERA = 1.0
+RECONEXAO_ESPERA_MAX = 60.0
+
+
+def em_segundo_plano() -> bool:
+    return getattr(settings, "IMPORTACOES_EM_SEGUNDO_PLANO", True)
+
+
+def enfileirar(tipo, objeto_id, parametros=None, user=None) -> ImportJob:
+    """
+    Cria o job e acorda o worker. Com IMPORTACOES_EM_SEGUNDO_PLANO=False
+    o job é executado imediatamente, na própria requisição.
+    """
+    job = ImportJob.objects.create(
+        tipo=tipo, objeto_id=objeto_id, parametros=parametros or {}, criado_por=user
+    )
+    if not em_segundo_plano():
+        job.status = StatusJob.EXECUTANDO
+        job.iniciado_em = timezone.now()
+        job.tentativas = 1
+        return executar(job)
+    if connection.vendor == "postgresql":
+        with connection.cursor() as cur:
+            # NOTIFY é transacional: só é entregue após o commit do job
+            cur.execute("SELECT pg_notify(%s, %s)", [CANAL, str(job.id)])
+    return job
+
+
+def job_atual(tipo, objeto_id):
+    """Último job do objeto (ou None)."""
+    return ImportJob.objects.filter(tipo=tipo, objeto_id=objeto_id).order_by("-id").first()
+
+
+class Progresso:
+    """
+    Callable passado aos serviços de importação:
+        progresso(etapa=EtapaJob.CONCILIACAO, lidos=..., conciliados=..., gravados=...)
+    Gravações são limitadas a uma por PROGRESSO_INTERVALO, exceto troca de etapa ou force=True.
+    Entre iniciar_heartbeat() e fechar(), grava heartbeat_em a cada HEARTBEAT_INTERVALO.
+    """
+    CAMPOS = ("total", "lidos", "conciliados", "gravados")
+
+    def __init__(self, job: ImportJob):
+        self.job = job
+        self._estado = {"etapa": job.etapa}
+        self._ultimo = 0.0
+        self._conn = None
+        self._parar = threading.Event()
+        self._batimento = None
+
+    def __call__(self, etapa=None, force=False, **contadores):
+        mudou_etapa = etapa is not None and etapa != self._estado.get("etapa")
+        if etapa is not None:
+            self._estado["etapa"] = etapa
+        for campo, valor in contadores.items():
+            if campo in self.CAMPOS:
+                self._estado[campo] = valor
+        agora = time.monotonic()
+        if force or mudou_etapa or agora - self._ultimo >= PROGRESSO_INTERVALO:
+            self._gravar()
+            self._ultimo = agora
+
+    def _gravar(self):
+        campos = list(self._estado)
+        sets = ", ".join(f"{c} = %s" for c in campos)
+        valores = [self._estado[c] for c in campos]
+        with self._conexao().cursor() as cur:
+            agora = timezone.now()
+            cur.execute(
+                f"UPDATE {ImportJob._meta.db_table} SET {sets}, atualizado_em = %s, heartbeat_em = %s WHERE id = %s",
+                valores + [agora, agora, self.job.pk],
+            )
+        for c in campos:
+            setattr(self.job, c, self._estado[c])
+
+    def iniciar_heartbeat(self):
+        if connection.vendor != "postgresql" or self._batimento is not None:
+            return
+        self._batimento = threading.Thread(
+            target=self._bater, name=f"heartbeat-job-{self.job.pk}", daemon=True
+        )
+        self._batimento.start()
+
+    def _bater(self):
+        # Conexão da própria thread (conexões do Django não são compartilhadas entre threads)
+        conn = connections[ImportJob.objects.db].copy()
+        try:
+            while not self._parar.wait(HEARTBEAT_INTERVALO):
+                with conn.cursor() as cur:
+                    cur.execute(
+                        f"UPDATE {ImportJob._meta.db_table} SET heartbeat_em = %s WHERE id = %s",
+                        [timezone.now(), self.job.pk],
+                    )
+        except Exception:
+            log.exception("Heartbeat do job %s interrompido", self.job.pk)
+        finally:
+            conn.close()
+
+    def _conexao(self):
+        # Conexão separada (autocommit) para escapar da transação da importação
+        if self._conn is None:
+            self._conn = connections[ImportJob.objects.db].copy()
+        return self._conn
+
+    def fechar(self):
+        self._parar.set()
+        if self._batimento is not None:
+            self._batimento.join()
+            self._batimento = None
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+
+def reservar_proximo():
+    """Reserva o próximo job pendente, sem bloquear outros workers."""
+    with transaction.atomic():
+        job = (
+            ImportJob.objects.select_for_update(skip_locked=True)
+            .filter(status=StatusJob.PENDENTE)
+            .order_by("id")
+            .first()
+        )
+        if job is None:
+            return None
+        job.status = StatusJob.EXECUTANDO
+        job.iniciado_em = job.heartbeat_em = timezone.now()
+        job.tentativas += 1
+        job.save(update_fields=["status", "iniciado_em", "heartbeat_em", "tentativas", "atualizado_em"])
+    return job
+
+
+def executar(job: ImportJob):
+    """Executa o handler do job, registrando conclusão ou erro."""
+    progresso = Progresso(job)
+    progresso.iniciar_heartbeat()
+    try:
+        handler = import_string(HANDLERS[job.tipo])
+        handler(job, progresso)
+    except Exception as ex:
+        log.exception("Job de importação %s falhou", job.id)
+        job.status = StatusJob.ERRO
+        job.erro = str(ex)
+    else:
+        job.status = StatusJob.CONCLUIDO
+        job.etapa = EtapaJob.FIM
+    finally:
+        progresso.fechar()
+    job.concluido_em = timezone.now()
+    job.save(update_fields=["status", "etapa", "erro", "concluido_em", "atualizado_em"])
+    return job
+
+
+def processar_fila() -> int:
+    """Executa todos os jobs pendentes; retorna quantos foram processados."""
+    total = 0
+    while True:
+        # Worker de longa duração: descarta conexões quebradas ou além de CONN_MAX_AGE
+        close_old_connections()
+        job = reservar_proximo()
+        if job is None:
+            return total
+        try:
+            executar(job)
+        finally:
+            close_old_connections()
+        total += 1
+
+
+def reenfileirar_travados(minutos=30) -> int:
+    """
+    Devolve à fila jobs EXECUTANDO sem heartbeat há `minutos` (worker
+    interrompido). Jobs de antes do heartbeat usam a última atualização.
+    """
+    limite = timezone.now() - timedelta(minutes=minutos)
+    return ImportJob.objects.filter(status=StatusJob.EXECUTANDO).filter(
+        Q(heartbeat_em__lt=limite) | Q(heartbeat_em__isnull=True, atualizado_em__lt=limite)
+    ).update(status=StatusJob.PENDENTE, etapa=EtapaJob.FILA, atualizado_em=timezone.now())
+
+
+def escutar():
+    """Abre uma conexão dedicada com LISTEN no canal da fila."""
+    conn = connections["default"].copy()
+    conn.ensure_connection()
+    conn.set_autocommit(True)
+    with conn.cursor() as cur:
+        cur.execute(f"LISTEN {CANAL}")
+    return conn
+
+
+def aguardar(conn, timeout):
+    """
+    Bloqueia até um NOTIFY chegar ou o timeout expirar. Retorna (conexão,
+    acordou): se a conexão do LISTEN caiu, a conexão devolvida é a reaberta
+    por reconectar() e `acordou` é True, para quem chama varrer a fila.
+    """
+    try:
+        with conn.wrap_database_errors:
+            raw = conn.connection
+            if select.select([raw], [], [], timeout) == ([], [], []):
+                return conn, False
+            raw.poll()
+            raw.notifies.clear()
+        return conn, True
+    except (OperationalError, InterfaceError, OSError, ValueError):
+        log.warning("Conexão do LISTEN caiu; reconectando", exc_info=True)
+    return reconectar(conn), True
+
+
+def reconectar(conn):
+    """
+    Reabre a conexão do LISTEN (escutar()), com espera crescente entre as
+    tentativas, até conseguir. A conexão padrão também é fechada: se caiu
+    junto, a próxima consulta abre outra em vez de falhar.
+    """
+    for antiga in (conn, connections["default"]):
+        try:
+            antiga.close()
+        except DatabaseError:
+            pass
+    espera = RECONEXAO_ESPERA
+    while True:
+        try:
+            conn = escutar()
+        except (OperationalError, InterfaceError):
+            log.warning("Falha ao reabrir a conexão do LISTEN; nova tentativa em %.0fs", espera)
+            time.sleep(espera)
+            espera = min(espera * 2, RECONEXAO_ESPERA_MAX)
+        else:
+            log.info("Conexão do LISTEN reaberta")
+            return conn
@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand
+from apps.common import jobs
+
+class Command(BaseCommand):
+    help = (
+        "Worker das importações em segundo plano: executa os ImportJob pendentes "
+        "e aguarda novos via LISTEN/NOTIFY no Postgres."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--once", action="store_true",
+                            help="Processa os jobs pendentes e encerra.")
+        parser.add_argument("--timeout", type=float, default=30.0,
+                            help="Intervalo máximo (s) entre verificações da fila sem NOTIFY.")
+        parser.add_argument("--travados-minutos", type=int, default=30,
+                            help="Devolve à fila jobs em execução sem heartbeat há N minutos.")
+
+    def handle(self, *args, **options):
+        conn = None if options["once"] else jobs.escutar()
+        try:
+            while True:
+                reenfileirados = jobs.reenfileirar_travados(options["travados_minutos"])
+                if reenfileirados:
+                    self.stdout.write(self.style.WARNING(f"Jobs devolvidos à fila: {reenfileirados}"))
+
+                total = jobs.processar_fila()
+                if total:
+                    self.stdout.write(self.style.SUCCESS(f"Jobs processados: {total}"))
+
+                if options["once"]:
+                    break
+                # Se a conexão do LISTEN cair, volta reaberta e a fila é varrida de novo
+                conn, _ = jobs.aguardar(conn, options["timeout"])
+        except KeyboardInterrupt:
+            pass
+        finally:
+            if conn is not None:
+                conn.close()
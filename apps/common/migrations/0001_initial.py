@@ -0,0 +1,43 @@
+# Generated by Django 5.2.18 on 2026-10-17 21:05
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImportJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tipo', models.CharField(choices=[('CONTRIBUICOES', 'Importação de contribuições (TXT)'), ('CADASTROS', 'Importação de cadastros (planilha)')], max_length=20)),
+                ('objeto_id', models.PositiveIntegerField()),
+                ('parametros', models.JSONField(blank=True, default=dict)),
+                ('status', models.CharField(choices=[('PENDENTE', 'Na fila'), ('EXECUTANDO', 'Executando'), ('CONCLUIDO', 'Concluído'), ('ERRO', 'Erro')], default='PENDENTE', max_length=12)),
+                ('etapa', models.CharField(choices=[('FILA', 'Aguardando worker'), ('LEITURA', 'Lendo arquivo'), ('CONCILIACAO', 'Conciliando registros'), ('GRAVACAO', 'Gravando resultados'), ('FIM', 'Finalizado')], default='FILA', max_length=12)),
+                ('total', models.PositiveIntegerField(default=0)),
+                ('lidos', models.PositiveIntegerField(default=0)),
+                ('conciliados', models.PositiveIntegerField(default=0)),
+                ('gravados', models.PositiveIntegerField(default=0)),
+                ('erro', models.TextField(blank=True)),
+                ('tentativas', models.PositiveSmallIntegerField(default=0)),
+                ('criado_em', models.DateTimeField(auto_now_add=True)),
+                ('iniciado_em', models.DateTimeField(blank=True, null=True)),
+                ('concluido_em', models.DateTimeField(blank=True, null=True)),
+                ('atualizado_em', models.DateTimeField(auto_now=True)),
+                ('criado_por', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-criado_em'],
+                'indexes': [models.Index(fields=['status', 'id'], name='common_impo_status_1aa2db_idx'), models.Index(fields=['tipo', 'objeto_id'], name='common_impo_tipo_0d5a28_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-17 21:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('common', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='importjob',
+            name='tipo',
+            field=models.CharField(choices=[('CONTRIBUICOES', 'Importação de contribuições (TXT)'), ('CADASTROS', 'Importação de cadastros (planilha)'), ('LOTE_CONTRIBUICOES', 'Importação de contribuições em lote (TXT)')], max_length=20),
+        ),
+    ]
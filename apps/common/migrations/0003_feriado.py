@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-17 22:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('common', '0002_importjob_tipo_lote'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Feriado',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('data', models.DateField(db_index=True, verbose_name='Data')),
+                ('descricao', models.CharField(max_length=120, verbose_name='Descrição')),
+                ('uf', models.CharField(blank=True, max_length=2, verbose_name='UF')),
+                ('municipio', models.CharField(blank=True, max_length=120, verbose_name='Município')),
+                ('anual', models.BooleanField(default=False, verbose_name='Repete todo ano')),
+            ],
+            options={
+                'verbose_name': 'Feriado',
+                'verbose_name_plural': 'Feriados',
+                'ordering': ['data'],
+            },
+        ),
+    ]
@@ -1,3 +1,186 @@
 from django.db import models
+from django.conf import settings
 
-# Create your models here.
+
+class RastreiaAlteracoes:
+    """
+    Mixin de modelo que guarda os valores dos campos como vieram do banco
+    (from_db) e após cada save()/refresh_from_db(), para saber o que mudou sem
+    reconsultar a linha: `changed_fields()` e `previous(campo)`.
+
+    Os receivers de pre_save/post_save ainda veem os valores anteriores em
+    previous().
+
+    Com `salvar_so_alterados = True` no modelo, save() sem update_fields em
+    instância carregada do banco grava só os campos alterados (mais os
+    auto_now). Nesse modo, save() de linha apagada por baixo levanta
+    DatabaseError em vez de reinserir, e alteração in-place de valor mutável
+    (dict/lista de JSONField, ArrayField) não aparece na comparação: com um
+    valor desses carregado, o save() volta a gravar todos os campos.
+    """
+
+    salvar_so_alterados = False
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._valores_originais = dict(zip(field_names, values))
+        return instance
+
+    def _guardar_valores(self, campos=None):
+        originais = getattr(self, "_valores_originais", {})
+        deferidos = self.get_deferred_fields()
+        for field in self._meta.concrete_fields:
+            if field.attname in deferidos:
+                continue
+            if campos is None or field.name in campos or field.attname in campos:
+                originais[field.attname] = getattr(self, field.attname)
+        self._valores_originais = originais
+
+    def changed_fields(self):
+        """
+        Nomes dos campos alterados desde a carga (campos deferidos não
+        contam). Sem valores guardados (instância nova), todos os campos.
+        """
+        campos = [f for f in self._meta.concrete_fields if not f.primary_key]
+        originais = getattr(self, "_valores_originais", None)
+        if originais is None:
+            return [f.name for f in campos]
+        return [
+            f.name for f in campos
+            if f.attname in originais and getattr(self, f.attname) != originais[f.attname]
+        ]
+
+    def previous(self, campo):
+        """Valor do campo como foi carregado do banco (None se não carregado)."""
+        attname = self._meta.get_field(campo).attname
+        return getattr(self, "_valores_originais", {}).get(attname)
+
+    def _tem_valor_mutavel(self):
+        originais = getattr(self, "_valores_originais", {})
+        return any(isinstance(valor, (dict, list)) for valor in originais.values())
+
+    def save(self, *args, **kwargs):
+        originais = getattr(self, "_valores_originais", None)
+        if (
+            self.salvar_so_alterados
+            and not args
+            and kwargs.get("update_fields") is None
+            and not kwargs.get("force_insert")
+            and not self._state.adding
+            and originais is not None
+            and originais.get(self._meta.pk.attname) == self.pk
+            and not self._tem_valor_mutavel()
+        ):
+            auto_now = [
+                f.name for f in self._meta.concrete_fields if getattr(f, "auto_now", False)
+            ]
+            kwargs["update_fields"] = {*self.changed_fields(), *auto_now}
+        super().save(*args, **kwargs)
+        self._guardar_valores(kwargs.get("update_fields"))
+
+    def refresh_from_db(self, using=None, fields=None, **kwargs):
+        super().refresh_from_db(using=using, fields=fields, **kwargs)
+        self._guardar_valores(fields)
+
+
+class TipoJob(models.TextChoices):
+    CONTRIBUICOES = "CONTRIBUICOES", "Importação de contribuições (TXT)"
+    CADASTROS = "CADASTROS", "Importação de cadastros (planilha)"
+    LOTE_CONTRIBUICOES = "LOTE_CONTRIBUICOES", "Importação de contribuições em lote (TXT)"
+
+
+class StatusJob(models.TextChoices):
+    PENDENTE = "PENDENTE", "Na fila"
+    EXECUTANDO = "EXECUTANDO", "Executando"
+    CONCLUIDO = "CONCLUIDO", "Concluído"
+    ERRO = "ERRO", "Erro"
+
+
+class EtapaJob(models.TextChoices):
+    FILA = "FILA", "Aguardando worker"
+    LEITURA = "LEITURA", "Lendo arquivo"
+    CONCILIACAO = "CONCILIACAO", "Conciliando registros"
+    GRAVACAO = "GRAVACAO", "Gravando resultados"
+    FIM = "FIM", "Finalizado"
+
+
+class ImportJob(models.Model):
+    """
+    Job de importação executado em segundo plano pelo worker
+    `processar_importacoes` (fila no próprio Postgres, acordada via LISTEN/NOTIFY).
+
+    `objeto_id` aponta para o registro da importação conforme o tipo:
+    ImportacaoContribuicao (CONTRIBUICOES) ou ImportBatch (CADASTROS).
+    Em LOTE_CONTRIBUICOES aponta para a primeira importação do lote e
+    `parametros["ids"]` lista todas elas.
+    """
+    tipo = models.CharField(max_length=20, choices=TipoJob.choices)
+    objeto_id = models.PositiveIntegerField()
+    parametros = models.JSONField(default=dict, blank=True)
+
+    status = models.CharField(max_length=12, choices=StatusJob.choices, default=StatusJob.PENDENTE)
+    etapa = models.CharField(max_length=12, choices=EtapaJob.choices, default=EtapaJob.FILA)
+
+    # Progresso por etapa
+    total = models.PositiveIntegerField(default=0)
+    lidos = models.PositiveIntegerField(default=0)
+    conciliados = models.PositiveIntegerField(default=0)
+    gravados = models.PositiveIntegerField(default=0)
+
+    erro = models.TextField(blank=True)
+    tentativas = models.PositiveSmallIntegerField(default=0)
+
+    criado_por = models.ForeignKey(settings.AUTH_USER_MODEL, null=True, blank=True, on_delete=models.SET_NULL)
+    criado_em = models.DateTimeField(auto_now_add=True)
+    iniciado_em = models.DateTimeField(null=True, blank=True)
+    concluido_em = models.DateTimeField(null=True, blank=True)
+    atualizado_em = models.DateTimeField(auto_now=True)
+    # Sinal de vida do worker durante a execução (jobs.Progresso), mesmo sem progresso
+    heartbeat_em = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ["-criado_em"]
+        indexes = [
+            models.Index(fields=["status", "id"]),
+            models.Index(fields=["tipo", "objeto_id"]),
+        ]
+
+    def __str__(self):
+        return f"Job {self.id} • {self.get_tipo_display()} #{self.objeto_id} ({self.get_status_display()})"
+
+    @property
+    def em_andamento(self):
+        return self.status in (StatusJob.PENDENTE, StatusJob.EXECUTANDO)
+
+    def get_progress_percentage(self):
+        """Percentual com base na etapa mais avançada com contagem."""
+        if self.status == StatusJob.CONCLUIDO:
+            return 100
+        if not self.total:
+            return 0
+        feito = self.gravados or self.conciliados or self.lidos
+        return min(100, round(feito / self.total * 100, 1))
+
+
+class Feriado(models.Model):
+    """
+    Feriado estadual ou municipal (ou ponto extra) considerado no calendário
+    de dias úteis. Os nacionais, fixos e móveis, são calculados em
+    apps.common.calendario. Sem UF, vale para qualquer localidade; com UF e
+    sem município, para o estado; `anual` repete dia e mês todo ano.
+    """
+
+    data = models.DateField("Data", db_index=True)
+    descricao = models.CharField("Descrição", max_length=120)
+    uf = models.CharField("UF", max_length=2, blank=True)
+    municipio = models.CharField("Município", max_length=120, blank=True)
+    anual = models.BooleanField("Repete todo ano", default=False)
+
+    class Meta:
+        ordering = ["data"]
+        verbose_name = "Feriado"
+        verbose_name_plural = "Feriados"
+
+    def __str__(self):
+        return f"{self.data:%d/%m/%Y} - {self.descricao}"
@@ -0,0 +1,170 @@
+"""
+Conciliação das linhas do TXT de retorno com cadastros/parcelas pré-carregados.
+
+Não acessa o banco nem depende do Django configurado: é usado tanto pela
+importação de um arquivo quanto pelos processos filhos da importação em lote.
+"""
+import hashlib
+import os
+import pickle
+import tempfile
+
+from .parser import abrir_arquivo
+
+LIQUIDADA = "LIQUIDADA"  # StatusParcela.LIQUIDADA
+
+ACAO_LIQUIDADA = "MARCADA_LIQUIDADA"
+ACAO_IGNORADA = "IGNORADA_STATUS"
+ACAO_NAO_ENCONTRADO = "CPF_MATRICULA_NAO_ENCONTRADO"
+ACAO_SEM_PARCELA = "PARCELA_DO_MES_NAO_ENCONTRADA"
+
+# Texto das ocorrências: gravamos só a ação (e o nº da parcela) e montamos a
+# mensagem na exibição, em vez de repetir a frase em cada linha da tabela.
+MENSAGENS = {
+    ACAO_LIQUIDADA: "Parcela {numero} marcada como Liquidada pela competência {referencia:%Y-%m}.",
+    ACAO_SEM_PARCELA: "Não foi encontrada parcela com vencimento na competência {referencia:%Y-%m}.",
+    ACAO_NAO_ENCONTRADO: "Cadastro não encontrado ou não efetivado.",
+    ACAO_IGNORADA: "Status externo não é '1 - Lançado e Efetivado'.",
+}
+
+
+def mensagem_ocorrencia(acao, referencia, numero=None):
+    modelo = MENSAGENS.get(acao)
+    if modelo is None:
+        return ""
+    if "{numero}" in modelo and numero is None:
+        modelo = modelo.replace("Parcela {numero}", "Parcela")
+    return modelo.format(numero=numero, referencia=referencia)
+
+
+# Campos que compõem o hash da ocorrência: conteúdo da linha + resultado da conciliação
+CAMPOS_HASH = (
+    "nome", "orgao_pagto", "valor", "status_externo",
+    "acao", "cadastro_id", "parcela_id",
+)
+
+
+def hash_ocorrencia(campos):
+    bruto = "\x1f".join(str(campos[c]) for c in CAMPOS_HASH)
+    return hashlib.blake2b(bruto.encode("utf-8"), digest_size=16).hexdigest()
+
+
+class Totais:
+    """Contadores por linha, com as mesmas regras da importação original."""
+
+    def __init__(self):
+        self.linhas = 0
+        self.processados = 0
+        self.atualizados = 0
+        self.ignorados = 0
+        self.nao_encontrados = 0
+
+    def add(self, acao):
+        self.linhas += 1
+        if acao == ACAO_NAO_ENCONTRADO:
+            self.nao_encontrados += 1
+            return
+        self.processados += 1
+        if acao == ACAO_LIQUIDADA:
+            self.atualizados += 1
+        elif acao == ACAO_SEM_PARCELA:
+            self.nao_encontrados += 1
+        else:
+            self.ignorados += 1
+
+
+def conciliar(registros, referencia, cadastros, parcelas_mes):
+    """
+    Para cada registro do arquivo gera (campos da ocorrência, parcela_id a liquidar ou None).
+    A mensagem não faz parte dos campos: é montada por mensagem_ocorrencia() na exibição.
+
+    cadastros: (cpf, matricula) -> cadastro_id dos cadastros EFFECTIVATED
+    parcelas_mes: cadastro_id -> (parcela_id, numero, status) da competência
+    """
+    for reg in registros:
+        cpf = reg["cpf"].replace(".", "").replace("-", "")
+        matricula = reg["matricula"].strip()
+        status_ext = reg["status"]
+
+        campos = {
+            "cpf": reg["cpf"], "matricula": matricula, "nome": reg["nome"],
+            "orgao_pagto": reg["orgao_pagto"], "valor": reg["valor"],
+            "status_externo": status_ext,
+            "cadastro_id": None, "parcela_id": None, "parcela_numero": None,
+        }
+        liquidar = None
+
+        # localizar cadastro efetivado por cpf+matricula
+        cad_id = cadastros.get((cpf, matricula))
+
+        if not cad_id:
+            campos["acao"] = ACAO_NAO_ENCONTRADO
+            campos["conteudo_sha"] = hash_ocorrencia(campos)
+            yield campos, liquidar
+            continue
+
+        campos["cadastro_id"] = cad_id
+
+        if status_ext == "1":
+            # parcela do mês de referência
+            parcela_mes = parcelas_mes.get(cad_id)
+            if parcela_mes:
+                parcela_id, numero, status_parcela = parcela_mes
+                if status_parcela != LIQUIDADA:
+                    liquidar = parcela_id
+                campos["acao"] = ACAO_LIQUIDADA
+                campos["parcela_id"] = parcela_id
+                campos["parcela_numero"] = numero
+            else:
+                campos["acao"] = ACAO_SEM_PARCELA
+        else:
+            # Apenas registra a situação (não altera parcela)
+            campos["acao"] = ACAO_IGNORADA
+
+        campos["conteudo_sha"] = hash_ocorrencia(campos)
+        yield campos, liquidar
+
+
+# ---- Execução em processos filhos (importação em lote) ----
+
+_CADASTROS = None
+
+
+def inicializar_processo(cadastros):
+    """Initializer do pool: recebe o mapa de cadastros uma vez por processo."""
+    global _CADASTROS
+    _CADASTROS = cadastros
+
+
+def conciliar_arquivo(caminho, parcelas_mes):
+    """
+    Lê e concilia um arquivo inteiro no processo filho. As linhas conciliadas,
+    (campos, parcela_id a liquidar ou None), vão para um arquivo temporário
+    (pickle, uma por registro) em vez de voltarem ao processo pai em memória.
+    Retorna (caminho do arquivo de linhas, totais); quem lê é ler_linhas().
+    """
+    totais = Totais()
+    fd, saida = tempfile.mkstemp(prefix="conciliacao-", suffix=".pickle")
+    try:
+        with open(caminho, "rb") as fh, os.fdopen(fd, "wb") as destino:
+            referencia, _, _, registros = abrir_arquivo(fh)
+            for linha in conciliar(registros, referencia, _CADASTROS, parcelas_mes):
+                pickle.dump(linha, destino, protocol=pickle.HIGHEST_PROTOCOL)
+                totais.add(linha[0]["acao"])
+    except BaseException:
+        os.unlink(saida)
+        raise
+    return saida, totais
+
+
+def ler_linhas(caminho):
+    """Linhas gravadas por conciliar_arquivo, em ordem; apaga o arquivo no fim."""
+    try:
+        with open(caminho, "rb") as fh:
+            while True:
+                try:
+                    yield pickle.load(fh)
+                except EOFError:
+                    return
+    finally:
+        os.unlink(caminho)
@@ -32,4 +32,37 @@ class ImportarTXTForm(forms.Form):
             if not nome.endswith('.txt'):
                 raise forms.ValidationError('Apenas arquivos TXT são permitidos.')
         
-        return arquivo
\ No newline at end of file
+        return arquivo
+
+class MultipleFileInput(forms.ClearableFileInput):
+    allow_multiple_selected = True
+
+
+class MultipleFileField(forms.FileField):
+    def __init__(self, *args, **kwargs):
+        kwargs.setdefault("widget", MultipleFileInput())
+        super().__init__(*args, **kwargs)
+
+    def clean(self, data, initial=None):
+        single_file_clean = super().clean
+        if isinstance(data, (list, tuple)):
+            return [single_file_clean(d, initial) for d in data]
+        return [single_file_clean(data, initial)]
+
+
+class ImportarLoteTXTForm(forms.Form):
+    arquivos = MultipleFileField(
+        label="Arquivos TXT",
+        help_text="Selecione os arquivos TXT de várias competências",
+        required=True,
+        widget=MultipleFileInput(attrs={'accept': '.txt'})
+    )
+
+    def clean_arquivos(self):
+        arquivos = self.cleaned_data['arquivos']
+        for arquivo in arquivos:
+            if arquivo.size > 50 * 1024 * 1024:  # 50MB
+                raise forms.ValidationError(f'{arquivo.name}: arquivo muito grande. Máximo 50MB.')
+            if not arquivo.name.lower().endswith('.txt'):
+                raise forms.ValidationError(f'{arquivo.name}: apenas arquivos TXT são permitidos.')
+        return arquivos
@@ -0,0 +1,135 @@
+"""
+Benchmark do pipeline do importador com arquivos sintéticos.
+
+Para cada tamanho mede, separadamente:
+- parse: parse_header_ref + find_columns_index + iter_registros sobre as linhas;
+- streaming: abrir_arquivo direto dos bytes (caminho usado na importação);
+- importação: importar_contribuicoes completo contra cadastros/parcelas semeados.
+
+Tudo roda dentro de uma transação desfeita ao final: nada fica gravado no banco.
+"""
+import json
+import time
+from datetime import date
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+
+from apps.cadastros.choices import StatusCadastro, StatusParcela
+from apps.cadastros.models import Cadastro, ParcelaAntecipacao, calcular_quinto_dia_util
+from apps.importador.parser import ENCODING, abrir_arquivo, find_columns_index, iter_registros, parse_header_ref
+from apps.importador.service import importar_contribuicoes
+from apps.importador.sintetico import cpf_sintetico, gerar_bytes, matricula_sintetica
+
+from .gerar_retorno_sintetico import referencia_arg
+
+
+def _mes(referencia: date, deslocamento: int) -> date:
+    mes = referencia.month - 1 + deslocamento
+    return date(referencia.year + mes // 12, mes % 12 + 1, 1)
+
+
+class _Desfazer(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = "Mede a vazão (linhas/s) e o número de queries do importador com arquivos sintéticos."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--linhas", type=int, nargs="+", default=[1000, 10000, 100000],
+                            help="Tamanhos de arquivo a medir (padrão: 1000 10000 100000)")
+        parser.add_argument("--cobertura", type=float, default=0.8,
+                            help="Fração das linhas com cadastro efetivado semeado (padrão: 0.8)")
+        parser.add_argument("--referencia", default="05/2025", help="Competência MM/AAAA dos arquivos")
+        parser.add_argument("--semente", type=int, default=0)
+        parser.add_argument("--json", action="store_true", help="Uma linha JSON por tamanho (para acompanhar ao longo do tempo)")
+
+    def handle(self, *args, **opts):
+        referencia = referencia_arg(opts["referencia"])
+        for qtd in opts["linhas"]:
+            resultado = self.medir(qtd, referencia, opts["cobertura"], opts["semente"])
+            if opts["json"]:
+                self.stdout.write(json.dumps(resultado))
+            else:
+                self.imprimir(resultado)
+
+    def medir(self, qtd, referencia, cobertura, semente):
+        conteudo = gerar_bytes(qtd, referencia, semente=semente)
+        resultado = {"linhas": qtd, "bytes": len(conteudo), "cobertura": cobertura}
+
+        t0 = time.perf_counter()
+        linhas = conteudo.decode(ENCODING).splitlines()
+        parse_header_ref(linhas)
+        lidos = sum(1 for _ in iter_registros(linhas, find_columns_index(linhas)))
+        resultado["parse_s"] = time.perf_counter() - t0
+        assert lidos == qtd, f"parser leu {lidos} de {qtd} registros"
+
+        t0 = time.perf_counter()
+        _, _, _, registros = abrir_arquivo(conteudo)
+        sum(1 for _ in registros)
+        resultado["streaming_s"] = time.perf_counter() - t0
+
+        try:
+            with transaction.atomic():
+                t0 = time.perf_counter()
+                user = self.semear(int(qtd * cobertura), referencia)
+                resultado["semeadura_s"] = time.perf_counter() - t0
+
+                with CaptureQueriesContext(connection) as queries:
+                    t0 = time.perf_counter()
+                    imp = importar_contribuicoes(conteudo, f"benchmark_{qtd}.txt", user)
+                    resultado["importacao_s"] = time.perf_counter() - t0
+                resultado["queries"] = len(queries.captured_queries)
+                resultado["atualizados"] = imp.total_atualizados
+                resultado["nao_encontrados"] = imp.total_nao_encontrados
+                raise _Desfazer
+        except _Desfazer:
+            pass
+
+        for etapa in ("parse", "streaming", "importacao"):
+            resultado[f"{etapa}_linhas_s"] = round(qtd / resultado[f"{etapa}_s"]) if resultado[f"{etapa}_s"] else None
+        return resultado
+
+    def semear(self, qtd, referencia):
+        """Cadastros efetivados para as linhas 0..qtd-1 com as 3 parcelas a partir da competência."""
+        user = get_user_model().objects.create(username=f"benchmark_importador_{time.monotonic_ns()}")
+        cadastros = Cadastro.objects.bulk_create(
+            (
+                Cadastro(
+                    nome_completo=f"BENCHMARK {i}", cpf=cpf_sintetico(i), matricula_servidor=matricula_sintetica(i),
+                    agente_responsavel=user, status=StatusCadastro.EFFECTIVATED,
+                    mensalidade_associativa=Decimal("100.00"), data_primeira_mensalidade=referencia.replace(day=10),
+                )
+                for i in range(qtd)
+            ),
+            batch_size=2000,
+        )
+        vencimentos = [referencia.replace(day=10)] + [
+            calcular_quinto_dia_util(m.year, m.month) for m in (_mes(referencia, 1), _mes(referencia, 2))
+        ]
+        ParcelaAntecipacao.objects.bulk_create(
+            (
+                ParcelaAntecipacao(
+                    cadastro=cad, numero=numero, valor=Decimal("100.00"), status=StatusParcela.PENDENTE,
+                    vencimento=venc, competencia=venc.replace(day=1),
+                )
+                for cad in cadastros
+                for numero, venc in enumerate(vencimentos, start=1)
+            ),
+            batch_size=2000,
+        )
+        return user
+
+    def imprimir(self, r):
+        self.stdout.write(self.style.MIGRATE_HEADING(f"{r['linhas']} linhas ({r['bytes'] / 1024:.0f} KiB)"))
+        self.stdout.write(f"  parse          {r['parse_s']:8.3f}s  {r['parse_linhas_s']:>10} linhas/s")
+        self.stdout.write(f"  streaming      {r['streaming_s']:8.3f}s  {r['streaming_linhas_s']:>10} linhas/s")
+        self.stdout.write(f"  semeadura      {r['semeadura_s']:8.3f}s")
+        self.stdout.write(
+            f"  importação     {r['importacao_s']:8.3f}s  {r['importacao_linhas_s']:>10} linhas/s  "
+            f"{r['queries']} queries  (atualizados={r['atualizados']}, não encontrados={r['nao_encontrados']})"
+        )
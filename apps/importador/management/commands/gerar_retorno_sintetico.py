@@ -0,0 +1,29 @@
+from datetime import date, datetime
+
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.importador.sintetico import gerar_arquivo
+
+
+def referencia_arg(valor):
+    try:
+        return datetime.strptime(valor, "%m/%Y").date()
+    except ValueError:
+        raise CommandError(f"Referência inválida: {valor!r} (use MM/AAAA).")
+
+
+class Command(BaseCommand):
+    help = "Gera um TXT de retorno sintético no layout do iNETConsig (para testes e benchmark)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("saida", help="Caminho do arquivo a gerar")
+        parser.add_argument("--linhas", type=int, default=1000, help="Quantidade de registros (padrão: 1000)")
+        parser.add_argument("--referencia", default=None, help="Competência MM/AAAA (padrão: mês atual)")
+        parser.add_argument("--semente", type=int, default=0, help="Semente do gerador aleatório")
+
+    def handle(self, *args, **opts):
+        referencia = referencia_arg(opts["referencia"]) if opts["referencia"] else date.today().replace(day=1)
+        tamanho = gerar_arquivo(opts["saida"], opts["linhas"], referencia, semente=opts["semente"])
+        self.stdout.write(self.style.SUCCESS(
+            f"{opts['saida']}: {opts['linhas']} registros, competência {referencia:%m/%Y}, {tamanho} bytes"
+        ))
@@ -0,0 +1,9 @@
+from django.core.management.base import BaseCommand
+from apps.importador import staging
+
+class Command(BaseCommand):
+    help = "Remove arquivos do staging do importador que passaram do TTL."
+
+    def handle(self, *args, **options):
+        total = staging.cleanup()
+        self.stdout.write(self.style.SUCCESS(f"Arquivos de staging removidos: {total}"))
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-17 21:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('importador', '0002_importacaocontribuicao_importacaoocorrencia_and_more'),
+    ]
+
+    # Importações já existentes foram processadas de forma síncrona: ficam como CONCLUIDO
+    operations = [
+        migrations.AddField(
+            model_name='importacaocontribuicao',
+            name='erro',
+            field=models.TextField(blank=True),
+        ),
+        migrations.AddField(
+            model_name='importacaocontribuicao',
+            name='status',
+            field=models.CharField(choices=[('PENDENTE', 'Pendente'), ('PROCESSANDO', 'Processando'), ('CONCLUIDO', 'Concluído'), ('ERRO', 'Erro')], default='CONCLUIDO', max_length=12),
+        ),
+        migrations.AlterField(
+            model_name='importacaocontribuicao',
+            name='status',
+            field=models.CharField(choices=[('PENDENTE', 'Pendente'), ('PROCESSANDO', 'Processando'), ('CONCLUIDO', 'Concluído'), ('ERRO', 'Erro')], default='PENDENTE', max_length=12),
+        ),
+    ]
@@ -0,0 +1,50 @@
+# Generated by Django 5.2.18 on 2026-10-17 21:13
+
+from django.db import migrations, models
+from django.db.models import F, Max, OuterRef, Subquery, Window
+
+
+def preencher_referencia(apps, schema_editor):
+    """
+    Copia a referência da importação para as ocorrências. Quando a mesma linha
+    (referencia, cpf, matricula) aparece em mais de uma importação, só a
+    ocorrência mais recente recebe a chave; as demais ficam como histórico.
+    """
+    ImportacaoContribuicao = apps.get_model("importador", "ImportacaoContribuicao")
+    ImportacaoOcorrencia = apps.get_model("importador", "ImportacaoOcorrencia")
+    ImportacaoOcorrencia.objects.update(referencia=Subquery(
+        ImportacaoContribuicao.objects.filter(pk=OuterRef("importacao_id")).values("referencia")[:1]
+    ))
+    substituidas = list(
+        ImportacaoOcorrencia.objects.annotate(
+            mais_recente=Window(Max("id"), partition_by=[F("referencia"), F("cpf"), F("matricula")])
+        ).filter(id__lt=F("mais_recente")).values_list("id", flat=True)
+    )
+    for i in range(0, len(substituidas), 5000):
+        ImportacaoOcorrencia.objects.filter(id__in=substituidas[i:i + 5000]).update(referencia=None)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('importador', '0003_importacaocontribuicao_status_erro'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='importacaocontribuicao',
+            name='total_inalterados',
+            field=models.PositiveIntegerField(default=0, help_text='Linhas idênticas às já importadas na competência (não regravadas)'),
+        ),
+        migrations.AddField(
+            model_name='importacaoocorrencia',
+            name='conteudo_sha',
+            field=models.CharField(blank=True, max_length=32),
+        ),
+        migrations.AddField(
+            model_name='importacaoocorrencia',
+            name='referencia',
+            field=models.DateField(blank=True, null=True),
+        ),
+        migrations.RunPython(preencher_referencia, migrations.RunPython.noop),
+    ]
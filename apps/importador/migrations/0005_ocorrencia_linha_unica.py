@@ -0,0 +1,16 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    # Separada da 0004: o Postgres não altera a tabela na mesma transação do backfill
+    dependencies = [
+        ('importador', '0004_ocorrencia_chave_linha'),
+    ]
+
+    operations = [
+        migrations.AddConstraint(
+            model_name='importacaoocorrencia',
+            constraint=models.UniqueConstraint(fields=('referencia', 'cpf', 'matricula'), name='importador_ocorrencia_linha_unica'),
+        ),
+    ]
@@ -0,0 +1,27 @@
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def preencher_parcela_numero(apps, schema_editor):
+    ImportacaoOcorrencia = apps.get_model("importador", "ImportacaoOcorrencia")
+    ParcelaAntecipacao = apps.get_model("cadastros", "ParcelaAntecipacao")
+    ImportacaoOcorrencia.objects.filter(parcela_id__isnull=False).update(parcela_numero=Subquery(
+        ParcelaAntecipacao.objects.filter(pk=OuterRef("parcela_id")).values("numero")[:1]
+    ))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cadastros', '0011_parcelaantecipacao_competencia'),
+        ('importador', '0005_ocorrencia_linha_unica'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='importacaoocorrencia',
+            name='parcela_numero',
+            field=models.PositiveSmallIntegerField(blank=True, null=True),
+        ),
+        migrations.RunPython(preencher_parcela_numero, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,55 @@
+from django.db import migrations, models
+
+from apps.importador.conciliacao import mensagem_ocorrencia
+from apps.importador.parser import legenda_status
+
+BATCH_SIZE = 2000
+
+
+def restaurar_textos(apps, schema_editor):
+    """
+    Volta da migração: preenche de novo mensagem e status_legenda como as
+    propriedades do modelo os montam (status_externo, acao, parcela_numero).
+    """
+    ImportacaoOcorrencia = apps.get_model("importador", "ImportacaoOcorrencia")
+    ocorrencias = ImportacaoOcorrencia.objects.select_related("importacao").order_by("pk")
+    lote = []
+    for ocorrencia in ocorrencias.iterator(chunk_size=BATCH_SIZE):
+        referencia = ocorrencia.referencia or ocorrencia.importacao.referencia
+        ocorrencia.status_legenda = legenda_status(ocorrencia.status_externo)
+        ocorrencia.mensagem = (
+            mensagem_ocorrencia(ocorrencia.acao, referencia, ocorrencia.parcela_numero)
+            or ocorrencia.get_acao_display()
+        )
+        lote.append(ocorrencia)
+        if len(lote) == BATCH_SIZE:
+            ImportacaoOcorrencia.objects.bulk_update(lote, ["status_legenda", "mensagem"])
+            lote = []
+    ImportacaoOcorrencia.objects.bulk_update(lote, ["status_legenda", "mensagem"])
+
+
+class Migration(migrations.Migration):
+
+    # Legenda e mensagem passam a ser montadas na exibição (status_externo/acao/parcela_numero)
+    dependencies = [
+        ('importador', '0006_ocorrencia_codigos'),
+    ]
+
+    operations = [
+        # Na volta roda por último, com as colunas já recriadas
+        migrations.RunPython(migrations.RunPython.noop, restaurar_textos),
+        # Default só para a volta poder recriar a coluna NOT NULL com linhas
+        migrations.AlterField(
+            model_name='importacaoocorrencia',
+            name='status_legenda',
+            field=models.CharField(max_length=200, default=''),
+        ),
+        migrations.RemoveField(
+            model_name='importacaoocorrencia',
+            name='mensagem',
+        ),
+        migrations.RemoveField(
+            model_name='importacaoocorrencia',
+            name='status_legenda',
+        ),
+    ]
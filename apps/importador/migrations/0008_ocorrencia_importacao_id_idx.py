@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-17 21:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('importador', '0007_remove_ocorrencia_textos'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='importacaoocorrencia',
+            index=models.Index(fields=['importacao', 'id'], name='importador_ocorr_imp_id_idx'),
+        ),
+    ]
@@ -1,6 +1,15 @@
 from django.db import models
 from django.conf import settings
 
+from .conciliacao import mensagem_ocorrencia
+from .parser import legenda_status
+
+class StatusImportacao(models.TextChoices):
+    PENDENTE = "PENDENTE", "Pendente"
+    PROCESSANDO = "PROCESSANDO", "Processando"
+    CONCLUIDO = "CONCLUIDO", "Concluído"
+    ERRO = "ERRO", "Erro"
+
 class ImportacaoContribuicao(models.Model):
     referencia = models.DateField(help_text="Primeiro dia do mês de referência (ex.: 2025-05-01)")
     data_geracao = models.DateField(null=True, blank=True)
@@ -8,12 +17,17 @@ class ImportacaoContribuicao(models.Model):
     arquivo_sha256 = models.CharField(max_length=64, unique=True)
     criado_por = models.ForeignKey(settings.AUTH_USER_MODEL, null=True, blank=True, on_delete=models.SET_NULL)
     criado_em = models.DateTimeField(auto_now_add=True)
+    status = models.CharField(max_length=12, choices=StatusImportacao.choices, default=StatusImportacao.PENDENTE)
+    erro = models.TextField(blank=True)
 
     total_linhas = models.PositiveIntegerField(default=0)
     total_processados = models.PositiveIntegerField(default=0)
     total_atualizados = models.PositiveIntegerField(default=0)
     total_ignorados = models.PositiveIntegerField(default=0)
     total_nao_encontrados = models.PositiveIntegerField(default=0)
+    total_inalterados = models.PositiveIntegerField(
+        default=0, help_text="Linhas idênticas às já importadas na competência (não regravadas)"
+    )
 
     def __str__(self):
         return f"Importação {self.referencia:%Y-%m} • {self.arquivo_nome}"
@@ -33,10 +47,35 @@ class ImportacaoOcorrencia(models.Model):
     orgao_pagto = models.CharField(max_length=32, blank=True)
     valor = models.DecimalField(max_digits=12, decimal_places=2, null=True, blank=True)
     status_externo = models.CharField(max_length=2)
-    status_legenda = models.CharField(max_length=200)
     acao = models.CharField(max_length=64, choices=ACOES)
-    mensagem = models.TextField(blank=True)
     criado_em = models.DateTimeField(auto_now_add=True)
 
     cadastro_id = models.IntegerField(null=True, blank=True)
     parcela_id = models.IntegerField(null=True, blank=True)
+    parcela_numero = models.PositiveSmallIntegerField(null=True, blank=True)
+
+    # Chave da linha: (referencia, cpf, matricula). Uma reimportação da mesma
+    # competência só regrava as linhas cujo conteudo_sha mudou. A ocorrência
+    # substituída fica com referencia nula, como histórico da importação que
+    # a gravou (também as de antes da chave existir).
+    referencia = models.DateField(null=True, blank=True)
+    conteudo_sha = models.CharField(max_length=32, blank=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["referencia", "cpf", "matricula"], name="importador_ocorrencia_linha_unica"),
+        ]
+        indexes = [
+            # paginação por keyset da tela de detalhe (importacao_id, id > ?)
+            models.Index(fields=["importacao", "id"], name="importador_ocorr_imp_id_idx"),
+        ]
+
+    # Legenda e mensagem não são gravadas: saem do código do status e da ação
+    @property
+    def status_legenda(self):
+        return legenda_status(self.status_externo)
+
+    @property
+    def mensagem(self):
+        referencia = self.referencia or self.importacao.referencia
+        return mensagem_ocorrencia(self.acao, referencia, self.parcela_numero) or self.get_acao_display()
@@ -1,7 +1,9 @@
+import io
 import re
 import hashlib
 from datetime import date
 from decimal import Decimal
+from itertools import islice
 
 STATUS_MAP = {
     "1": "Lançado e Efetivado",
@@ -13,17 +15,57 @@ STATUS_MAP = {
     "S": "Não Lançado: Compra de Dívida ou Suspensão SEAD",
 }
 
+ENCODING = "latin1"
+
+# Padrões pré-compilados (antes eram recompilados a cada chamada)
+REF_RE = re.compile(r"Referência:\s*(\d{2})/(\d{4}).*Data da Geração:\s*(\d{2})/(\d{2})/(\d{4})")
+COLUNAS_RE = re.compile(r"(STATUS|MATRICULA|NOME|CARGO|ORGAO PAGTO|CPF|VALOR|TOTAL PAGO)")
+LINHA_DADOS_RE = re.compile(r"^\s*([0-9S])\s")
+
+HEADER_PREFIX = "STATUS MATRICULA"
+LEGENDA_PREFIX = "Legenda do Status"
+LINHAS_SUMARIO = ("Órgão Pagamento:", "Total do Status:", "Governo do Estado", "Empresa de Tecnologia")
+
+# A referência deve estar nas primeiras linhas do arquivo
+MAX_LINHAS_REFERENCIA = 40
+
+def legenda_status(status: str) -> str:
+    return STATUS_MAP.get(status, f"Status {status} (desconhecido)")
+
 def sha256_bytes(content: bytes) -> str:
     return hashlib.sha256(content).hexdigest()
 
+def sha256_stream(fh, chunk_size=1024 * 1024) -> str:
+    """Hash de um file object binário lido em blocos; volta o cursor ao início."""
+    h = hashlib.sha256()
+    for chunk in iter(lambda: fh.read(chunk_size), b""):
+        h.update(chunk)
+    fh.seek(0)
+    return h.hexdigest()
+
+def iter_linhas(source, encoding=ENCODING):
+    """
+    Itera as linhas (sem quebra) de bytes, mmap ou file object, uma a uma.
+    Mesma separação de linhas de `str.splitlines()`, sem decodificar o arquivo inteiro.
+    """
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        source = io.BytesIO(source)
+    readline = source.readline
+    while True:
+        raw = readline()
+        if not raw:
+            break
+        if isinstance(raw, bytes):
+            raw = raw.decode(encoding, errors="ignore")
+        yield from raw.splitlines()
+
 def parse_header_ref(lines):
     """
     Ex.: 'Entidade: ... Referência: 05/2025   Data da Geração: 23/05/2025'
     Retorna: referencia=date(2025,5,1), data_geracao=date(2025,5,23)
     """
-    ref_re = re.compile(r"Referência:\s*(\d{2})/(\d{4}).*Data da Geração:\s*(\d{2})/(\d{2})/(\d{4})")
-    for ln in lines[:40]:
-        m = ref_re.search(ln)
+    for ln in islice(lines, MAX_LINHAS_REFERENCIA):
+        m = REF_RE.search(ln)
         if m:
             mm, yyyy = int(m.group(1)), int(m.group(2))
             dg = date(int(m.group(5)), int(m.group(4)), int(m.group(3)))
@@ -37,18 +79,17 @@ def find_columns_index(lines):
     STATUS MATRICULA NOME ... CPF
     e logo abaixo uma linha com '======' delimitando
     """
-    idx = -1
-    for i,ln in enumerate(lines):
-        if ln.strip().startswith("STATUS MATRICULA"):
-            idx = i
-            break
-    if idx == -1:
-        raise ValueError("Não encontrei a linha de cabeçalho das colunas.")
-    header = lines[idx]
+    for i, ln in enumerate(lines):
+        if ln.strip().startswith(HEADER_PREFIX):
+            return colspec_from_header(ln, i)
+    raise ValueError("Não encontrei a linha de cabeçalho das colunas.")
+
+def colspec_from_header(header, idx):
+    """Deriva os fatiamentos de largura fixa a partir da linha de cabeçalho."""
     # Posições aproximadas (por nome). Fatiamento de largura fixa por 'start:end'
     # Monta mapa por ocorrências do início de cada palavra no header:
     cols = {}
-    for m in re.finditer(r"(STATUS|MATRICULA|NOME|CARGO|ORGAO PAGTO|CPF|VALOR|TOTAL PAGO)", header):
+    for m in COLUNAS_RE.finditer(header):
         cols[m.group(1)] = m.start()
 
     # Helpers para normalizar índices
@@ -97,38 +138,75 @@ def find_columns_index(lines):
         "header_index": idx,
     }
 
+def parse_registro(ln, colspec):
+    """Converte uma linha de dados em registro; devolve None para linhas que não são dados."""
+    stripped = ln.strip()
+    if not stripped:
+        return None
+    if stripped.startswith(LINHAS_SUMARIO):
+        return None
+    # linha de dados começa com status (1 digito ou 'S')
+    if not LINHA_DADOS_RE.match(ln):
+        return None
+    status = ln[colspec["status"]].strip()
+    matricula = ln[colspec["matricula"]].strip()
+    nome = ln[colspec["nome"]].strip()
+    valor_s = (ln[colspec["valor"]].strip() or "0").replace(".", "").replace(",", ".")
+    try:
+        valor = Decimal(valor_s)
+    except Exception:
+        valor = None
+    orgao_pagto = ln[colspec["orgao_pagto"]].strip()
+    cpf = ln[colspec["cpf"]].strip()
+    legenda = legenda_status(status)
+    return {
+        "status": status, "legenda": legenda,
+        "matricula": matricula, "cpf": cpf,
+        "nome": nome, "orgao_pagto": orgao_pagto, "valor": valor,
+    }
+
+def iter_registros_stream(linhas, colspec):
+    """
+    Itera registros de um iterador de linhas já posicionado logo após o '======'.
+    Para na 'Legenda do Status' sem precisar reescanear o arquivo.
+    """
+    for ln in linhas:
+        if ln.strip().startswith(LEGENDA_PREFIX):
+            break
+        reg = parse_registro(ln, colspec)
+        if reg is not None:
+            yield reg
+
 def iter_registros(lines, colspec):
     """
     Itera linhas entre cabeçalho e 'Legenda do Status'.
     Ignora linhas em branco e linhas-sumário ('Órgão Pagamento:' / 'Total do Status').
     """
-    stop_idx = None
-    for i,ln in enumerate(lines):
-        if ln.strip().startswith("Legenda do Status"):
-            stop_idx = i
-            break
     start = colspec["header_index"] + 2  # pula header e '======' logo abaixo
-    for ln in lines[start: stop_idx]:
-        if not ln.strip(): 
-            continue
-        if ln.strip().startswith(("Órgão Pagamento:", "Total do Status:", "Governo do Estado", "Empresa de Tecnologia")):
-            continue
-        # linha de dados começa com status (1 digito ou 'S')
-        if not re.match(r"^\s*([0-9S])\s", ln):
-            continue
-        status = ln[colspec["status"]].strip()
-        matricula = ln[colspec["matricula"]].strip()
-        nome = ln[colspec["nome"]].strip()
-        valor_s = (ln[colspec["valor"]].strip() or "0").replace(".", "").replace(",", ".")
-        try:
-            valor = Decimal(valor_s)
-        except Exception:
-            valor = None
-        orgao_pagto = ln[colspec["orgao_pagto"]].strip()
-        cpf = ln[colspec["cpf"]].strip()
-        legenda = STATUS_MAP.get(status, f"Status {status} (desconhecido)")
-        yield {
-            "status": status, "legenda": legenda,
-            "matricula": matricula, "cpf": cpf,
-            "nome": nome, "orgao_pagto": orgao_pagto, "valor": valor,
-        }
+    yield from iter_registros_stream(islice(lines, start, None), colspec)
+
+def abrir_arquivo(source):
+    """
+    Leitura em streaming do TXT de retorno (bytes, mmap ou file object).
+
+    Consome apenas as linhas até o cabeçalho das colunas e retorna
+    (referencia, data_geracao, colspec, registros), onde `registros` é um
+    gerador preguiçoso: a memória fica constante qualquer que seja o tamanho
+    do arquivo e uma prévia só lê o início dele.
+    """
+    linhas = iter_linhas(source)
+    cabecalho = []
+    for ln in linhas:
+        if ln.strip().startswith(HEADER_PREFIX):
+            colspec = colspec_from_header(ln, len(cabecalho))
+            break
+        cabecalho.append(ln)
+    else:
+        colspec = None
+
+    referencia, data_geracao = parse_header_ref(cabecalho)
+    if colspec is None:
+        raise ValueError("Não encontrei a linha de cabeçalho das colunas.")
+
+    next(linhas, None)  # pula a linha '======' logo abaixo do header
+    return referencia, data_geracao, colspec, iter_registros_stream(linhas, colspec)
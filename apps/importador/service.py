@@ -1,120 +1,385 @@
+import io
 import logging
+import multiprocessing
+import operator
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 from datetime import date
-from django.db import transaction
+from functools import reduce
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Q
 from django.utils import timezone
 # Remove unused import since sha256_bytes is used from parser module instead
 
-from .models import ImportacaoContribuicao, ImportacaoOcorrencia
-from .parser import parse_header_ref, find_columns_index, iter_registros, sha256_bytes
+from .models import ImportacaoContribuicao, ImportacaoOcorrencia, StatusImportacao
+from .parser import abrir_arquivo, legenda_status, sha256_bytes, sha256_stream
+from .conciliacao import Totais, conciliar, conciliar_arquivo, inicializar_processo, ler_linhas
+from . import staging
 from apps.cadastros.models import Cadastro, ParcelaAntecipacao
 from apps.cadastros.choices import StatusCadastro, StatusParcela
+from apps.common.models import EtapaJob
 
 log = logging.getLogger("apps")
 
+# Tamanho dos lotes de INSERT/UPDATE enviados ao banco
+BULK_BATCH_SIZE = 2000
+
 def _competencia_eq(dt: date, referencia_primeiro_dia: date) -> bool:
     return dt.year == referencia_primeiro_dia.year and dt.month == referencia_primeiro_dia.month
 
-def importar_contribuicoes(file_bytes: bytes, filename: str, user):
+def carregar_cadastros_efetivados():
     """
-    Executa importação com transação e histórico.
-    Regras:
-    - Só considera cadastros com status EFFECTIVATED
-    - Marca a parcela do mês 'referencia' como Registrada quando status externo == '1'
-    - Para outros status, registra ocorrência sem alterar parcela
+    Mapa (cpf, matricula) -> id de todos os cadastros EFFECTIVATED, em uma única query.
+    Mantém o mesmo desempate do antigo `.first()` (ordering padrão: -created_at).
+    """
+    cadastros = {}
+    qs = Cadastro.objects.filter(status=StatusCadastro.EFFECTIVATED).values_list(
+        "id", "cpf", "matricula_servidor"
+    )
+    for cad_id, cpf, matricula in qs.iterator(chunk_size=5000):
+        cadastros.setdefault((cpf, matricula), cad_id)
+    return cadastros
+
+def carregar_parcelas_do_mes(referencia: date):
     """
-    lines = file_bytes.decode("latin1", errors="ignore").splitlines()
-    referencia, data_geracao = parse_header_ref(lines)
-    colspec = find_columns_index(lines)
+    Mapa cadastro_id -> (parcela_id, numero, status) das parcelas com vencimento
+    na competência, em uma única query. Filtra pela coluna `competencia`
+    (indexada) em vez de `vencimento__year/__month`.
+    Mantém o desempate do antigo `.first()` (ordering padrão: numero).
+    """
+    parcelas = {}
+    qs = ParcelaAntecipacao.objects.filter(
+        cadastro__status=StatusCadastro.EFFECTIVATED,
+        competencia=referencia,
+    ).order_by("cadastro_id", "numero").values_list("id", "cadastro_id", "numero", "status")
+    for parcela_id, cad_id, numero, status in qs.iterator(chunk_size=5000):
+        parcelas.setdefault(cad_id, (parcela_id, numero, status))
+    return parcelas
+
+def carregar_hashes_ocorrencias(referencia: date):
+    """Mapa (cpf, matricula) -> conteudo_sha das ocorrências já gravadas na competência."""
+    qs = ImportacaoOcorrencia.objects.filter(referencia=referencia).values_list("cpf", "matricula", "conteudo_sha")
+    return {(cpf, matricula): sha for cpf, matricula, sha in qs.iterator(chunk_size=5000)}
+
+def liquidar_parcelas(parcela_ids, legenda):
+    """Marca como LIQUIDADA, em lote, as parcelas ainda não liquidadas."""
+    ids = list(parcela_ids)
+    agora = timezone.now()
+    total = 0
+    for i in range(0, len(ids), BULK_BATCH_SIZE):
+        total += ParcelaAntecipacao.objects.filter(
+            id__in=ids[i:i + BULK_BATCH_SIZE]
+        ).exclude(status=StatusParcela.LIQUIDADA).update(
+            status=StatusParcela.LIQUIDADA, atualizado_em=agora, status_origem_txt=legenda
+        )
+    return total
+
+def _sem_progresso(*args, **kwargs):
+    pass
+
+def registrar_importacao(arquivo, filename: str, user, sha256: str = None):
+    """
+    Valida o cabeçalho e a duplicidade do arquivo e cria o registro da
+    importação (status PENDENTE). Só lê o início do arquivo.
+    `sha256` evita recalcular o hash quando ele já é conhecido (arquivo em staging).
+    """
+    if sha256:
+        sha = sha256
+    elif isinstance(arquivo, (bytes, bytearray, memoryview)):
+        sha = sha256_bytes(arquivo)
+    else:
+        sha = sha256_stream(arquivo)
+    referencia, data_geracao, _, _ = abrir_arquivo(arquivo)
+    if hasattr(arquivo, "seek"):
+        arquivo.seek(0)
 
     # Evitar duplicidade por hash do arquivo
-    sha = sha256_bytes(file_bytes)
     if ImportacaoContribuicao.objects.filter(arquivo_sha256=sha).exists():
         raise ValueError("Este arquivo já foi importado (hash duplicado).")
 
-    imp = ImportacaoContribuicao.objects.create(
+    return ImportacaoContribuicao.objects.create(
         referencia=referencia, data_geracao=data_geracao,
         arquivo_nome=filename, arquivo_sha256=sha, criado_por=user
     )
 
-    total_linhas = 0
-    total_proc = total_ok = total_ign = total_nao = 0
+def processar_importacao(imp, arquivo, progresso=None):
+    """
+    Processa as linhas do arquivo de uma importação já registrada.
+    Regras:
+    - Só considera cadastros com status EFFECTIVATED
+    - Marca a parcela do mês 'referencia' como Registrada quando status externo == '1'
+    - Para outros status, registra ocorrência sem alterar parcela
+    - Reimportação da competência: só as linhas que mudaram são regravadas
+      (ver GravadorOcorrencias)
+
+    Cadastros e parcelas da competência são pré-carregados em memória; as
+    ocorrências são gravadas com bulk_create e as liquidações com um único
+    UPDATE em lote, em vez de várias queries por linha do arquivo.
+    `progresso` (opcional) recebe etapa e contadores lidos/conciliados/gravados.
+    """
+    progresso = progresso or _sem_progresso
+    referencia, _, _, registros = abrir_arquivo(arquivo)
+
+    ImportacaoContribuicao.objects.filter(pk=imp.pk).update(status=StatusImportacao.PROCESSANDO)
+    progresso(etapa=EtapaJob.LEITURA, force=True)
+
+    totais = Totais()
 
     with transaction.atomic():
-        for reg in iter_registros(lines, colspec):
-            total_linhas += 1
-            cpf = reg["cpf"].replace(".", "").replace("-", "")
-            matricula = reg["matricula"].strip()
-            status_ext = reg["status"]
-            legenda = reg["legenda"]
-
-            # localizar cadastro efetivado por cpf+matricula
-            cad = Cadastro.objects.filter(
-                cpf=cpf, matricula_servidor=matricula, status=StatusCadastro.EFFECTIVATED
-            ).first()
-
-            if not cad:
-                ImportacaoOcorrencia.objects.create(
-                    importacao=imp, cpf=reg["cpf"], matricula=matricula, nome=reg["nome"],
-                    orgao_pagto=reg["orgao_pagto"], valor=reg["valor"],
-                    status_externo=status_ext, status_legenda=legenda,
-                    acao="CPF_MATRICULA_NAO_ENCONTRADO",
-                    mensagem="Cadastro não encontrado ou não efetivado."
-                )
-                total_nao += 1
-                continue
-
-            # parcela do mês de referência
-            parcela_mes = ParcelaAntecipacao.objects.filter(
-                cadastro=cad
-            ).filter(
-                vencimento__year=referencia.year, vencimento__month=referencia.month
-            ).first()
-
-            if status_ext == "1":
-                if parcela_mes:
-                    if parcela_mes.status != StatusParcela.LIQUIDADA:  # Usar LIQUIDADA em vez de Registrada
-                        parcela_mes.status = StatusParcela.LIQUIDADA     # Usar LIQUIDADA em vez de Registrada
-                        parcela_mes.atualizado_em = timezone.now()
-                        parcela_mes.status_origem_txt = legenda
-                        parcela_mes.save(update_fields=["status","atualizado_em","status_origem_txt"])
-                    ImportacaoOcorrencia.objects.create(
-                        importacao=imp, cpf=reg["cpf"], matricula=matricula, nome=reg["nome"],
-                        orgao_pagto=reg["orgao_pagto"], valor=reg["valor"],
-                        status_externo=status_ext, status_legenda=legenda,
-                        acao="MARCADA_LIQUIDADA",  # Ajustar a ação também
-                        cadastro_id=cad.id, parcela_id=parcela_mes.id,
-                        mensagem=f"Parcela {parcela_mes.numero} marcada como Liquidada pela competência {referencia:%Y-%m}."
-                    )
-                    total_ok += 1
-                else:
-                    ImportacaoOcorrencia.objects.create(
-                        importacao=imp, cpf=reg["cpf"], matricula=matricula, nome=reg["nome"],
-                        orgao_pagto=reg["orgao_pagto"], valor=reg["valor"],
-                        status_externo=status_ext, status_legenda=legenda,
-                        acao="PARCELA_DO_MES_NAO_ENCONTRADA", cadastro_id=cad.id,
-                        mensagem=f"Não foi encontrada parcela com vencimento na competência {referencia:%Y-%m}."
-                    )
-                    total_nao += 1
-            else:
-                # Apenas registra a situação (não altera parcela)
-                ImportacaoOcorrencia.objects.create(
-                    importacao=imp, cpf=reg["cpf"], matricula=matricula, nome=reg["nome"],
-                    orgao_pagto=reg["orgao_pagto"], valor=reg["valor"],
-                    status_externo=status_ext, status_legenda=legenda,
-                    acao="IGNORADA_STATUS", cadastro_id=cad.id if cad else None,
-                    mensagem="Status externo não é '1 - Lançado e Efetivado'."
-                )
-                total_ign += 1
-
-            total_proc += 1
-
-        imp.total_linhas = total_linhas
-        imp.total_processados = total_proc
-        imp.total_atualizados = total_ok
-        imp.total_ignorados = total_ign
-        imp.total_nao_encontrados = total_nao
-        imp.save()
-
-    log.info("Importação %s finalizada: linhas=%s, processados=%s, atualizados=%s, ignorados=%s, nao_encontrados=%s",
-             imp.id, total_linhas, total_proc, total_ok, total_ign, total_nao)
+        cadastros = carregar_cadastros_efetivados()
+        parcelas_mes = carregar_parcelas_do_mes(referencia)
+        gravador = GravadorOcorrencias(imp, referencia)
+        progresso(etapa=EtapaJob.CONCILIACAO)
+
+        for campos, parcela_id in conciliar(registros, referencia, cadastros, parcelas_mes):
+            totais.add(campos["acao"])
+            if gravador.adicionar(campos, parcela_id):
+                progresso(lidos=totais.linhas, conciliados=totais.processados, gravados=gravador.gravados)
+
+        progresso(etapa=EtapaJob.GRAVACAO, total=totais.linhas, lidos=totais.linhas, conciliados=totais.processados)
+        gravador.finalizar()
+        _concluir(imp, totais, gravador.inalterados)
+
+    progresso(gravados=gravador.gravados, force=True)
     return imp
+
+class GravadorOcorrencias:
+    """
+    Grava as ocorrências de uma importação em blocos, pela chave
+    (referencia, cpf, matricula). Linhas cujo conteudo_sha é igual ao já
+    gravado na competência são puladas (não regravam a ocorrência nem
+    liquidam parcela de novo), então um arquivo corrigido só toca as linhas
+    que mudaram.
+
+    Chaves novas entram por COPY (copy_expert, buffer em memória); chaves já
+    existentes na competência usam INSERT ... ON CONFLICT DO UPDATE. A
+    ocorrência de uma importação anterior não muda de dono: sai da chave
+    (referencia nula) e fica no histórico da importação dela; a nova linha é
+    da importação atual.
+    """
+    CAMPOS_ATUALIZADOS = [
+        "nome", "orgao_pagto", "valor", "status_externo",
+        "acao", "cadastro_id", "parcela_id", "parcela_numero", "conteudo_sha",
+    ]
+    COLUNAS_COPY = (
+        "importacao_id", "referencia", "cpf", "matricula", "nome", "orgao_pagto", "valor",
+        "status_externo", "acao", "criado_em", "cadastro_id", "parcela_id", "parcela_numero", "conteudo_sha",
+    )
+
+    def __init__(self, imp, referencia):
+        self.imp = imp
+        self.referencia = referencia
+        self.anteriores = carregar_hashes_ocorrencias(referencia)
+        self.no_banco = set(self.anteriores)
+        self.novas = {}  # (cpf, matricula) -> campos (COPY)
+        self.alteradas = {}  # (cpf, matricula) -> ImportacaoOcorrencia (upsert)
+        self.liquidar = {}  # parcela_id -> legenda
+        self.gravados = 0
+        self.inalterados = 0
+        self.usar_copy = connection.vendor == "postgresql"
+
+    def adicionar(self, campos, parcela_id) -> bool:
+        """Enfileira a linha; retorna True quando um bloco foi gravado."""
+        chave = (campos["cpf"], campos["matricula"])
+        if self.anteriores.get(chave) == campos["conteudo_sha"]:
+            self.inalterados += 1
+            return False
+        self.anteriores[chave] = campos["conteudo_sha"]
+        gravou = False
+        # a mesma chave não pode aparecer duas vezes no mesmo bloco
+        if chave in self.novas or chave in self.alteradas or len(self.novas) + len(self.alteradas) >= BULK_BATCH_SIZE:
+            self._gravar()
+            gravou = True
+        if chave in self.no_banco or not self.usar_copy:
+            self.alteradas[chave] = ImportacaoOcorrencia(importacao=self.imp, referencia=self.referencia, **campos)
+        else:
+            self.novas[chave] = campos
+        self.no_banco.add(chave)
+        if parcela_id is not None:
+            self.liquidar.setdefault(parcela_id, legenda_status(campos["status_externo"]))
+        return gravou
+
+    def _gravar(self):
+        if self.novas:
+            self._copiar(self.novas.values())
+            self.gravados += len(self.novas)
+            self.novas = {}
+        if self.alteradas:
+            self._arquivar_anteriores(self.alteradas)
+            ImportacaoOcorrencia.objects.bulk_create(
+                self.alteradas.values(),
+                update_conflicts=True,
+                unique_fields=["referencia", "cpf", "matricula"],
+                update_fields=self.CAMPOS_ATUALIZADOS,
+            )
+            self.gravados += len(self.alteradas)
+            self.alteradas = {}
+
+    def _arquivar_anteriores(self, chaves):
+        """Tira da chave as ocorrências de outras importações que serão substituídas."""
+        filtro = reduce(operator.or_, (Q(cpf=cpf, matricula=matricula) for cpf, matricula in chaves))
+        ImportacaoOcorrencia.objects.filter(filtro, referencia=self.referencia).exclude(
+            importacao=self.imp
+        ).update(referencia=None)
+
+    def _copiar(self, linhas):
+        comuns = {"importacao_id": self.imp.pk, "referencia": self.referencia, "criado_em": timezone.now()}
+        buf = io.StringIO()
+        for campos in linhas:
+            buf.write("\t".join(_valor_copy(comuns[c] if c in comuns else campos[c]) for c in self.COLUNAS_COPY))
+            buf.write("\n")
+        buf.seek(0)
+        with connection.cursor() as cur:
+            cur.copy_expert(
+                f"COPY {ImportacaoOcorrencia._meta.db_table} ({', '.join(self.COLUNAS_COPY)}) FROM STDIN",
+                buf,
+            )
+
+    def finalizar(self):
+        self._gravar()
+        _gravar_liquidacoes(self.liquidar)
+
+def _valor_copy(valor):
+    """Valor no formato texto do COPY (\\N para nulo, escapes de tab/quebra/barra)."""
+    if valor is None:
+        return "\\N"
+    return (
+        str(valor).replace("\\", "\\\\").replace("\t", "\\t")
+        .replace("\n", "\\n").replace("\r", "\\r")
+    )
+
+def _gravar_liquidacoes(liquidar):
+    """liquidar: parcela_id -> legenda. Um UPDATE em lote por legenda."""
+    # Todas as linhas com status '1' compartilham a mesma legenda
+    por_legenda = {}
+    for parcela_id, legenda in liquidar.items():
+        por_legenda.setdefault(legenda, []).append(parcela_id)
+    for legenda, ids in por_legenda.items():
+        liquidar_parcelas(ids, legenda)
+
+def _concluir(imp, totais, inalterados=0):
+    imp.total_linhas = totais.linhas
+    imp.total_processados = totais.processados
+    imp.total_atualizados = totais.atualizados
+    imp.total_ignorados = totais.ignorados
+    imp.total_nao_encontrados = totais.nao_encontrados
+    imp.total_inalterados = inalterados
+    imp.status = StatusImportacao.CONCLUIDO
+    imp.erro = ""
+    imp.save()
+    log.info("Importação %s finalizada: linhas=%s, processados=%s, atualizados=%s, ignorados=%s, nao_encontrados=%s, inalterados=%s",
+             imp.id, totais.linhas, totais.processados, totais.atualizados, totais.ignorados, totais.nao_encontrados, inalterados)
+
+def importar_contribuicoes(arquivo, filename: str, user, sha256: str = None):
+    """
+    Executa importação com transação e histórico (registro + processamento, na mesma chamada).
+    `arquivo` pode ser bytes ou um file object binário (lido em streaming).
+    """
+    imp = registrar_importacao(arquivo, filename, user, sha256=sha256)
+    return processar_importacao(imp, arquivo)
+
+def executar_job(job, progresso):
+    """Handler do job CONTRIBUICOES: processa o arquivo em staging da importação."""
+    imp = ImportacaoContribuicao.objects.get(pk=job.objeto_id)
+    sha = job.parametros["sha256"]
+    try:
+        with staging.open_staged(sha) as fh:
+            processar_importacao(imp, fh, progresso=progresso)
+    except Exception as ex:
+        ImportacaoContribuicao.objects.filter(pk=imp.pk).update(status=StatusImportacao.ERRO, erro=str(ex))
+        raise
+    staging.discard(sha)
+    return imp
+
+# ---- Importação em lote (vários arquivos/competências) ----
+
+def _processos_lote(qtd_arquivos):
+    maximo = getattr(settings, "IMPORTADOR_LOTE_PROCESSOS", None) or os.cpu_count() or 1
+    return max(1, min(maximo, qtd_arquivos))
+
+def processar_lote(itens, progresso=None):
+    """
+    Processa várias importações já registradas. `itens`: lista de (imp, caminho).
+
+    A leitura e a conciliação de cada arquivo rodam em paralelo em um pool de
+    processos (mapa de cadastros carregado uma vez e enviado a cada processo),
+    que gravam as linhas conciliadas em arquivo temporário; a gravação no banco
+    é feita só aqui, por um único escritor, arquivo a arquivo em ordem de
+    competência, uma transação por arquivo, lendo as linhas em streaming. No
+    máximo um arquivo por processo fica em andamento: o próximo é submetido a
+    cada arquivo gravado. Um arquivo com erro fica com status ERRO sem
+    impedir os demais.
+    Retorna a lista de (imp, mensagem de erro) dos arquivos que falharam.
+    """
+    progresso = progresso or _sem_progresso
+    itens = sorted(itens, key=lambda it: (it[0].referencia, it[0].data_geracao or date.min, it[0].pk))
+    ImportacaoContribuicao.objects.filter(pk__in=[imp.pk for imp, _ in itens]).update(
+        status=StatusImportacao.PROCESSANDO
+    )
+    progresso(etapa=EtapaJob.LEITURA, force=True)
+
+    cadastros = carregar_cadastros_efetivados()
+    # Cada competência só toca as parcelas do próprio mês; arquivos repetidos da
+    # mesma competência não divergem porque liquidar_parcelas ignora as já liquidadas.
+    parcelas = {ref: carregar_parcelas_do_mes(ref) for ref in {imp.referencia for imp, _ in itens}}
+    progresso(etapa=EtapaJob.CONCILIACAO)
+
+    erros = []
+    lidos = conciliados = gravados = 0
+    processos = _processos_lote(len(itens))
+    pool = ProcessPoolExecutor(
+        max_workers=processos,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=inicializar_processo,
+        initargs=(cadastros,),
+    )
+    with pool:
+        pendentes = iter(itens)
+        em_andamento = deque()
+
+        def submeter_proximo():
+            item = next(pendentes, None)
+            if item is not None:
+                imp, caminho = item
+                em_andamento.append((imp, pool.submit(conciliar_arquivo, str(caminho), parcelas[imp.referencia])))
+
+        for _ in range(processos):
+            submeter_proximo()
+        while em_andamento:
+            imp, futuro = em_andamento.popleft()
+            try:
+                saida, totais = futuro.result()
+                lidos += totais.linhas
+                conciliados += totais.processados
+                progresso(etapa=EtapaJob.GRAVACAO, lidos=lidos, conciliados=conciliados)
+                with transaction.atomic():
+                    gravador = GravadorOcorrencias(imp, imp.referencia)
+                    for campos, parcela_id in ler_linhas(saida):
+                        gravador.adicionar(campos, parcela_id)
+                    gravador.finalizar()
+                    _concluir(imp, totais, gravador.inalterados)
+                gravados += gravador.gravados
+                progresso(gravados=gravados)
+            except Exception as ex:
+                log.exception("Importação %s (lote) falhou", imp.id)
+                ImportacaoContribuicao.objects.filter(pk=imp.pk).update(status=StatusImportacao.ERRO, erro=str(ex))
+                erros.append((imp, str(ex)))
+            submeter_proximo()
+
+    progresso(lidos=lidos, conciliados=conciliados, gravados=gravados, force=True)
+    return erros
+
+def executar_job_lote(job, progresso):
+    """Handler do job LOTE_CONTRIBUICOES: parametros["importacoes"] = [[imp_id, sha256], ...]."""
+    shas = dict(job.parametros["importacoes"])
+    imps = ImportacaoContribuicao.objects.filter(pk__in=shas)
+    itens = [(imp, staging.staged_path(shas[imp.pk])) for imp in imps]
+    erros = processar_lote(itens, progresso=progresso)
+    falhas = {imp.pk for imp, _ in erros}
+    for imp, _ in itens:
+        if imp.pk not in falhas:
+            staging.discard(shas[imp.pk])
+    if erros:
+        raise RuntimeError("; ".join(f"{imp.arquivo_nome}: {msg}" for imp, msg in erros))
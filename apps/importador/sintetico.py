@@ -0,0 +1,117 @@
+"""
+Gerador de arquivos TXT de retorno sintéticos, no mesmo layout de largura fixa
+lido pelo parser: cabeçalho com Referência/Data da Geração, linha de colunas,
+régua '=====', quebras de página, subtotais por órgão e legenda.
+
+A linha `i` usa sempre o mesmo CPF/matrícula (cpf_sintetico/matricula_sintetica),
+o que permite ao benchmark semear cadastros que casam com parte do arquivo.
+"""
+import random
+from datetime import date
+from decimal import Decimal
+
+from .parser import ENCODING, STATUS_MAP
+
+LARGURAS = (("STATUS", 7), ("MATRICULA", 11), ("NOME", 41), ("VALOR", 12), ("ORGAO PAGTO", 13))
+CABECALHO_COLUNAS = "".join(f"{nome:<{largura}}" for nome, largura in LARGURAS) + "CPF"
+REGUA = "=" * (len(CABECALHO_COLUNAS) + 14)
+
+LINHAS_POR_PAGINA = 60
+
+ORGAOS = ("SEDUC", "SESAPI", "SSP", "SEFAZ", "SEADPREV", "DETRAN", "PM-PI", "SEJUS", "SEMAR", "ADAPI")
+PRENOMES = ("MARIA", "JOSE", "ANTONIO", "FRANCISCA", "JOAO", "ANA", "FRANCISCO", "RAIMUNDA",
+            "PAULO", "LUCIA", "CARLOS", "ANTONIA", "PEDRO", "CONCEICAO", "MANOEL")
+SOBRENOMES = ("SILVA", "SOUSA", "OLIVEIRA", "SANTOS", "PEREIRA", "ARAUJO", "CARVALHO",
+              "LIMA", "RODRIGUES", "ALVES", "NASCIMENTO", "COSTA", "FERREIRA", "MOURA")
+
+# Distribuição aproximada dos status de um retorno real: a maioria efetivada
+PESOS_STATUS = {"1": 85, "2": 6, "3": 3, "4": 2, "5": 1, "6": 1, "S": 2}
+
+
+def cpf_sintetico(i: int) -> str:
+    """CPF (11 dígitos, com dígitos verificadores válidos) da linha `i`."""
+    base = [int(d) for d in f"{(i * 7919 + 100000000) % 10 ** 9:09d}"]
+    for tamanho in (9, 10):
+        soma = sum(d * p for d, p in zip(base, range(tamanho + 1, 1, -1)))
+        resto = soma * 10 % 11
+        base.append(0 if resto == 10 else resto)
+    return "".join(map(str, base))
+
+
+def matricula_sintetica(i: int) -> str:
+    return f"{1000000 + i:07d}{i % 10}"
+
+
+def formatar_cpf(cpf: str) -> str:
+    return f"{cpf[:3]}.{cpf[3:6]}.{cpf[6:9]}-{cpf[9:]}"
+
+
+def formatar_valor(valor: Decimal) -> str:
+    inteiro, centavos = f"{valor:.2f}".split(".")
+    return f"{int(inteiro):,}".replace(",", ".") + "," + centavos
+
+
+def _cabecalho_pagina(referencia: date, data_geracao: date, pagina: int):
+    yield "Governo do Estado do Piauí"
+    yield f"Empresa de Tecnologia da Informação do Estado do Piauí{'Página: ':>30}{pagina}"
+    yield f"Entidade: ABASE   Referência: {referencia:%m/%Y}   Data da Geração: {data_geracao:%d/%m/%Y}"
+    yield ""
+    yield CABECALHO_COLUNAS
+    yield REGUA
+
+
+def gerar_linhas(qtd: int, referencia: date, data_geracao: date = None, semente: int = 0):
+    """Gera as linhas (str, sem quebra) de um arquivo com `qtd` registros."""
+    rnd = random.Random(semente)
+    data_geracao = data_geracao or referencia.replace(day=23)
+    status_pop, status_pesos = zip(*PESOS_STATUS.items())
+
+    # registros agrupados por órgão, como no relatório original
+    por_orgao = {}
+    for i in range(qtd):
+        por_orgao.setdefault(ORGAOS[rnd.randrange(len(ORGAOS))], []).append(i)
+
+    pagina = 1
+    na_pagina = 0
+    yield from _cabecalho_pagina(referencia, data_geracao, pagina)
+    for orgao in sorted(por_orgao):
+        total_orgao = Decimal("0")
+        for i in por_orgao[orgao]:
+            if na_pagina == LINHAS_POR_PAGINA:
+                pagina += 1
+                na_pagina = 0
+                yield ""
+                yield from _cabecalho_pagina(referencia, data_geracao, pagina)
+            status = rnd.choices(status_pop, status_pesos)[0]
+            nome = f"{rnd.choice(PRENOMES)} {rnd.choice(SOBRENOMES)} {rnd.choice(SOBRENOMES)}"
+            valor = Decimal(rnd.randrange(3000, 50000)) / 100
+            total_orgao += valor
+            yield (
+                f"{status:<7}{matricula_sintetica(i):<11}{nome[:40]:<41}"
+                f"{formatar_valor(valor):<12}{orgao:<13}{formatar_cpf(cpf_sintetico(i))}"
+            )
+            na_pagina += 1
+        yield f"Órgão Pagamento: {orgao:<12} Quantidade: {len(por_orgao[orgao]):>6}   Total: {formatar_valor(total_orgao)}"
+        na_pagina += 1
+    yield f"Total do Status: {qtd}"
+    yield ""
+    yield "Legenda do Status"
+    for codigo, descricao in STATUS_MAP.items():
+        yield f"{codigo} - {descricao}"
+
+
+def gerar_bytes(qtd: int, referencia: date, data_geracao: date = None, semente: int = 0,
+                quebra: str = "\r\n") -> bytes:
+    """Arquivo completo em memória, codificado como o original (latin1)."""
+    linhas = gerar_linhas(qtd, referencia, data_geracao, semente)
+    return quebra.join(linhas).encode(ENCODING) + quebra.encode()
+
+
+def gerar_arquivo(caminho, qtd: int, referencia: date, data_geracao: date = None, semente: int = 0,
+                  quebra: str = "\r\n") -> int:
+    """Grava o arquivo em disco, linha a linha. Retorna o tamanho em bytes."""
+    tamanho = 0
+    with open(caminho, "wb") as fh:
+        for ln in gerar_linhas(qtd, referencia, data_geracao, semente):
+            tamanho += fh.write((ln + quebra).encode(ENCODING))
+    return tamanho
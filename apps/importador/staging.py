@@ -0,0 +1,155 @@
+"""
+Área de staging em disco para uploads do importador.
+
+O arquivo enviado na prévia é gravado uma única vez em _private/, endereçado
+pelo sha256 do conteúdo, junto com o cabeçalho já interpretado. A sessão guarda
+apenas o hash; a confirmação reabre o arquivo do disco, sem novo upload e sem
+base64 trafegando na linha da sessão.
+"""
+import hashlib
+import json
+import os
+import re
+import tempfile
+import time
+from datetime import date, datetime, timezone as dt_timezone
+from pathlib import Path
+
+from django.conf import settings
+from django.db.models import Q
+
+from apps.common.models import ImportJob, StatusJob, TipoJob
+
+SESSION_KEY = "importador_upload_sha"
+
+# Tempo de vida padrão de um arquivo em staging (horas)
+DEFAULT_TTL_HOURS = 24
+
+_SHA_RE = re.compile(r"^[0-9a-f]{64}$")
+
+
+def staging_dir() -> Path:
+    base = getattr(settings, "PRIVATE_MEDIA_ROOT", Path(settings.BASE_DIR) / "_private")
+    return Path(base) / "importador_staging"
+
+
+def ttl_seconds() -> int:
+    return int(getattr(settings, "IMPORTADOR_STAGING_TTL_HOURS", DEFAULT_TTL_HOURS) * 3600)
+
+
+def _paths(sha: str):
+    if not _SHA_RE.match(sha or ""):
+        raise ValueError("Hash de arquivo inválido.")
+    d = staging_dir()
+    return d / f"{sha}.txt", d / f"{sha}.json"
+
+
+def stage_upload(uploaded_file) -> str:
+    """
+    Grava o upload em disco em blocos, calculando o sha256 no caminho.
+    Retorna o hash; se o mesmo conteúdo já estiver em staging, apenas renova o TTL.
+    """
+    d = staging_dir()
+    d.mkdir(parents=True, exist_ok=True)
+    h = hashlib.sha256()
+    fd, tmp_path = tempfile.mkstemp(dir=d, suffix=".part")
+    try:
+        with os.fdopen(fd, "wb") as out:
+            for chunk in uploaded_file.chunks():
+                h.update(chunk)
+                out.write(chunk)
+        sha = h.hexdigest()
+        data_path, _ = _paths(sha)
+        os.replace(tmp_path, data_path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+    return sha
+
+
+def save_meta(sha: str, filename: str, referencia: date, data_geracao: date):
+    """Guarda o nome original e o cabeçalho já interpretado na prévia."""
+    _, meta_path = _paths(sha)
+    meta = {
+        "filename": filename,
+        "referencia": referencia.isoformat(),
+        "data_geracao": data_geracao.isoformat() if data_geracao else None,
+    }
+    meta_path.write_text(json.dumps(meta, ensure_ascii=False), encoding="utf-8")
+
+
+def load_meta(sha: str):
+    """Metadados do arquivo em staging, ou None se expirado/inexistente."""
+    data_path, meta_path = _paths(sha)
+    if not data_path.exists() or not meta_path.exists() or _expired(data_path):
+        return None
+    meta = json.loads(meta_path.read_text(encoding="utf-8"))
+    meta["referencia"] = date.fromisoformat(meta["referencia"])
+    if meta.get("data_geracao"):
+        meta["data_geracao"] = date.fromisoformat(meta["data_geracao"])
+    return meta
+
+
+def staged_path(sha: str) -> Path:
+    """Caminho do arquivo em staging (usado pelos processos da importação em lote)."""
+    data_path, _ = _paths(sha)
+    return data_path
+
+
+def open_staged(sha: str):
+    """Abre o arquivo em staging para leitura binária."""
+    return open(staged_path(sha), "rb")
+
+
+def discard(sha: str):
+    for p in _paths(sha):
+        try:
+            p.unlink()
+        except FileNotFoundError:
+            pass
+
+
+def _expired(path: Path, now: float = None) -> bool:
+    now = time.time() if now is None else now
+    return path.stat().st_mtime < now - ttl_seconds()
+
+
+def shas_em_uso(now: float = None) -> set:
+    """
+    Hashes ainda necessários a jobs de importação: os na fila ou em execução
+    e os que falharam há menos de um TTL (o arquivo é mantido para nova
+    tentativa).
+    """
+    now = time.time() if now is None else now
+    limite = datetime.fromtimestamp(now - ttl_seconds(), tz=dt_timezone.utc)
+    jobs = ImportJob.objects.filter(
+        tipo__in=[TipoJob.CONTRIBUICOES, TipoJob.LOTE_CONTRIBUICOES]
+    ).filter(
+        Q(status__in=[StatusJob.PENDENTE, StatusJob.EXECUTANDO])
+        | Q(status=StatusJob.ERRO, concluido_em__gte=limite)
+    )
+    shas = set()
+    for tipo, parametros in jobs.values_list("tipo", "parametros"):
+        if tipo == TipoJob.CONTRIBUICOES:
+            shas.add(parametros.get("sha256"))
+        else:
+            shas.update(sha for _, sha in parametros.get("importacoes", []))
+    return shas
+
+
+def cleanup(now: float = None) -> int:
+    """
+    Remove arquivos em staging além do TTL (e sobras de uploads
+    interrompidos), exceto os ainda usados por jobs (ver shas_em_uso).
+    """
+    d = staging_dir()
+    if not d.exists():
+        return 0
+    em_uso = shas_em_uso(now)
+    removidos = 0
+    for p in d.iterdir():
+        if p.is_file() and p.stem not in em_uso and _expired(p, now):
+            p.unlink()
+            removidos += 1
+    return removidos
@@ -6,6 +6,10 @@ app_name = 'importador'
 urlpatterns = [
     path("", views.importar, name="importar"),
     path("importar/", views.importar, name="importar-alt"),
+    path("lote/", views.importar_lote, name="importar_lote"),
     path("listar/", views.listar, name="listar"),
     path("<int:pk>/", views.detalhe, name="detalhe"),
+    path("<int:pk>/progresso/", views.progresso, name="progresso"),
+    path("<int:pk>/ocorrencias/", views.ocorrencias, name="ocorrencias"),
+    path("<int:pk>/ocorrencias.csv", views.ocorrencias_csv, name="ocorrencias_csv"),
 ]
\ No newline at end of file
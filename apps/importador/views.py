@@ -1,12 +1,21 @@
+import csv
 import logging
-from django.shortcuts import render, redirect
+from collections import Counter
+
+from django.db.models import Count, Q
+from django.http import StreamingHttpResponse
+from django.shortcuts import get_object_or_404, render, redirect
+from django.urls import reverse
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from django.views.decorators.http import require_http_methods
 
-from .forms import ImportarTXTForm
-from .parser import parse_header_ref, find_columns_index, iter_registros, sha256_bytes
-from .service import importar_contribuicoes
+from .forms import ImportarTXTForm, ImportarLoteTXTForm
+from .parser import abrir_arquivo, legenda_status
+from . import staging
+from .service import registrar_importacao
+from apps.common import jobs
+from apps.common.models import ImportJob, TipoJob, StatusJob
 
 log = logging.getLogger("apps")
 
@@ -20,21 +29,27 @@ def importar(request):
         arquivo_hash = request.POST.get('arquivo_hash')
         modo = request.POST.get('modo')
         
-        # If confirming from preview, get file from session
+        # If confirming from preview, reopen the staged file (session keeps only the hash)
         if modo == "confirm" and arquivo_hash:
-            stored_data = request.session.get(f'upload_file_{arquivo_hash}')
-            if stored_data:
+            meta = None
+            if request.session.get(staging.SESSION_KEY) == arquivo_hash:
+                meta = staging.load_meta(arquivo_hash)
+            if meta:
                 try:
-                    import base64
-                    content = base64.b64decode(stored_data['content'])
-                    filename = stored_data['filename']
-                    
-                    imp = importar_contribuicoes(content, filename, request.user)
-                    messages.success(request, f"Importado com sucesso. Atualizados: {imp.total_atualizados}, ignorados: {imp.total_ignorados}, não encontrados: {imp.total_nao_encontrados}.")
-                    
-                    # Clean up session data
-                    del request.session[f'upload_file_{arquivo_hash}']
-                    
+                    with staging.open_staged(arquivo_hash) as fh:
+                        imp = registrar_importacao(fh, meta['filename'], request.user, sha256=arquivo_hash)
+                    # O processamento roda no worker; o arquivo em staging é removido ao final do job
+                    job = jobs.enfileirar(TipoJob.CONTRIBUICOES, imp.id, {"sha256": arquivo_hash}, request.user)
+                    del request.session[staging.SESSION_KEY]
+
+                    if job.status == StatusJob.CONCLUIDO:
+                        imp.refresh_from_db()
+                        messages.success(request, f"Importado com sucesso. Atualizados: {imp.total_atualizados}, ignorados: {imp.total_ignorados}, não encontrados: {imp.total_nao_encontrados}.")
+                    elif job.status == StatusJob.ERRO:
+                        messages.error(request, f"Falha ao importar: {job.erro}")
+                    else:
+                        messages.info(request, "Importação enviada para processamento. Acompanhe o progresso nesta página.")
+
                     return redirect("importador:detalhe", pk=imp.id)
                 except Exception as ex:
                     messages.error(request, f"Falha ao importar: {ex}")
@@ -55,23 +70,19 @@ def importar(request):
             return render(request, "importador/importar.html", context, status=400)
 
         f = form.cleaned_data["arquivo"]
-        content = f.read()
 
         # Always do preview mode (removed modo selection)
         try:
-            import base64
-            lines = content.decode("latin1", errors="ignore").splitlines()
-            ref, data_gen = parse_header_ref(lines)
-            colspec = find_columns_index(lines)
-            # pega só as 30 primeiras para prévia
-            regs = list(r for i,r in zip(range(30), iter_registros(lines, colspec)))
-            sha = sha256_bytes(content)
-            
-            # Store file in session for later confirmation
-            request.session[f'upload_file_{sha}'] = {
-                'content': base64.b64encode(content).decode('utf-8'),
-                'filename': f.name
-            }
+            # Grava o arquivo em staging (disco) e lê só o início para a prévia
+            sha = staging.stage_upload(f)
+            with staging.open_staged(sha) as fh:
+                ref, data_gen, colspec, registros = abrir_arquivo(fh)
+                # pega só as 30 primeiras para prévia (lê apenas o início do arquivo)
+                regs = list(r for i,r in zip(range(30), registros))
+            staging.save_meta(sha, f.name, ref, data_gen)
+
+            # Session keeps only the hash of the staged file
+            request.session[staging.SESSION_KEY] = sha
             
             ctx = {"form": form, "preview": regs, "referencia": ref, "data_geracao": data_gen, "sha256": sha}
             messages.info(request, f"Pré-visualização: {len(regs)} linhas exibidas (arquivo hash {sha[:12]}…).")
@@ -79,6 +90,7 @@ def importar(request):
         except Exception as ex:
             messages.error(request, f"Erro na leitura: {ex}")
             log.exception("Prévia do importador falhou")
+            from .models import ImportacaoContribuicao
             recent_imports = ImportacaoContribuicao.objects.select_related("criado_por").order_by("-criado_em")[:20]
             context = {"form": form, "recent_imports": recent_imports}
             return render(request, "importador/importar.html", context, status=400)
@@ -95,15 +107,173 @@ def importar(request):
     }
     return render(request, "importador/importar.html", context)
 
+@login_required
+@require_http_methods(["POST"])
+def importar_lote(request):
+    """
+    Vários TXT (competências diferentes) de uma vez: cada arquivo vira uma
+    ImportacaoContribuicao (mesma validação de cabeçalho e de hash duplicado)
+    e o lote é processado por um único job.
+    """
+    form = ImportarLoteTXTForm(request.POST, request.FILES)
+    if not form.is_valid():
+        for erro in form.errors.get("arquivos", []):
+            messages.error(request, erro)
+        return redirect("importador:importar")
+
+    importacoes = []
+    for f in form.cleaned_data["arquivos"]:
+        try:
+            sha = staging.stage_upload(f)
+            with staging.open_staged(sha) as fh:
+                imp = registrar_importacao(fh, f.name, request.user, sha256=sha)
+            importacoes.append([imp.id, sha])
+        except Exception as ex:
+            messages.error(request, f"{f.name}: {ex}")
+
+    if not importacoes:
+        return redirect("importador:importar")
+
+    ids = [imp_id for imp_id, _ in importacoes]
+    job = jobs.enfileirar(
+        TipoJob.LOTE_CONTRIBUICOES, ids[0], {"importacoes": importacoes, "ids": ids}, request.user
+    )
+    if job.status == StatusJob.ERRO:
+        messages.error(request, f"Falha ao importar: {job.erro}")
+    elif job.status == StatusJob.CONCLUIDO:
+        messages.success(request, f"{len(ids)} arquivo(s) importado(s) com sucesso.")
+    else:
+        messages.info(request, f"{len(ids)} arquivo(s) enviados para processamento em lote.")
+    return redirect("importador:listar")
+
+def _job_da_importacao(pk):
+    """Último job que processa a importação: individual ou em lote."""
+    candidatos = [
+        jobs.job_atual(TipoJob.CONTRIBUICOES, pk),
+        ImportJob.objects.filter(
+            tipo=TipoJob.LOTE_CONTRIBUICOES, parametros__ids__contains=[pk]
+        ).order_by("-id").first(),
+    ]
+    candidatos = [j for j in candidatos if j is not None]
+    return max(candidatos, key=lambda j: j.id) if candidatos else None
+
+# Linhas por página na tabela de ocorrências (paginação por keyset em id)
+PAGINA_OCORRENCIAS = 100
+
+def _ocorrencias_filtradas(imp, params):
+    """Ocorrências da importação com os filtros da tela (acao, status, orgao, q)."""
+    qs = imp.ocorrencias.all()
+    if params.get("acao"):
+        qs = qs.filter(acao=params["acao"])
+    if params.get("status"):
+        qs = qs.filter(status_externo=params["status"])
+    if params.get("orgao"):
+        qs = qs.filter(orgao_pagto=params["orgao"])
+    busca = (params.get("q") or "").strip()
+    if busca:
+        qs = qs.filter(Q(nome__icontains=busca) | Q(cpf__icontains=busca) | Q(matricula__icontains=busca))
+    return qs.order_by("id")
+
+def _resumo_ocorrencias(imp):
+    """
+    Contagens por ação, status externo e órgão, a partir de uma única query
+    agregada (GROUP BY acao, status_externo, orgao_pagto).
+    """
+    from .models import ImportacaoOcorrencia
+    por_acao, por_status, por_orgao = Counter(), Counter(), Counter()
+    grupos = (
+        imp.ocorrencias.order_by()
+        .values("acao", "status_externo", "orgao_pagto")
+        .annotate(total=Count("id"))
+        .values_list("acao", "status_externo", "orgao_pagto", "total")
+    )
+    for acao, status, orgao, total in grupos:
+        por_acao[acao] += total
+        por_status[status] += total
+        por_orgao[orgao] += total
+    rotulos = dict(ImportacaoOcorrencia.ACOES)
+    return {
+        "acoes": [(acao, rotulos.get(acao, acao), n) for acao, n in por_acao.most_common()],
+        "status": [(st, legenda_status(st), n) for st, n in por_status.most_common()],
+        "orgaos": [(orgao, n) for orgao, n in por_orgao.most_common()],
+        "total": sum(por_acao.values()),
+    }
+
+def _pagina_ocorrencias(imp, params):
+    """Próxima página (keyset: id > apos) e a URL do fragmento que carrega a seguinte."""
+    qs = _ocorrencias_filtradas(imp, params).defer("conteudo_sha")
+    apos = params.get("apos", "")
+    if apos.isdigit():
+        qs = qs.filter(id__gt=int(apos))
+    ocorrencias = list(qs[:PAGINA_OCORRENCIAS + 1])
+    proxima_url = None
+    if len(ocorrencias) > PAGINA_OCORRENCIAS:
+        ocorrencias = ocorrencias[:PAGINA_OCORRENCIAS]
+        proximos = params.copy()
+        proximos["apos"] = ocorrencias[-1].id
+        proxima_url = f"{reverse('importador:ocorrencias', args=[imp.pk])}?{proximos.urlencode()}"
+    return {"ocorrencias": ocorrencias, "proxima_url": proxima_url}
+
 @login_required
 def detalhe(request, pk):
     from .models import ImportacaoContribuicao
-    imp = ImportacaoContribuicao.objects.select_related("criado_por").prefetch_related("ocorrencias").get(pk=pk)
-    return render(request, "importador/detalhe.html", {"imp": imp})
+    imp = get_object_or_404(ImportacaoContribuicao.objects.select_related("criado_por"), pk=pk)
+    params = request.GET.copy()
+    params.pop("apos", None)
+    context = {
+        "imp": imp,
+        "job": _job_da_importacao(imp.pk),
+        "resumo": _resumo_ocorrencias(imp),
+        "filtros": params,
+        **_pagina_ocorrencias(imp, params),
+    }
+    return render(request, "importador/detalhe.html", context)
 
 @login_required
-def listar(request):
+def ocorrencias(request, pk):
+    """Fragmento HTMX: linhas da tabela de ocorrências (filtros + keyset)."""
+    from .models import ImportacaoContribuicao
+    imp = get_object_or_404(ImportacaoContribuicao, pk=pk)
+    return render(request, "importador/partials/_ocorrencias_linhas.html", _pagina_ocorrencias(imp, request.GET))
+
+class _Eco:
+    """Pseudo-buffer para o csv.writer do StreamingHttpResponse."""
+    def write(self, value):
+        return value
+
+@login_required
+def ocorrencias_csv(request, pk):
+    """CSV (em streaming) das ocorrências com os mesmos filtros da tela."""
     from .models import ImportacaoContribuicao
+    imp = get_object_or_404(ImportacaoContribuicao, pk=pk)
+    qs = _ocorrencias_filtradas(imp, request.GET).defer("conteudo_sha")
+    writer = csv.writer(_Eco())
+
+    def linhas():
+        yield writer.writerow(["cpf", "matricula", "nome", "orgao_pagto", "valor", "status_externo",
+                               "status_legenda", "acao", "mensagem"])
+        for o in qs.iterator(chunk_size=2000):
+            yield writer.writerow([o.cpf, o.matricula, o.nome, o.orgao_pagto, o.valor, o.status_externo,
+                                   o.status_legenda, o.acao, o.mensagem])
+
+    resp = StreamingHttpResponse(linhas(), content_type="text/csv; charset=utf-8")
+    resp["Content-Disposition"] = f'attachment; filename="importacao_{imp.pk}_{imp.referencia:%Y-%m}.csv"'
+    return resp
+
+@login_required
+def progresso(request, pk):
+    """Fragmento HTMX com o progresso do job; recarrega a página quando termina."""
+    job = _job_da_importacao(pk)
+    response = render(request, "partials/_import_job_progress.html", {
+        "job": job, "progress_url": request.path,
+    })
+    if job is None or not job.em_andamento:
+        response["HX-Refresh"] = "true"
+    return response
+
+@login_required
+def listar(request):
+    from .models import ImportacaoContribuicao, StatusImportacao
     from django.core.paginator import Paginator
 
     # Get filter parameters
@@ -125,12 +295,7 @@ def listar(request):
             pass
 
     # Status choices for the dropdown
-    status_choices = [
-        ('PENDENTE', 'Pendente'),
-        ('PROCESSANDO', 'Processando'),
-        ('CONCLUIDO', 'Concluído'),
-        ('ERRO', 'Erro'),
-    ]
+    status_choices = StatusImportacao.choices
 
     paginator = Paginator(importacoes, 10)  # 10 importações por página
     page_number = request.GET.get('page')
@@ -0,0 +1,146 @@
+"""
+Leitura em fluxo das planilhas de importação (CSV/XLSX).
+
+Em vez de carregar a planilha inteira num DataFrame, entrega blocos de até
+`tamanho` linhas: o CSV é lido uma única vez, com encoding e delimitador
+detectados numa amostra do início do arquivo (se um trecho posterior não
+decodifica, a leitura segue com o próximo encoding a partir da linha em que
+parou); o XLSX (primeira planilha) é lido pelo openpyxl em modo read-only. Cada bloco é um DataFrame de textos (None nas células vazias)
+cujo índice continua entre blocos: é a posição da linha de dados no arquivo,
+base do número da linha e do checkpoint da importação.
+"""
+import codecs
+import csv
+import os
+
+import pandas as pd
+from openpyxl import load_workbook
+
+# Tamanho da amostra usada para detectar encoding e delimitador do CSV
+AMOSTRA_BYTES = 64 * 1024
+
+ENCODINGS = ("utf-8", "cp1252", "latin-1")
+DELIMITADORES = ",;\t|"
+
+
+def detectar_formato_csv(caminho):
+    """(encoding, delimitador) a partir dos primeiros KB do arquivo."""
+    with open(caminho, "rb") as fh:
+        return formato_da_amostra(fh.read(AMOSTRA_BYTES))
+
+
+def formato_da_amostra(amostra):
+    """(encoding, delimitador) de uma amostra (bytes) do início de um CSV."""
+    if amostra.startswith(codecs.BOM_UTF8):
+        encoding, texto = "utf-8-sig", amostra.decode("utf-8-sig", errors="replace")
+    else:
+        for encoding in ENCODINGS:
+            try:
+                # final=False: a amostra pode terminar no meio de um caractere
+                texto = codecs.getincrementaldecoder(encoding)().decode(amostra, final=False)
+                break
+            except UnicodeDecodeError:
+                continue
+
+    # Só linhas completas da amostra
+    if len(amostra) == AMOSTRA_BYTES and "\n" in texto:
+        texto = texto[:texto.rindex("\n")]
+    try:
+        delimitador = csv.Sniffer().sniff(texto, delimiters=DELIMITADORES).delimiter
+    except csv.Error:
+        delimitador = ","
+    return encoding, delimitador
+
+
+def _blocos_csv(caminho, tamanho):
+    encoding, delimitador = detectar_formato_csv(caminho)
+    candidatos = [encoding] + [e for e in ENCODINGS if e not in (encoding, encoding.replace("-sig", ""))]
+    entregues = 0
+    for i, encoding in enumerate(candidatos):
+        leitor = pd.read_csv(
+            caminho, encoding=encoding, sep=delimitador, dtype=str, chunksize=tamanho,
+        )
+        try:
+            with leitor:
+                for bloco in leitor:
+                    # Na releitura com outro encoding, descarta as linhas já entregues
+                    bloco = bloco[bloco.index >= entregues]
+                    if len(bloco):
+                        entregues = bloco.index[-1] + 1
+                        yield bloco
+            return
+        except UnicodeDecodeError:
+            if i == len(candidatos) - 1:
+                raise
+
+
+def _celula(valor):
+    """Texto da célula como o pd.read_excel(dtype=str) o daria (123.0 vira "123")."""
+    if valor is None:
+        return None
+    if isinstance(valor, float) and valor.is_integer():
+        valor = int(valor)
+    return str(valor)
+
+
+def _colunas(cabecalho):
+    """Nomes das colunas como o pandas os daria (Unnamed: n, duplicadas com .1)."""
+    colunas, vistos = [], {}
+    for i, nome in enumerate(cabecalho):
+        nome = f"Unnamed: {i}" if nome is None else str(nome)
+        if nome in vistos:
+            vistos[nome] += 1
+            nome = f"{nome}.{vistos[nome]}"
+        else:
+            vistos[nome] = 0
+        colunas.append(nome)
+    return colunas
+
+
+def _blocos_xlsx(caminho, tamanho):
+    wb = load_workbook(caminho, read_only=True, data_only=True)
+    try:
+        linhas = wb.worksheets[0].iter_rows(values_only=True)
+        cabecalho = next(linhas, None)
+        if cabecalho is None:
+            return
+        colunas = _colunas(cabecalho)
+        n = len(colunas)
+        bloco, inicio = [], 0
+        for valores in linhas:
+            valores = [_celula(v) for v in valores[:n]]
+            bloco.append(valores + [None] * (n - len(valores)))
+            if len(bloco) == tamanho:
+                yield pd.DataFrame(bloco, columns=colunas, index=range(inicio, inicio + len(bloco)))
+                inicio += len(bloco)
+                bloco = []
+        if bloco:
+            yield pd.DataFrame(bloco, columns=colunas, index=range(inicio, inicio + len(bloco)))
+    finally:
+        wb.close()
+
+
+def _blocos_xls(caminho, tamanho):
+    # Formato antigo: o openpyxl não lê; fica a leitura completa do pandas (xlrd)
+    df = pd.read_excel(caminho, dtype=str)
+    for inicio in range(0, len(df), tamanho):
+        yield df.iloc[inicio:inicio + tamanho]
+
+
+def ler_planilha(caminho, tamanho):
+    """Gera blocos de até `tamanho` linhas, sem as linhas completamente vazias."""
+    extensao = os.path.splitext(caminho)[1].lower()
+    if extensao == ".csv":
+        blocos = _blocos_csv(caminho, tamanho)
+    elif extensao == ".xlsx":
+        blocos = _blocos_xlsx(caminho, tamanho)
+    elif extensao == ".xls":
+        blocos = _blocos_xls(caminho, tamanho)
+    else:
+        raise ValueError(f"Formato de arquivo não suportado: {extensao}")
+
+    for bloco in blocos:
+        bloco = bloco.dropna(how="all")
+        if len(bloco):
+            # Células vazias viram None (NaN não é JSON válido em ImportRow.dados_brutos)
+            yield bloco.astype(object).where(bloco.notna(), None)
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-17 21:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('importar_cadastros', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='importbatch',
+            name='status',
+            field=models.CharField(choices=[('draft', 'Rascunho'), ('dry_run', 'Simulação'), ('queued', 'Na fila'), ('processing', 'Processando'), ('completed', 'Concluído'), ('error', 'Erro')], default='draft', max_length=20, verbose_name='Status'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-17 21:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('importar_cadastros', '0002_importbatch_status_queued'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='importbatch',
+            name='ultima_linha_confirmada',
+            field=models.PositiveIntegerField(default=0, help_text='Checkpoint da importação em blocos: última linha já gravada', verbose_name='Última Linha Confirmada'),
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.18 on 2026-10-17 21:40
+
+import apps.documentos.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('importar_cadastros', '0003_importbatch_ultima_linha_confirmada'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='importbatch',
+            name='anexos_processados',
+            field=models.PositiveIntegerField(default=0, verbose_name='Anexos Processados'),
+        ),
+        migrations.AddField(
+            model_name='importbatch',
+            name='anexos_total',
+            field=models.PositiveIntegerField(default=0, verbose_name='Total de Anexos'),
+        ),
+        migrations.AddField(
+            model_name='importdocument',
+            name='sha256',
+            field=models.CharField(blank=True, db_index=True, help_text='Hash do conteúdo, usado para não importar o mesmo documento duas vezes', max_length=64, verbose_name='SHA-256'),
+        ),
+        migrations.AlterField(
+            model_name='importdocument',
+            name='arquivo',
+            field=models.FileField(storage=apps.documentos.storage.PrivateStorage(), upload_to='import_cadastros_docs/%Y/%m/', verbose_name='Arquivo'),
+        ),
+    ]
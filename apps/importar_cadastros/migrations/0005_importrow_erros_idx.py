@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-17 21:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('importar_cadastros', '0004_importdocument_sha256_anexos'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='importrow',
+            index=models.Index(condition=models.Q(('sucesso', False)), fields=['batch', 'linha_numero'], name='importrow_erros_idx'),
+        ),
+    ]
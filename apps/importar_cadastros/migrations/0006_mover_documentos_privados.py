@@ -0,0 +1,34 @@
+from django.core.files.storage import default_storage
+from django.db import migrations
+
+from apps.documentos.storage import PrivateStorage
+
+
+def mover_documentos(apps, schema_editor):
+    """
+    Documentos importados antes de ImportDocument.arquivo usar PrivateStorage
+    estão no storage padrão (MEDIA_ROOT, público): passam para _private/ com o
+    mesmo nome. Idempotente; arquivos ausentes nos dois lugares ficam como estão.
+    """
+    ImportDocument = apps.get_model("importar_cadastros", "ImportDocument")
+    privado = PrivateStorage()
+    documentos = ImportDocument.objects.exclude(arquivo="").values_list("pk", "arquivo")
+    for pk, nome in documentos.iterator(chunk_size=2000):
+        if privado.exists(nome) or not default_storage.exists(nome):
+            continue
+        with default_storage.open(nome, "rb") as origem:
+            novo_nome = privado.save(nome, origem)
+        if novo_nome != nome:
+            ImportDocument.objects.filter(pk=pk).update(arquivo=novo_nome)
+        default_storage.delete(nome)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('importar_cadastros', '0005_importrow_erros_idx'),
+    ]
+
+    operations = [
+        migrations.RunPython(mover_documentos, migrations.RunPython.noop),
+    ]
@@ -3,6 +3,8 @@ from django.contrib.auth.models import User
 from django.utils import timezone
 import json
 
+from apps.documentos.storage import PrivateStorage
+
 
 class TipoImportacao(models.TextChoices):
     """Tipos de importação disponíveis"""
@@ -14,6 +16,7 @@ class StatusImportacao(models.TextChoices):
     """Status do lote de importação"""
     DRAFT = 'draft', 'Rascunho'
     DRY_RUN = 'dry_run', 'Simulação'
+    QUEUED = 'queued', 'Na fila'
     PROCESSING = 'processing', 'Processando'
     COMPLETED = 'completed', 'Concluído'
     ERROR = 'error', 'Erro'
@@ -74,6 +77,13 @@ class ImportBatch(models.Model):
     linhas_processadas = models.PositiveIntegerField(default=0, verbose_name="Linhas Processadas")
     linhas_sucesso = models.PositiveIntegerField(default=0, verbose_name="Linhas com Sucesso")
     linhas_erro = models.PositiveIntegerField(default=0, verbose_name="Linhas com Erro")
+    ultima_linha_confirmada = models.PositiveIntegerField(
+        default=0,
+        verbose_name="Última Linha Confirmada",
+        help_text="Checkpoint da importação em blocos: última linha já gravada"
+    )
+    anexos_total = models.PositiveIntegerField(default=0, verbose_name="Total de Anexos")
+    anexos_processados = models.PositiveIntegerField(default=0, verbose_name="Anexos Processados")
     
     # Timestamps
     created_at = models.DateTimeField(auto_now_add=True, verbose_name="Criado em")
@@ -101,6 +111,11 @@ class ImportBatch(models.Model):
             return 0
         return round((self.linhas_processadas / self.total_linhas) * 100, 1)
     
+    @property
+    def pode_retomar(self):
+        """Importação definitiva interrompida por erro (a simulação não grava started_at)"""
+        return self.status == StatusImportacao.ERROR and self.started_at is not None
+    
     def get_success_percentage(self):
         """Calcula a porcentagem de sucesso"""
         if self.linhas_processadas == 0:
@@ -151,6 +166,15 @@ class ImportRow(models.Model):
     class Meta:
         ordering = ['linha_numero']
         unique_together = ['batch', 'linha_numero']
+        indexes = [
+            # Keyset das linhas com erro (batch_id, linha_numero > ?): são poucas,
+            # e no índice único ficariam espalhadas entre as de sucesso
+            models.Index(
+                fields=['batch', 'linha_numero'],
+                condition=models.Q(sucesso=False),
+                name='importrow_erros_idx',
+            ),
+        ]
         verbose_name = "Linha de Importação"
         verbose_name_plural = "Linhas de Importação"
     
@@ -190,10 +214,19 @@ class ImportDocument(models.Model):
     )
     
     arquivo = models.FileField(
+        storage=PrivateStorage(),
         upload_to="import_cadastros_docs/%Y/%m/",
         verbose_name="Arquivo"
     )
     
+    sha256 = models.CharField(
+        max_length=64,
+        blank=True,
+        db_index=True,
+        verbose_name="SHA-256",
+        help_text="Hash do conteúdo, usado para não importar o mesmo documento duas vezes"
+    )
+    
     nome_original = models.CharField(
         max_length=255,
         verbose_name="Nome Original",
@@ -6,125 +6,420 @@ import pandas as pd
 import zipfile
 import os
 import re
-from decimal import Decimal, InvalidOperation
-from datetime import datetime, date
+import hashlib
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from functools import lru_cache
+from decimal import Decimal
 from typing import Dict, Any, Tuple, Optional
 from django.db import transaction
-from django.core.files.base import ContentFile
+from django.core.exceptions import FieldDoesNotExist
+from django.core.files.base import File
 from django.utils import timezone
 from django.contrib.auth.models import User
 
+from apps.analise.signals import aplicar_efeitos_status
 from apps.cadastros.models import Cadastro
+from apps.cadastros.signals import notificar_mudancas_status
+from apps.cadastros.status_mapping import atualizar_status_unificado
+from apps.common.models import EtapaJob
+from .leitura import ler_planilha
 from .models import ImportBatch, ImportRow, ImportDocument, StatusImportacao
 
 
+# Tamanho dos blocos de bulk_create no caminho em lote
+BULK_BATCH_SIZE = 1000
+
+# Linhas da planilha lidas e gravadas por transação na importação definitiva
+LINHAS_POR_TRANSACAO = 1000
+
+# Erros de linha devolvidos no resultado (os demais ficam só em ImportRow)
+LIMITE_ERROS = 50
+
+# Threads que descompactam e gravam os anexos do ZIP
+ANEXOS_THREADS = 4
+
+# Bloco de leitura/gravação de cada anexo (bytes)
+ANEXOS_BLOCO = 1024 * 1024
+
+# Campos recalculados por Cadastro.recalc() (chamado no save(), que o bulk não usa)
+CAMPOS_CALCULADOS = {
+    'taxa_antecipacao_percent', 'trinta_porcento_bruto', 'margem_liquido_menos_30_bruto',
+    'valor_total_antecipacao', 'doacao_associado', 'disponivel',
+    'auxilio_agente_taxa_percent', 'auxilio_agente_valor',
+}
+
+# Campos por tipo de transformação (nomes do modelo e nomes legados do mapping)
+CAMPOS_DOCUMENTO = {'cpf', 'cnpj', 'cpf_cnpj'}
+CAMPOS_DECIMAIS = {
+    'valor_bruto_total', 'valor_liquido', 'margem_liquido',
+    'prazo_antecipacao_meses', 'trinta_porcento_bruto',
+    'margem_liquido_menos_30_bruto', 'mensalidade_associativa',
+    'taxa_antecipacao_percent', 'valor_total_antecipacao',
+    'doacao_associado', 'auxilio_agente_taxa_percent',
+    'auxilio_agente_valor',
+}
+CAMPOS_DATA = {
+    'birth_date', 'data_nascimento', 'data_aprovacao', 'data_primeira_mensalidade',
+    'auxilio_data_envio', 'data_envio',
+}
+# Inclui o formato que células de data do Excel assumem após astype(str)
+FORMATOS_DATA = ['%d/%m/%Y', '%Y-%m-%d', '%d-%m-%Y', '%Y-%m-%d %H:%M:%S']
+CAMPOS_BOOLEANOS = {'agente_padrao', 'disponivel'}
+VALORES_VERDADEIROS = ['true', '1', 'sim', 's', 'verdadeiro']
+
+# Tamanhos para nomes legados do mapping que não são campos do modelo
+TAMANHOS_LEGADOS = {
+    'profession': 120,
+    'address': 180,
+    'complement': 60,
+    'neighborhood': 80,
+    'city': 80,
+    'bank': 120,
+    'public_agency': 120,
+    'server_register': 30,
+    'pix_key': 120,
+}
+
+
+def _max_length(campo: str) -> int:
+    """max_length do campo no Cadastro (ou do nome legado); 255 por padrão"""
+    try:
+        max_length = Cadastro._meta.get_field(campo).max_length
+    except FieldDoesNotExist:
+        max_length = None
+    return max_length or TAMANHOS_LEGADOS.get(campo, 255)
+
+
+@lru_cache(maxsize=None)
+def _campos_concretos():
+    return {f.name for f in Cadastro._meta.concrete_fields}
+
+
+@lru_cache(maxsize=None)
+def _tamanhos_maximos():
+    return {f.name: f.max_length for f in Cadastro._meta.concrete_fields if f.max_length}
+
+
+def _validar_tamanhos(dados_mapeados: Dict[str, Any]):
+    """Valor maior que a coluna (ex.: CPF com dígitos a mais) é erro da linha, não do bloco"""
+    tamanhos = _tamanhos_maximos()
+    for campo, valor in dados_mapeados.items():
+        if isinstance(valor, str) and len(valor) > tamanhos.get(campo, len(valor)):
+            raise ValueError(f"{campo} excede {tamanhos[campo]} caracteres: {valor}")
+
+
+def _unico(cadastros, chave: str) -> Optional[Cadastro]:
+    """Equivalente a .get() sobre os cadastros pré-carregados de uma chave"""
+    if not cadastros:
+        return None
+    if len(cadastros) > 1:
+        raise Cadastro.MultipleObjectsReturned(
+            f"Mais de um cadastro encontrado com {chave} ({len(cadastros)})."
+        )
+    return cadastros[0]
+
+
+def _desindexar(indice, chave, cadastro):
+    if chave and cadastro in indice.get(chave, []):
+        indice[chave] = [c for c in indice[chave] if c is not cadastro]
+
+
+class _AnexoComHash(File):
+    """Membro do ZIP entregue ao storage em blocos, calculando o sha256 no caminho"""
+
+    def __init__(self, file, name):
+        super().__init__(file, name)
+        self.sha256 = hashlib.sha256()
+
+    def chunks(self, chunk_size=None):
+        for chunk in super().chunks(chunk_size or ANEXOS_BLOCO):
+            self.sha256.update(chunk)
+            yield chunk
+
+
+def _gravar_anexo(zip_file, file_info, storage, destino):
+    """Executado nas threads: grava o membro no storage. Retorna (nome salvo, sha256)"""
+    with zip_file.open(file_info) as membro:
+        conteudo = _AnexoComHash(membro, destino)
+        nome_salvo = storage.save(destino, conteudo)
+    return nome_salvo, conteudo.sha256.hexdigest()
+
+
+class PlanoImportacao:
+    """
+    Linhas resolvidas em memória: cadastros a inserir e a atualizar, resultado
+    de cada linha e conflitos encontrados. É a projeção exibida na simulação e
+    a entrada da gravação em lote.
+    """
+
+    def __init__(self):
+        self.por_cpf = {}
+        self.por_matricula = {}
+        # Status antes da importação, para as notificações de mudança
+        self.status_anterior = {}
+        self.novos = {}
+        self.alterados = {}
+        self.campos_alterados = set()
+        self.resultados = []
+        self.erros = 0
+        self.conflitos = []
+        self._cpfs = {}
+        self._matriculas = {}
+
+    def carregar(self, cadastros):
+        """
+        Indexa cadastros pré-carregados por CPF e por matrícula (listas, para
+        detectar duplicidade). Os já conhecidos são ignorados: a cópia em
+        memória pode ter sido alterada por linhas de blocos anteriores.
+        """
+        for cadastro in cadastros:
+            if cadastro.pk in self.status_anterior:
+                continue
+            self.status_anterior[cadastro.pk] = cadastro.status
+            if cadastro.cpf:
+                self.por_cpf.setdefault(cadastro.cpf, []).append(cadastro)
+            if cadastro.matricula_servidor:
+                self.por_matricula.setdefault(cadastro.matricula_servidor, []).append(cadastro)
+
+    def adicionar(self, cadastro: Cadastro, campos):
+        if cadastro.pk is None:
+            self.novos[id(cadastro)] = cadastro
+        else:
+            self.alterados[cadastro.pk] = cadastro
+            self.campos_alterados.update(campos)
+
+    def projecao(self) -> Dict[str, int]:
+        return {
+            'criar': len(self.novos),
+            'atualizar': len(self.alterados),
+            'erros': self.erros,
+            'conflitos': len(self.conflitos),
+        }
+
+    def detectar_conflitos(self, linha_numero: int, dados_mapeados: Dict[str, Any]):
+        """
+        Chamado antes de resolver a linha, com os índices no estado em que a
+        importação os encontraria. Conflitos não impedem a importação; são
+        avisos para o analista revisar a planilha.
+        """
+        cpf = dados_mapeados.get('cpf')
+        matricula = dados_mapeados.get('matricula_servidor')
+
+        # Chaves repetidas dentro da planilha: a última linha prevalece
+        if cpf:
+            if cpf in self._cpfs:
+                self._conflito(linha_numero, 'CPF_REPETIDO',
+                               f"CPF {cpf} repetido na planilha (linha {self._cpfs[cpf]}); a última linha prevalece.")
+            self._cpfs[cpf] = linha_numero
+        if matricula:
+            if matricula in self._matriculas:
+                self._conflito(linha_numero, 'MATRICULA_REPETIDA',
+                               f"Matrícula {matricula} repetida na planilha (linha {self._matriculas[matricula]}); a última linha prevalece.")
+            self._matriculas[matricula] = linha_numero
+
+        # Colisões com cadastros já gravados
+        por_cpf = [c for c in self.por_cpf.get(cpf, []) if c.pk] if cpf else []
+        por_matricula = [c for c in self.por_matricula.get(matricula, []) if c.pk] if matricula else []
+        if len(por_cpf) == 1:
+            alvo = por_cpf[0]
+            outros = [c for c in por_matricula if c.pk != alvo.pk]
+            if outros:
+                self._conflito(linha_numero, 'MATRICULA_DE_OUTRO_CADASTRO',
+                               f"Matrícula {matricula} já pertence ao cadastro #{outros[0].pk}; "
+                               f"a linha atualiza o cadastro #{alvo.pk} (CPF {cpf}).")
+            elif matricula and alvo.matricula_servidor and alvo.matricula_servidor != matricula:
+                self._conflito(linha_numero, 'MATRICULA_DIVERGENTE',
+                               f"Cadastro #{alvo.pk} (CPF {cpf}) tem a matrícula {alvo.matricula_servidor}; "
+                               f"a linha a substitui por {matricula}.")
+        elif not por_cpf and len(por_matricula) == 1:
+            alvo = por_matricula[0]
+            if cpf and alvo.cpf and alvo.cpf != cpf:
+                self._conflito(linha_numero, 'CPF_DIVERGENTE',
+                               f"Matrícula {matricula} pertence ao cadastro #{alvo.pk} com CPF {alvo.cpf}; "
+                               f"a linha o substitui por {cpf}.")
+
+    def _conflito(self, linha_numero: int, tipo: str, mensagem: str):
+        self.conflitos.append({'linha': linha_numero, 'tipo': tipo, 'mensagem': mensagem})
+
+
 class ImportService:
     """Serviço principal para importação de cadastros"""
     
-    def __init__(self, batch: ImportBatch):
+    def __init__(self, batch: ImportBatch, em_lote: bool = True):
         self.batch = batch
+        self.em_lote = em_lote
         self.mapping = batch.mapping_json or {}
         self.errors = []
         self.success_count = 0
         self.error_count = 0
     
-    def import_batch(self, dry_run: bool = True) -> Dict[str, Any]:
+    def import_batch(self, dry_run: bool = True, progresso=None) -> Dict[str, Any]:
         """
         Executa a importação do lote.
         
+        A simulação (dry_run) não grava nada: resolve as linhas com consultas
+        em lote e projeta inserções/atualizações/erros (ver _simular). A
+        importação definitiva grava em blocos de LINHAS_POR_TRANSACAO linhas,
+        cada bloco na sua transação, atualizando os contadores e o checkpoint
+        `ultima_linha_confirmada` do lote; uma nova execução (retomada após
+        erro) continua a partir do checkpoint.
+        
         Args:
             dry_run: Se True, não persiste as alterações no banco
+            progresso: Callable opcional (ver apps.common.jobs.Progresso) que
+                recebe a etapa e os contadores lidos/conciliados/gravados
             
         Returns:
             Dict com estatísticas e resultados da importação
         """
         try:
-            with transaction.atomic():
-                # Atualiza status do lote
-                self.batch.status = StatusImportacao.PROCESSING
-                self.batch.started_at = timezone.now()
-                self.batch.save()
-                
-                # Lê a planilha
-                df = self._read_spreadsheet()
-                self.batch.total_linhas = len(df)
-                self.batch.save()
-                
-                # Processa cada linha
-                for index, row in df.iterrows():
-                    self._process_row(index + 1, row.to_dict(), dry_run)
-                
-                # Processa anexos se houver
-                if self.batch.anexos_zip and not dry_run:
-                    self._process_attachments()
-                
-                # Atualiza estatísticas finais
-                self.batch.linhas_processadas = len(df)
-                self.batch.linhas_sucesso = self.success_count
-                self.batch.linhas_erro = self.error_count
-                self.batch.status = StatusImportacao.COMPLETED
-                self.batch.completed_at = timezone.now()
-                self.batch.save()
-                
-                # Se for dry_run, desfaz todas as alterações
-                if dry_run:
-                    transaction.set_rollback(True)
-                    self.batch.status = StatusImportacao.DRY_RUN
-                
-                return {
-                    'success': True,
-                    'total_linhas': self.batch.total_linhas,
-                    'linhas_sucesso': self.success_count,
-                    'linhas_erro': self.error_count,
-                    'errors': self.errors[:50],  # Limita a 50 erros para não sobrecarregar
-                    'dry_run': dry_run
-                }
+            plano = self._simular(progresso) if dry_run else self._executar(progresso)
+            
+            results = {
+                'success': True,
+                'total_linhas': self.batch.total_linhas,
+                'linhas_sucesso': self.success_count,
+                'linhas_erro': self.error_count,
+                'errors': self.errors,
+                'dry_run': dry_run
+            }
+            if plano is not None:
+                results.update(
+                    projecao=plano.projecao(),
+                    conflitos=plano.conflitos[:50],
+                    total_conflitos=len(plano.conflitos),
+                )
+            return results
                 
         except Exception as e:
+            # Contadores e checkpoint ficam como no último bloco confirmado
             self.batch.status = StatusImportacao.ERROR
-            self.batch.save()
+            self.batch.save(update_fields=['status', 'updated_at'])
             return {
                 'success': False,
                 'error': str(e),
-                'dry_run': dry_run
+                'dry_run': dry_run,
+                'ultima_linha_confirmada': self.batch.ultima_linha_confirmada,
             }
     
-    def _read_spreadsheet(self) -> pd.DataFrame:
-        """Lê a planilha CSV ou XLSX"""
-        file_path = self.batch.planilha.path
-        file_extension = os.path.splitext(file_path)[1].lower()
+    def _registrar_erro(self, linha_numero: int, erro: str, dados_brutos: Dict[str, Any]):
+        # Guarda só os primeiros LIMITE_ERROS para exibição (memória limitada em planilhas grandes)
+        if len(self.errors) < LIMITE_ERROS:
+            self.errors.append({
+                'linha': linha_numero,
+                'erro': erro,
+                'dados': dados_brutos
+            })
+    
+    def _blocos(self):
+        """Planilha lida em fluxo, em blocos de LINHAS_POR_TRANSACAO linhas (ver leitura.py)"""
+        return ler_planilha(self.batch.planilha.path, LINHAS_POR_TRANSACAO)
+    
+    def _linhas(self, df: pd.DataFrame, inicio: int = 0):
+        """(linha_numero, dados_brutos, dados_mapeados) das linhas após `inicio`"""
+        # Mapeia e transforma as colunas de uma vez; as linhas só leem os valores prontos
+        dados = self._transform_columns(df)
+        return [
+            (index + 1, dados_brutos, dados_mapeados)
+            for index, dados_brutos, dados_mapeados
+            in zip(df.index, df.to_dict("records"), dados.to_dict("records"))
+            if index + 1 > inicio
+        ]
+    
+    def _simular(self, progresso=None) -> PlanoImportacao:
+        """
+        Validação sem escrita: as linhas são resolvidas contra os cadastros e
+        agentes pré-carregados, com detecção de conflitos em memória. Nenhum
+        INSERT/UPDATE é emitido (nem em Cadastro, nem no lote ou em ImportRow).
+        Um único plano atravessa os blocos, para que chaves repetidas em blocos
+        diferentes se resolvam como na importação definitiva.
+        """
+        if progresso:
+            progresso(etapa=EtapaJob.LEITURA)
+        plano = PlanoImportacao()
+        lidas = 0
+        for df in self._blocos():
+            lidas += len(df)
+            if progresso:
+                progresso(etapa=EtapaJob.CONCILIACAO, lidos=lidas)
+            self._planejar(self._linhas(df), plano)
+            if progresso:
+                progresso(conciliados=lidas)
+        plano.resultados = []
         
-        if file_extension == '.csv':
-            # Tenta diferentes encodings para CSV
-            for encoding in ['utf-8', 'latin-1', 'cp1252']:
-                try:
-                    df = pd.read_csv(file_path, encoding=encoding)
-                    break
-                except UnicodeDecodeError:
-                    continue
-            else:
-                raise ValueError("Não foi possível ler o arquivo CSV com nenhum encoding suportado")
+        self.batch.total_linhas = lidas
+        self.batch.status = StatusImportacao.DRY_RUN
+        return plano
+    
+    def _executar(self, progresso=None):
+        # Retomada: continua do checkpoint com os contadores já gravados
+        inicio = self.batch.ultima_linha_confirmada
+        if inicio:
+            self.success_count = self.batch.linhas_sucesso
+            self.error_count = self.batch.linhas_erro
+        else:
+            self.batch.started_at = timezone.now()
+            self.batch.linhas_processadas = self.batch.linhas_sucesso = self.batch.linhas_erro = 0
         
-        elif file_extension in ['.xlsx', '.xls']:
-            df = pd.read_excel(file_path)
+        # Atualiza status do lote
+        self.batch.status = StatusImportacao.PROCESSING
+        self.batch.save()
         
-        else:
-            raise ValueError(f"Formato de arquivo não suportado: {file_extension}")
+        # Lê a planilha em fluxo: cada bloco é lido, resolvido e gravado na sua transação
+        if progresso:
+            progresso(etapa=EtapaJob.LEITURA, gravados=self.success_count)
+        lidas = 0
+        for df in self._blocos():
+            lidas += len(df)
+            if progresso:
+                progresso(etapa=EtapaJob.CONCILIACAO, lidos=lidas)
+            linhas = self._linhas(df, inicio)
+            if not linhas:
+                continue  # bloco já confirmado numa execução anterior
+            
+            with transaction.atomic():
+                if self.em_lote:
+                    self._process_rows_bulk(linhas)
+                else:
+                    # Processa cada linha
+                    for linha_numero, dados_brutos, dados_mapeados in linhas:
+                        self._process_row(linha_numero, dados_brutos, dados_mapeados, dry_run=False)
+                
+                # Checkpoint do bloco, na mesma transação das linhas
+                self.batch.ultima_linha_confirmada = linhas[-1][0]
+                self.batch.total_linhas = lidas
+                self.batch.linhas_processadas = self.success_count + self.error_count
+                self.batch.linhas_sucesso = self.success_count
+                self.batch.linhas_erro = self.error_count
+                self.batch.save(update_fields=[
+                    'ultima_linha_confirmada', 'total_linhas', 'linhas_processadas',
+                    'linhas_sucesso', 'linhas_erro', 'updated_at',
+                ])
+            if progresso:
+                progresso(conciliados=lidas, gravados=self.success_count)
         
-        # Remove linhas completamente vazias
-        df = df.dropna(how='all')
+        if progresso:
+            progresso(etapa=EtapaJob.GRAVACAO, total=lidas, conciliados=lidas, gravados=self.success_count)
         
-        # Converte colunas para string para facilitar o mapeamento
-        df = df.astype(str)
+        # Processa anexos se houver (cada documento é gravado ao ser concluído)
+        if self.batch.anexos_zip:
+            self._process_attachments()
         
-        return df
+        with transaction.atomic():
+            # Atualiza estatísticas finais
+            self.batch.total_linhas = lidas
+            self.batch.linhas_processadas = lidas
+            self.batch.status = StatusImportacao.COMPLETED
+            self.batch.completed_at = timezone.now()
+            self.batch.save()
     
-    def _process_row(self, linha_numero: int, dados_brutos: Dict[str, Any], dry_run: bool):
-        """Processa uma linha individual da planilha"""
+    def _process_row(self, linha_numero: int, dados_brutos: Dict[str, Any],
+                     dados_mapeados: Dict[str, Any], dry_run: bool):
+        """
+        Processa uma linha individual da planilha.
+        `dados_mapeados` já vem limpo e tipado por _transform_columns.
+        """
         try:
-            # Mapeia os dados da planilha para campos do modelo
-            dados_mapeados = self._map_row_data(dados_brutos)
-            
             # Busca ou cria o cadastro
             cadastro = self._upsert_cadastro(dados_mapeados)
             
@@ -143,11 +438,7 @@ class ImportService:
         except Exception as e:
             # Registra a linha como erro
             error_msg = str(e)
-            self.errors.append({
-                'linha': linha_numero,
-                'erro': error_msg,
-                'dados': dados_brutos
-            })
+            self._registrar_erro(linha_numero, error_msg, dados_brutos)
             
             if not dry_run:
                 ImportRow.objects.create(
@@ -160,94 +451,224 @@ class ImportService:
             
             self.error_count += 1
     
-    def _map_row_data(self, dados_brutos: Dict[str, Any]) -> Dict[str, Any]:
-        """Mapeia os dados da planilha usando o mapping_json"""
-        dados_mapeados = {}
-        
+    def _transform_columns(self, df: pd.DataFrame) -> pd.DataFrame:
+        """
+        Aplica o mapping e as transformações coluna a coluna, com operações
+        vetorizadas do pandas, antes de qualquer acesso ao ORM. Retorna um
+        DataFrame com os campos do modelo já limpos e tipados (Decimal, date,
+        bool, str); valores ausentes ficam como None.
+        """
+        colunas = {}
         for campo_planilha, campo_modelo in self.mapping.items():
-            if campo_planilha in dados_brutos:
-                valor = dados_brutos[campo_planilha]
-                
-                # Limpa valores 'nan' do pandas
-                if pd.isna(valor) or valor == 'nan':
-                    valor = None
-                elif isinstance(valor, str):
-                    valor = valor.strip()
-                    if valor == '':
-                        valor = None
-                
-                # Aplica transformações específicas por campo
-                valor = self._transform_field_value(campo_modelo, valor)
-                
-                dados_mapeados[campo_modelo] = valor
-        
-        return dados_mapeados
-    
-    def _transform_field_value(self, campo: str, valor: Any) -> Any:
-        """Aplica transformações específicas para cada tipo de campo"""
-        if valor is None:
-            return valor
-        
+            if campo_planilha in df.columns:
+                colunas[campo_modelo] = self._transform_column(campo_modelo, df[campo_planilha])
+        return pd.DataFrame(colunas, index=df.index)
+
+    def _transform_column(self, campo: str, serie: pd.Series) -> pd.Series:
+        """Transformação específica de um campo, aplicada à coluna inteira"""
+        valores = serie.astype(object).where(serie.notna(), None).astype(str).str.strip()
+        # Limpa valores 'nan'/'None' do pandas e strings vazias
+        valores = valores.mask(valores.isin(["", "nan", "None"]))
+        presentes = valores.notna()
+
         # Campos de CPF/CNPJ - remove formatação
-        if campo in ['cpf_cnpj']:
-            return re.sub(r'[^\d]', '', str(valor))
-        
-        # Campos decimais
-        if campo in ['valor_bruto_total', 'valor_liquido', 'margem_liquido', 
-                     'prazo_antecipacao_meses', 'trinta_porcento_bruto',
-                     'margem_liquido_menos_30_bruto', 'mensalidade_associativa',
-                     'taxa_antecipacao_percent', 'valor_total_antecipacao',
-                     'doacao_associado', 'auxilio_agente_taxa_percent',
-                     'auxilio_agente_valor']:
-            try:
-                # Remove formatação de moeda brasileira
-                valor_str = str(valor).replace('R$', '').replace('.', '').replace(',', '.')
-                return Decimal(valor_str)
-            except (InvalidOperation, ValueError):
-                return Decimal('0.00')
-        
-        # Campos de data
-        if campo in ['birth_date', 'data_aprovacao', 'data_primeira_mensalidade',
-                     'auxilio_data_envio']:
-            if isinstance(valor, str):
-                # Tenta diferentes formatos de data
-                for fmt in ['%d/%m/%Y', '%Y-%m-%d', '%d-%m-%Y']:
-                    try:
-                        return datetime.strptime(valor, fmt).date()
-                    except ValueError:
-                        continue
-                return None
-            elif isinstance(valor, (date, datetime)):
-                return valor.date() if isinstance(valor, datetime) else valor
-        
+        if campo in CAMPOS_DOCUMENTO:
+            resultado = valores.str.replace(r"\D", "", regex=True)
+
+        # Campos decimais - formato brasileiro (R$ 1.234,56); inválidos viram 0.00
+        elif campo in CAMPOS_DECIMAIS:
+            limpos = (
+                valores.str.replace("R$", "", regex=False)
+                .str.replace(".", "", regex=False)
+                .str.replace(",", ".", regex=False)
+                .str.strip()
+            )
+            validos = pd.to_numeric(limpos, errors="coerce").notna()
+            resultado = pd.Series(None, index=valores.index, dtype=object)
+            resultado[presentes] = Decimal("0.00")
+            resultado[validos] = limpos[validos].map(Decimal)
+
+        # Campos de data - tenta os formatos em ordem, só nas células ainda não convertidas
+        elif campo in CAMPOS_DATA:
+            datas = pd.Series(pd.NaT, index=valores.index, dtype="datetime64[ns]")
+            for fmt in FORMATOS_DATA:
+                faltando = presentes & datas.isna()
+                if not faltando.any():
+                    break
+                datas[faltando] = pd.to_datetime(valores[faltando], format=fmt, errors="coerce")
+            resultado = datas.dt.date.astype(object).where(datas.notna(), None)
+
         # Campos booleanos
-        if campo in ['agente_padrao', 'disponivel']:
-            if isinstance(valor, str):
-                return valor.lower() in ['true', '1', 'sim', 's', 'verdadeiro']
-            return bool(valor)
-        
-        # Campos de texto - limita tamanho
-        if isinstance(valor, str):
-            # Mapeamento de tamanhos máximos por campo
-            max_lengths = {
-                'nome_completo': 180,
-                'profession': 120,
-                'address': 180,
-                'complement': 60,
-                'neighborhood': 80,
-                'city': 80,
-                'bank': 120,
-                'public_agency': 120,
-                'server_register': 30,
-                'pix_key': 120,
-                # Adicione outros campos conforme necessário
-            }
-            
-            max_length = max_lengths.get(campo, 255)
-            return valor[:max_length] if len(valor) > max_length else valor
-        
-        return valor
-    
+        elif campo in CAMPOS_BOOLEANOS:
+            resultado = valores.str.lower().isin(VALORES_VERDADEIROS).astype(object).where(presentes, None)
+
+        # Campos de texto - limita ao tamanho do campo no modelo
+        else:
+            resultado = valores.str.slice(0, _max_length(campo))
+
+        resultado = resultado.astype(object)
+        return resultado.where(resultado.notna(), None)
+
+    def _planejar(self, linhas, plano: Optional[PlanoImportacao] = None) -> PlanoImportacao:
+        """
+        Resolve as linhas contra os cadastros existentes (por CPF e por
+        matrícula) e os agentes referenciados, pré-carregados com poucas
+        consultas __in, só em memória: separa inserções de atualizações,
+        registra os erros por linha e detecta conflitos. Não grava nada.
+        Um `plano` já existente (simulação em blocos) é continuado.
+        """
+        plano = plano or PlanoImportacao()
+        plano.resultados = []
+        mapeados = [dados_mapeados for _, _, dados_mapeados in linhas]
+        plano.carregar(self._preload_cadastros(mapeados))
+        agentes = self._preload_agentes(mapeados)
+
+        for linha_numero, dados_brutos, dados_mapeados in linhas:
+            plano.detectar_conflitos(linha_numero, dados_mapeados)
+            try:
+                cadastro, campos = self._resolve_cadastro(
+                    dados_mapeados, plano.por_cpf, plano.por_matricula, agentes
+                )
+            except Exception as e:
+                # Registra a linha como erro
+                self._registrar_erro(linha_numero, str(e), dados_brutos)
+                plano.resultados.append((linha_numero, dados_brutos, None, str(e)))
+                plano.erros += 1
+                self.error_count += 1
+            else:
+                plano.adicionar(cadastro, campos)
+                plano.resultados.append((linha_numero, dados_brutos, cadastro, None))
+                self.success_count += 1
+        return plano
+
+    def _process_rows_bulk(self, linhas):
+        """
+        Caminho em lote: planeja as linhas (_planejar) e grava com bulk_create
+        em blocos. Os efeitos de status que os signals fariam a cada save()
+        (notificações e processo de análise) rodam uma vez, em lote, no final.
+        """
+        plano = self._planejar(linhas)
+
+        # save() recalcula os campos derivados; o bulk não chama save()
+        novos = list(plano.novos.values())
+        for cadastro in novos:
+            cadastro.recalc()
+        Cadastro.objects.bulk_create(novos, batch_size=BULK_BATCH_SIZE)
+
+        # Atualizações: INSERT ... ON CONFLICT (id) DO UPDATE, como no importador de
+        # contribuições; o bulk_update do Django monta um CASE por campo e fica
+        # muito mais lento com milhares de linhas
+        alterados = list(plano.alterados.values())
+        for cadastro in alterados:
+            cadastro.recalc()
+        if alterados:
+            Cadastro.objects.bulk_create(
+                alterados,
+                batch_size=BULK_BATCH_SIZE,
+                update_conflicts=True,
+                unique_fields=['id'],
+                update_fields=sorted(plano.campos_alterados | CAMPOS_CALCULADOS | {'updated_at'}),
+            )
+
+        # Status unificado, que o save() manteria
+        atualizar_status_unificado(novos + alterados)
+
+        # Efeitos de status (signals pre_save/post_save de Cadastro), uma vez por cadastro;
+        # as notificações, como no signal, só depois do commit do bloco
+        mudaram = [c for c in alterados if c.status != plano.status_anterior[c.pk]]
+        if mudaram:
+            transaction.on_commit(lambda: notificar_mudancas_status(mudaram))
+        aplicar_efeitos_status(novos + alterados)
+
+        ImportRow.objects.bulk_create([
+            ImportRow(
+                batch=self.batch,
+                linha_numero=linha_numero,
+                dados_brutos=dados_brutos,
+                sucesso=erro is None,
+                cadastro=cadastro,
+                mensagem_erro=erro or '',
+            )
+            for linha_numero, dados_brutos, cadastro, erro in plano.resultados
+        ], batch_size=BULK_BATCH_SIZE)
+
+    def _preload_cadastros(self, mapeados):
+        """Cadastros existentes com os CPFs ou matrículas das linhas"""
+        cpfs = {d.get('cpf') for d in mapeados if d.get('cpf')}
+        matriculas = {d.get('matricula_servidor') for d in mapeados if d.get('matricula_servidor')}
+        carregados = {}
+        if cpfs:
+            carregados.update((c.pk, c) for c in Cadastro.objects.select_related('agente_responsavel').filter(cpf__in=cpfs))
+        if matriculas:
+            carregados.update(
+                (c.pk, c) for c in Cadastro.objects.select_related('agente_responsavel').filter(matricula_servidor__in=matriculas)
+                if c.pk not in carregados
+            )
+        return carregados.values()
+
+    def _preload_agentes(self, mapeados):
+        """Usuários referenciados pela coluna de agente, por username"""
+        usernames = {
+            d['agente_responsavel'] for d in mapeados
+            if isinstance(d.get('agente_responsavel'), str)
+        }
+        if not usernames:
+            return {}
+        return {u.username: u for u in User.objects.filter(username__in=usernames)}
+
+    def _resolve_cadastro(self, dados_mapeados, por_cpf, por_matricula, agentes):
+        """
+        Mesmas regras de _upsert_cadastro, sem consultas: resolve o cadastro da
+        linha nos índices pré-carregados e aplica os dados em memória. Cadastros
+        novos entram nos índices, para que linhas seguintes com a mesma chave
+        os atualizem. Retorna (cadastro, campos alterados).
+        """
+        # Campos obrigatórios
+        if not dados_mapeados.get('nome_completo'):
+            raise ValueError("Nome completo é obrigatório")
+
+        cpf = dados_mapeados.get('cpf')
+        matricula = dados_mapeados.get('matricula_servidor')
+
+        if not cpf and not matricula:
+            raise ValueError("CPF ou matrícula do servidor é obrigatório")
+        _validar_tamanhos(dados_mapeados)
+
+        cadastro = None
+        if cpf:
+            cadastro = _unico(por_cpf.get(cpf), f"CPF {cpf}")
+        if not cadastro and matricula:
+            cadastro = _unico(por_matricula.get(matricula), f"matrícula {matricula}")
+
+        # Define agente responsável (usa o usuário do lote se não especificado)
+        agente = dados_mapeados.get('agente_responsavel')
+        if agente is None:
+            dados_mapeados['agente_responsavel'] = self.batch.usuario
+        elif isinstance(agente, str):
+            dados_mapeados['agente_responsavel'] = agentes.get(agente, self.batch.usuario)
+
+        if cadastro is None:
+            # Células vazias ficam com o default do modelo
+            cadastro = Cadastro(**{c: v for c, v in dados_mapeados.items() if v is not None})
+            campos = []
+        else:
+            chaves = (cadastro.cpf, cadastro.matricula_servidor)
+            campos = [
+                campo for campo, valor in dados_mapeados.items()
+                if hasattr(cadastro, campo) and valor is not None
+            ]
+            for campo in campos:
+                setattr(cadastro, campo, dados_mapeados[campo])
+            campos = [campo for campo in campos if campo in _campos_concretos()]
+            _desindexar(por_cpf, chaves[0], cadastro)
+            _desindexar(por_matricula, chaves[1], cadastro)
+
+        if cadastro.cpf and cadastro not in por_cpf.get(cadastro.cpf, []):
+            por_cpf.setdefault(cadastro.cpf, []).append(cadastro)
+        if cadastro.matricula_servidor and cadastro not in por_matricula.get(cadastro.matricula_servidor, []):
+            por_matricula.setdefault(cadastro.matricula_servidor, []).append(cadastro)
+        return cadastro, campos
+
     def _upsert_cadastro(self, dados_mapeados: Dict[str, Any]) -> Cadastro:
         """Busca ou cria um cadastro usando CPF e matrícula como chave natural"""
         
@@ -261,6 +682,7 @@ class ImportService:
         
         if not cpf and not matricula:
             raise ValueError("CPF ou matrícula do servidor é obrigatório")
+        _validar_tamanhos(dados_mapeados)
         
         # Tenta encontrar cadastro existente
         cadastro = None
@@ -277,7 +699,7 @@ class ImportService:
                 pass
         
         # Define agente responsável (usa o usuário do lote se não especificado)
-        if 'agente_responsavel' not in dados_mapeados:
+        if dados_mapeados.get('agente_responsavel') is None:
             dados_mapeados['agente_responsavel'] = self.batch.usuario
         elif isinstance(dados_mapeados['agente_responsavel'], str):
             # Se for string, tenta buscar usuário por username ou email
@@ -295,19 +717,29 @@ class ImportService:
                     setattr(cadastro, campo, valor)
             cadastro.save()
         else:
-            # Cria novo cadastro
-            cadastro = Cadastro.objects.create(**dados_mapeados)
+            # Cria novo cadastro (células vazias ficam com o default do modelo)
+            cadastro = Cadastro.objects.create(**{c: v for c, v in dados_mapeados.items() if v is not None})
         
         return cadastro
     
     def _process_attachments(self):
-        """Processa o arquivo ZIP de anexos"""
+        """
+        Processa o arquivo ZIP de anexos (uma pasta por CPF).
+        
+        Os CPFs das pastas são resolvidos numa única consulta. Os arquivos são
+        descompactados e gravados no PrivateStorage em blocos por até
+        ANEXOS_THREADS threads, com o sha256 calculado durante a gravação; um
+        documento com conteúdo já importado para o mesmo cadastro é descartado.
+        As threads só fazem E/S: o ImportDocument e o progresso do lote
+        (anexos_processados) são gravados pela thread principal, arquivo a arquivo.
+        """
         if not self.batch.anexos_zip:
             return
         
         try:
             with zipfile.ZipFile(self.batch.anexos_zip.path, 'r') as zip_file:
-                for file_info in zip_file.filelist:
+                membros = []
+                for file_info in zip_file.infolist():
                     if file_info.is_dir():
                         continue
                     
@@ -320,34 +752,63 @@ class ImportService:
                     if len(cpf_pasta) != 11:
                         continue
                     
-                    # Busca o cadastro pelo CPF
-                    try:
-                        cadastro = Cadastro.objects.get(cpf_cnpj=cpf_pasta)
-                    except Cadastro.DoesNotExist:
-                        continue
-                    
-                    # Extrai o arquivo
-                    file_content = zip_file.read(file_info.filename)
-                    file_name = os.path.basename(file_info.filename)
-                    
-                    # Determina o tipo do documento pelo nome do arquivo
-                    tipo_documento = self._determine_document_type(file_name)
-                    
-                    # Cria o ImportDocument
-                    import_doc = ImportDocument(
-                        batch=self.batch,
-                        cadastro=cadastro,
-                        tipo=tipo_documento,
-                        nome_original=file_name,
-                        cpf_pasta=cpf_pasta
-                    )
-                    
-                    # Salva o arquivo
-                    import_doc.arquivo.save(
-                        file_name,
-                        ContentFile(file_content),
-                        save=True
-                    )
+                    membros.append((file_info, cpf_pasta, os.path.basename(file_info.filename)))
+                
+                # Cadastros das pastas numa consulta (CPF repetido: fica o mais recente)
+                cadastros = dict(
+                    Cadastro.objects.filter(cpf__in={cpf for _, cpf, _ in membros})
+                    .order_by('id').values_list('cpf', 'id')
+                )
+                membros = [m for m in membros if m[1] in cadastros]
+                
+                # Retomada: arquivos já registrados neste lote não são relidos
+                ja_importados = set(self.batch.documents.values_list('cpf_pasta', 'nome_original'))
+                pendentes = [m for m in membros if (m[1], m[2]) not in ja_importados]
+                hashes = set(
+                    ImportDocument.objects
+                    .filter(cadastro_id__in=set(cadastros.values()))
+                    .exclude(sha256='')
+                    .values_list('cadastro_id', 'sha256')
+                )
+                
+                processados = len(membros) - len(pendentes)
+                self._progresso_anexos(processados, total=len(membros))
+                
+                campo = ImportDocument._meta.get_field('arquivo')
+                with ThreadPoolExecutor(max_workers=ANEXOS_THREADS) as pool:
+                    futuros = {
+                        pool.submit(
+                            _gravar_anexo, zip_file, file_info, campo.storage,
+                            campo.generate_filename(None, file_name),
+                        ): (file_info, cpf_pasta, file_name)
+                        for file_info, cpf_pasta, file_name in pendentes
+                    }
+                    for futuro in as_completed(futuros):
+                        file_info, cpf_pasta, file_name = futuros[futuro]
+                        try:
+                            nome_salvo, sha256 = futuro.result()
+                        except Exception as e:
+                            self._registrar_erro(
+                                'ANEXOS', f"Erro ao processar anexo {file_info.filename}: {str(e)}", {}
+                            )
+                        else:
+                            cadastro_id = cadastros[cpf_pasta]
+                            if (cadastro_id, sha256) in hashes:
+                                # Mesmo conteúdo já importado para o cadastro
+                                campo.storage.delete(nome_salvo)
+                            else:
+                                hashes.add((cadastro_id, sha256))
+                                ImportDocument.objects.create(
+                                    batch=self.batch,
+                                    cadastro_id=cadastro_id,
+                                    tipo=self._determine_document_type(file_name),
+                                    arquivo=nome_salvo,
+                                    nome_original=file_name,
+                                    cpf_pasta=cpf_pasta,
+                                    sha256=sha256,
+                                )
+                        processados += 1
+                        self._progresso_anexos(processados)
                     
         except Exception as e:
             # Log do erro, mas não interrompe o processo
@@ -357,6 +818,15 @@ class ImportService:
                 'dados': {}
             })
     
+    def _progresso_anexos(self, processados: int, total: Optional[int] = None):
+        """Grava o progresso dos anexos no lote (fora de transação: visível durante o processamento)"""
+        campos = {'anexos_processados': processados}
+        if total is not None:
+            campos['anexos_total'] = total
+        for campo, valor in campos.items():
+            setattr(self.batch, campo, valor)
+        ImportBatch.objects.filter(pk=self.batch.pk).update(**campos)
+    
     def _determine_document_type(self, filename: str) -> str:
         """Determina o tipo do documento baseado no nome do arquivo"""
         filename_lower = filename.lower()
@@ -436,6 +906,15 @@ def get_default_mapping() -> Dict[str, str]:
     }
 
 
+def executar_job(job, progresso) -> Dict[str, Any]:
+    """Handler do job CADASTROS (apps.common.jobs): importação definitiva do lote."""
+    batch = ImportBatch.objects.get(pk=job.objeto_id)
+    results = ImportService(batch).import_batch(dry_run=False, progresso=progresso)
+    if not results.get('success', False):
+        raise RuntimeError(results.get('error', 'Erro desconhecido'))
+    return results
+
+
 def import_batch(batch: ImportBatch, dry_run: bool = True) -> Dict[str, Any]:
     """
     Função principal para importar um lote.
@@ -8,6 +8,10 @@ urlpatterns = [
     path("dry-run/", views.dry_run, name="dry_run"),
     path("confirm/", views.confirm, name="confirm"),
     path("batch/<int:batch_id>/", views.batch_detail, name="batch_detail"),
+    path("batch/<int:batch_id>/resume/", views.resume, name="resume"),
+    path("batch/<int:batch_id>/progress/", views.batch_progress, name="batch_progress"),
     path("batch/<int:batch_id>/rows/", views.batch_rows_json, name="batch_rows_json"),
+    path("batch/<int:batch_id>/linhas/", views.batch_rows, name="batch_rows"),
+    path("batch/<int:batch_id>/linhas/<int:row_id>/dados/", views.batch_row_dados, name="batch_row_dados"),
     path("batch/<int:batch_id>/delete/", views.delete_batch, name="delete_batch"),
 ]
\ No newline at end of file
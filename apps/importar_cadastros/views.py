@@ -5,15 +5,18 @@ Views para importação de cadastros.
 import json
 from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib.auth.decorators import login_required
-from django.http import JsonResponse
+from django.http import HttpResponseBadRequest, JsonResponse
 from django.views.decorators.http import require_http_methods
 from django.contrib import messages
+from django.db.models import Q
 from django.urls import reverse
 from django.utils import timezone
 
 from .models import ImportBatch, ImportRow, StatusImportacao
 from .forms import ImportBatchForm
 from .services import import_batch
+from apps.common import jobs
+from apps.common.models import TipoJob, StatusJob
 
 
 @login_required
@@ -72,10 +75,8 @@ def dry_run(request, batch_id=None):
     try:
         results = import_batch(batch, dry_run=True)
         
-        # Busca as linhas com erro para exibir detalhes
-        error_rows = []
-        if not results.get('success', False):
-            error_rows = results.get('errors', [])
+        # Linhas com erro para exibir detalhes
+        error_rows = results.get('errors', [])
         
         context = {
             'batch': batch,
@@ -114,116 +115,209 @@ def confirm(request):
     batch = get_object_or_404(ImportBatch, id=batch_id, usuario=request.user)
     
     # Verifica se o lote está em estado válido para confirmação
-    if batch.status not in [StatusImportacao.PENDING, StatusImportacao.DRY_RUN]:
+    if batch.status not in [StatusImportacao.DRAFT, StatusImportacao.DRY_RUN]:
         messages.error(request, 'Este lote não pode ser confirmado.')
         return redirect('importar_cadastros:index')
     
     try:
-        # Executa a importação definitiva
-        results = import_batch(batch, dry_run=False)
+        # Enfileira a importação definitiva (executada pelo worker processar_importacoes)
+        batch.status = StatusImportacao.QUEUED
+        batch.save(update_fields=['status', 'updated_at'])
+        job = jobs.enfileirar(TipoJob.CADASTROS, batch.id, user=request.user)
         
-        if results.get('success', False):
+        if job.status == StatusJob.CONCLUIDO:
+            batch.refresh_from_db()
             messages.success(
                 request, 
                 f'Importação concluída com sucesso! '
-                f'{results.get("linhas_sucesso", 0)} linhas processadas, '
-                f'{results.get("linhas_erro", 0)} erros.'
+                f'{batch.linhas_sucesso} linhas processadas, '
+                f'{batch.linhas_erro} erros.'
             )
+        elif job.status == StatusJob.ERRO:
+            messages.error(request, f'Erro na importação: {job.erro}')
         else:
-            messages.error(
-                request, 
-                f'Erro na importação: {results.get("error", "Erro desconhecido")}'
-            )
-        
-        context = {
-            'batch': batch,
-            'results': results,
-            'page_title': 'Importação Concluída',
-            'breadcrumbs': [
-                {'name': 'Home', 'url': '/'},
-                {'name': 'Importar Cadastros', 'url': reverse('importar_cadastros:index')},
-                {'name': 'Resultado', 'url': None}
-            ]
-        }
-        
-        # Se for requisição HTMX, retorna apenas o fragmento
-        if request.headers.get('HX-Request'):
-            return render(request, 'importar_cadastros/_results.html', context)
+            messages.info(request, 'Importação enviada para processamento. Acompanhe o progresso nesta página.')
         
-        return render(request, 'importar_cadastros/confirm.html', context)
+        return redirect('importar_cadastros:batch_detail', batch_id=batch.id)
         
     except Exception as e:
         messages.error(request, f'Erro ao confirmar importação: {str(e)}')
         return redirect('importar_cadastros:index')
 
 
+@login_required
+@require_http_methods(["POST"])
+def resume(request, batch_id):
+    """
+    Retoma uma importação definitiva interrompida por erro. O job continua a
+    partir de `ultima_linha_confirmada`; os blocos já gravados são mantidos.
+    """
+    batch = get_object_or_404(ImportBatch, id=batch_id, usuario=request.user)
+    
+    if not batch.pode_retomar:
+        messages.error(request, 'Este lote não pode ser retomado.')
+        return redirect('importar_cadastros:batch_detail', batch_id=batch.id)
+    
+    batch.status = StatusImportacao.QUEUED
+    batch.save(update_fields=['status', 'updated_at'])
+    job = jobs.enfileirar(TipoJob.CADASTROS, batch.id, user=request.user)
+    
+    if job.status == StatusJob.CONCLUIDO:
+        messages.success(request, 'Importação retomada e concluída com sucesso!')
+    elif job.status == StatusJob.ERRO:
+        messages.error(request, f'Erro na importação: {job.erro}')
+    else:
+        messages.info(
+            request,
+            f'Importação retomada a partir da linha {batch.ultima_linha_confirmada + 1}. '
+            f'Acompanhe o progresso nesta página.'
+        )
+    return redirect('importar_cadastros:batch_detail', batch_id=batch.id)
+
+
+# Linhas por página na tabela do lote (paginação por keyset em linha_numero)
+PAGINA_LINHAS = 100
+
+
+def _linhas_filtradas(batch, params):
+    """Linhas do lote, filtradas por sucesso ('1'/'0') e busca na mensagem de erro."""
+    rows = ImportRow.objects.filter(batch=batch)
+    if params.get('sucesso') in ('0', '1'):
+        rows = rows.filter(sucesso=params['sucesso'] == '1')
+    busca = (params.get('q') or '').strip()
+    if busca:
+        rows = rows.filter(Q(mensagem_erro__icontains=busca))
+    return rows.order_by('linha_numero')
+
+
+def _total_linhas(batch, params):
+    """Total da tabela pelos contadores do lote (sem COUNT); None quando há busca."""
+    if (params.get('q') or '').strip():
+        return None
+    return {
+        '1': batch.linhas_sucesso,
+        '0': batch.linhas_erro,
+    }.get(params.get('sucesso'), batch.linhas_processadas)
+
+
+def _pagina_linhas(batch, params):
+    """
+    Próxima página (keyset: batch_id, linha_numero > apos) e a URL do fragmento
+    que carrega a seguinte. `dados_brutos` só é lido quando a linha é expandida.
+    """
+    rows = (
+        _linhas_filtradas(batch, params)
+        .select_related('cadastro')
+        .only('id', 'linha_numero', 'sucesso', 'mensagem_erro',
+              'cadastro__id', 'cadastro__nome_completo', 'cadastro__cpf')
+    )
+    apos = params.get('apos', '')
+    if apos.isdigit():
+        rows = rows.filter(linha_numero__gt=int(apos))
+    rows = list(rows[:PAGINA_LINHAS + 1])
+    proxima_url = None
+    if len(rows) > PAGINA_LINHAS:
+        rows = rows[:PAGINA_LINHAS]
+        proximos = params.copy()
+        proximos['apos'] = rows[-1].linha_numero
+        proxima_url = f"{reverse('importar_cadastros:batch_rows', args=[batch.id])}?{proximos.urlencode()}"
+    return {'batch': batch, 'rows': rows, 'proxima_url': proxima_url}
+
+
 @login_required
 def batch_detail(request, batch_id):
     """
     Exibe detalhes de um lote de importação.
     """
     batch = get_object_or_404(ImportBatch, id=batch_id, usuario=request.user)
+    params = request.GET.copy()
+    params.pop('apos', None)
     
-    # Busca as linhas do lote
-    rows = ImportRow.objects.filter(batch=batch).order_by('linha_numero')
-    
-    # Estatísticas
-    total_rows = rows.count()
-    success_rows = rows.filter(sucesso=True).count()
-    error_rows = rows.filter(sucesso=False).count()
+    job = jobs.job_atual(TipoJob.CADASTROS, batch.id)
     
     context = {
         'batch': batch,
-        'rows': rows,
-        'total_rows': total_rows,
-        'success_rows': success_rows,
-        'error_rows': error_rows,
+        'job': job,
+        'filtros': params,
+        # Estatísticas pelos contadores do lote, atualizados a cada bloco gravado
+        'total_rows': batch.linhas_processadas,
+        'success_rows': batch.linhas_sucesso,
+        'error_rows': batch.linhas_erro,
         'page_title': f'Lote #{batch.id}',
         'breadcrumbs': [
             {'name': 'Home', 'url': '/'},
             {'name': 'Importar Cadastros', 'url': reverse('importar_cadastros:index')},
             {'name': f'Lote #{batch.id}', 'url': None}
-        ]
+        ],
+        **_pagina_linhas(batch, params),
     }
     
     return render(request, 'importar_cadastros/batch_detail.html', context)
 
 
 @login_required
-def batch_rows_json(request, batch_id):
+def batch_rows(request, batch_id):
+    """Fragmento HTMX: linhas da tabela do lote (filtros + keyset)."""
+    batch = get_object_or_404(ImportBatch, id=batch_id, usuario=request.user)
+    return render(request, 'importar_cadastros/_linhas.html', _pagina_linhas(batch, request.GET))
+
+
+@login_required
+def batch_row_dados(request, batch_id, row_id):
+    """Fragmento HTMX: dados brutos de uma linha, carregados ao expandi-la."""
+    row = get_object_or_404(ImportRow, id=row_id, batch_id=batch_id, batch__usuario=request.user)
+    return render(request, 'importar_cadastros/_linha_dados.html', {'row': row})
+
+
+@login_required
+def batch_progress(request, batch_id):
     """
-    Retorna as linhas de um lote em formato JSON para DataTables.
+    Fragmento HTMX com o progresso do job de importação do lote.
+    Quando o job termina, responde com HX-Refresh para recarregar o detalhe.
     """
     batch = get_object_or_404(ImportBatch, id=batch_id, usuario=request.user)
-    
-    # Parâmetros do DataTables
-    draw = int(request.GET.get('draw', 1))
-    start = int(request.GET.get('start', 0))
-    length = int(request.GET.get('length', 10))
-    search_value = request.GET.get('search[value]', '')
-    
-    # Query base
-    rows = ImportRow.objects.filter(batch=batch)
-    
-    # Filtro de busca
-    if search_value:
-        rows = rows.filter(
-            Q(linha_numero__icontains=search_value) |
+    job = jobs.job_atual(TipoJob.CADASTROS, batch.id)
+    response = render(request, 'partials/_import_job_progress.html', {
+        'job': job,
+        'progress_url': request.path,
+    })
+    if job is None or not job.em_andamento:
+        response['HX-Refresh'] = 'true'
+    return response
 
 
-            Q(mensagem_erro__icontains=search_value)
-        )
+@login_required
+def batch_rows_json(request, batch_id):
+    """
+    Retorna as linhas de um lote em formato JSON.
     
-    # Total de registros
-    records_total = ImportRow.objects.filter(batch=batch).count()
-    records_filtered = rows.count()
+    Paginação por keyset: `apos` é o último linha_numero recebido e `proximo`
+    na resposta é o valor a enviar na página seguinte (None no fim).
+    """
+    batch = get_object_or_404(ImportBatch, id=batch_id, usuario=request.user)
+    
+    try:
+        draw = int(request.GET.get('draw', 1))
+        length = int(request.GET.get('length', 10))
+    except ValueError:
+        return HttpResponseBadRequest('Parâmetros de paginação inválidos.')
+    if length < 1:
+        return HttpResponseBadRequest('length deve ser positivo.')
+    length = min(length, PAGINA_LINHAS)
+    params = request.GET.copy()
+    if request.GET.get('search[value]'):
+        params['q'] = request.GET['search[value]']
     
-    # Paginação
-    rows = rows.order_by('linha_numero')[start:start + length]
+    rows = _linhas_filtradas(batch, params).select_related('cadastro')
+    apos = params.get('apos', '')
+    if apos.isdigit():
+        rows = rows.filter(linha_numero__gt=int(apos))
+    rows = list(rows[:length + 1])
+    proximo = rows[length - 1].linha_numero if len(rows) > length else None
     
     # Prepara os dados
     data = []
-    for row in rows:
+    for row in rows[:length]:
         data.append({
             'linha_numero': row.linha_numero,
             'sucesso': 'Sim' if row.sucesso else 'Não',
@@ -234,8 +328,9 @@ def batch_rows_json(request, batch_id):
     
     return JsonResponse({
         'draw': draw,
-        'recordsTotal': records_total,
-        'recordsFiltered': records_filtered,
+        'recordsTotal': batch.linhas_processadas,
+        'recordsFiltered': _total_linhas(batch, params),
+        'proximo': proximo,
         'data': data
     })
 
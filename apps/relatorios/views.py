@@ -3,14 +3,34 @@ from django.shortcuts import render
 from django.http import HttpResponse
 from django.db.models import Count, Sum, Avg, F, DurationField, ExpressionWrapper
 from django.utils import timezone
-from django.db.models.functions import TruncMonth
+from django.db.models.functions import TruncDate, TruncMonth
 from apps.cadastros.models import Cadastro
 from apps.cadastros.choices import StatusCadastro
+from apps.common.calendario import dias_uteis_entre
 from .services import (
     build_xlsx_resumo_associados, build_xlsx_resumo_por_orgao,
     generate_pdf_por_orgao
 )
 
+def _tma_dias_uteis(inicio_campo, fim_campo):
+    """
+    Tempo médio, em dias úteis, entre dois timestamps de Cadastro. O banco
+    agrupa por par de datas (no fuso local) e dias_uteis_entre roda uma vez
+    por par, com o peso da contagem.
+    """
+    pares = (
+        Cadastro.objects
+        .filter(**{f"{inicio_campo}__isnull": False, f"{fim_campo}__isnull": False})
+        .values(inicio=TruncDate(inicio_campo), fim=TruncDate(fim_campo))
+        .annotate(qtd=Count("id"))
+        .order_by()
+    )
+    total = quantidade = 0
+    for par in pares:
+        total += dias_uteis_entre(par["inicio"], par["fim"]) * par["qtd"]
+        quantidade += par["qtd"]
+    return f"{total / quantidade:.1f} dias úteis" if quantidade else "-"
+
 def is_admin(u):
     return u.is_superuser or u.groups.filter(name__in=["ADMIN"]).exists()
 
@@ -41,8 +61,8 @@ def dashboard_diretoria(request):
     # TMA
     dur_analise = ExpressionWrapper(F("approved_at") - F("created_at"), output_field=DurationField())
     dur_pagto   = ExpressionWrapper(F("paid_at") - F("approved_at"), output_field=DurationField())
-    tma_analise = Cadastro.objects.exclude(approved_at__isnull=True).aggregate(Avg(dur_analise))["%s__avg" % dur_analise.name]
-    tma_pagto   = Cadastro.objects.exclude(paid_at__isnull=True).aggregate(Avg(dur_pagto))["%s__avg" % dur_pagto.name]
+    tma_analise = Cadastro.objects.exclude(approved_at__isnull=True).aggregate(tma=Avg(dur_analise))["tma"]
+    tma_pagto   = Cadastro.objects.exclude(paid_at__isnull=True).aggregate(tma=Avg(dur_pagto))["tma"]
 
     def dur_to_str(d):
         if not d: return "-"
@@ -57,6 +77,8 @@ def dashboard_diretoria(request):
         top_orgaos=list(top_orgaos),
         aprov_por_mes=[{"mes": x["m"].strftime("%Y-%m"), "qtd": x["qtd"], "soma": float(x["soma"] or 0)} for x in aprov_por_mes],
         tma_analise=dur_to_str(tma_analise), tma_pagto=dur_to_str(tma_pagto),
+        tma_analise_dias_uteis=_tma_dias_uteis("created_at", "approved_at"),
+        tma_pagto_dias_uteis=_tma_dias_uteis("approved_at", "paid_at"),
     )
     return render(request, "relatorios/dashboard.html", ctx)
 
@@ -97,4 +97,7 @@ class MensalidadeAdmin(admin.ModelAdmin):
 class ReconciliacaoLogAdmin(admin.ModelAdmin):
     list_display = ('data_execucao', 'total_processados', 'total_conciliados', 'executado_por')
     list_filter = ('data_execucao', 'executado_por')
-    readonly_fields = ('data_execucao', 'total_processados', 'total_conciliados', 'detalhes', 'executado_por')
\ No newline at end of file
+    readonly_fields = (
+        'data_execucao', 'total_processados', 'total_conciliados', 'total_cadastro_nao_encontrado',
+        'total_parcela_nao_encontrada', 'total_valor_divergente', 'detalhes', 'executado_por',
+    )
\ No newline at end of file
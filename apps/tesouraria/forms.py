@@ -0,0 +1,21 @@
+"""
+Formulários da app Tesouraria.
+"""
+
+from django import forms
+from django.core.validators import RegexValidator
+
+
+class ImportarMensalidadesForm(forms.Form):
+    """Upload do arquivo de mensalidades (CSV/TXT com cabeçalho)"""
+
+    arquivo = forms.FileField(
+        label='Arquivo',
+        help_text='CSV/TXT com cabeçalho: cpf, matricula, valor e competencia (AAAA-MM ou MM/AAAA)',
+    )
+    competencia = forms.CharField(
+        label='Competência',
+        required=False,
+        validators=[RegexValidator(r'^\d{4}-(0[1-9]|1[0-2])$', 'Use o formato AAAA-MM.')],
+        help_text='Preencha se o arquivo não tiver a coluna competencia',
+    )
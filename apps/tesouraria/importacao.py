@@ -0,0 +1,245 @@
+"""
+Importação de mensalidades a partir de arquivos CSV/TXT com cabeçalho.
+
+O arquivo vai por COPY para uma tabela temporária (sem WAL e visível só na
+conexão da importação) e entra em Mensalidade com um único
+INSERT ... SELECT ... ON CONFLICT (competencia, cpf, matricula) DO UPDATE.
+Linhas com número de campos diferente do cabeçalho ou CSV malformado são
+rejeitadas ao montar a entrada do COPY (_EntradaCopy), que do contrário
+abortaria a importação inteira por uma linha.
+Normalização e validação (CPF sem pontuação, competência AAAA-MM, valor com
+vírgula ou ponto decimal, com ou sem "R$") são feitas em SQL, sem passar linha a linha pelo
+Python.
+
+Colunas reconhecidas no cabeçalho (sem acento, maiúsculas ou espaços):
+competencia, cpf, matricula e valor; as demais são ignoradas. A competência
+pode vir de fora, para arquivos de uma competência só.
+"""
+import csv
+import io
+import re
+import unicodedata
+
+from django.db import connection, transaction
+from django.utils import timezone
+
+from apps.importar_cadastros.leitura import AMOSTRA_BYTES, formato_da_amostra
+
+from .models import Mensalidade, StatusMensalidade
+
+COLUNAS_OBRIGATORIAS = ("cpf", "matricula", "valor")
+
+# Linhas inválidas devolvidas como exemplo no resultado
+LIMITE_EXEMPLOS = 10
+
+_COMPETENCIA_RE = re.compile(r"^\d{4}-(0[1-9]|1[0-2])$")
+
+
+def _nome_coluna(nome):
+    nome = unicodedata.normalize("NFKD", nome or "").encode("ascii", "ignore").decode()
+    return re.sub(r"[^a-z]", "", nome.lower())
+
+
+class _EntradaCopy:
+    """
+    Arquivo (só read) com a entrada do COPY: as linhas do CSV `texto` que têm
+    `n_campos` campos, reescritas em CSV padrão com o nº da linha no arquivo
+    na frente. As demais (campos a mais ou a menos, aspas não fechadas, NUL)
+    são contadas em `rejeitadas`, com as primeiras em `exemplos`; linhas em
+    branco são ignoradas. `linha_inicial` é o nº da linha do cabeçalho.
+    """
+
+    # Linhas por bloco entregue ao COPY
+    BLOCO = 2000
+
+    def __init__(self, texto, delimitador, n_campos, linha_inicial=1):
+        self.rejeitadas = 0
+        self.exemplos = []
+        self._blocos = self._gerar_blocos(texto, delimitador, n_campos, linha_inicial)
+        self._buffer = ""
+
+    def _rejeitar(self, linha):
+        self.rejeitadas += 1
+        if len(self.exemplos) < LIMITE_EXEMPLOS:
+            self.exemplos.append(linha)
+
+    def _gerar_blocos(self, texto, delimitador, n_campos, linha_inicial):
+        leitor = csv.reader(texto, delimiter=delimitador)
+        saida = io.StringIO()
+        escritor = csv.writer(saida, lineterminator="\n")
+        linhas = 0
+        while True:
+            # Nº da linha física onde o registro começa (campo entre aspas pode ter várias)
+            linha = linha_inicial + leitor.line_num + 1
+            try:
+                campos = next(leitor)
+            except StopIteration:
+                break
+            except csv.Error:
+                self._rejeitar(linha)
+                continue
+            if not campos:
+                continue
+            if len(campos) != n_campos or any("\x00" in c for c in campos):
+                self._rejeitar(linha)
+                continue
+            escritor.writerow([linha, *campos])
+            linhas += 1
+            if linhas == self.BLOCO:
+                yield saida.getvalue()
+                saida.seek(0)
+                saida.truncate()
+                linhas = 0
+        if linhas:
+            yield saida.getvalue()
+
+    def read(self, tamanho=-1):
+        while tamanho < 0 or len(self._buffer) < tamanho:
+            bloco = next(self._blocos, None)
+            if bloco is None:
+                break
+            self._buffer += bloco
+        if tamanho < 0:
+            tamanho = len(self._buffer)
+        dados, self._buffer = self._buffer[:tamanho], self._buffer[tamanho:]
+        return dados
+
+
+def _normalizadas(indices, competencia):
+    """
+    SELECT das linhas da staging já normalizadas: linha, competencia, cpf,
+    matricula, valor (texto) e `valida`.
+    """
+    col = {nome: f"c{i}" for nome, i in indices.items()}
+    if competencia:
+        expr_comp = "%(competencia)s"
+    else:
+        bruto = f"btrim(coalesce({col['competencia']}, ''))"
+        expr_comp = (
+            f"CASE WHEN {bruto} ~ '^\\d{{2}}/\\d{{4}}$' "
+            f"THEN substr({bruto}, 4, 4) || '-' || substr({bruto}, 1, 2) ELSE {bruto} END"
+        )
+    # translate() em vez de regexp_replace: bem mais barato em centenas de milhares de linhas
+    valor = f"translate(coalesce({col['valor']}, ''), 'R$ ', '')"
+    return f"""
+        SELECT linha, competencia, cpf, matricula, valor,
+               competencia ~ '^\\d{{4}}-(0[1-9]|1[0-2])$'
+               AND cpf ~ '^\\d{{11}}$'
+               AND matricula <> '' AND length(matricula) <= 50
+               AND valor ~ '^\\d{{1,8}}(\\.\\d{{1,2}})?$' AS valida
+        FROM (
+            SELECT linha,
+                   {expr_comp} AS competencia,
+                   translate(coalesce({col['cpf']}, ''), '.-/ ', '') AS cpf,
+                   btrim(coalesce({col['matricula']}, '')) AS matricula,
+                   CASE WHEN {valor} LIKE '%%,%%'
+                        THEN replace(replace({valor}, '.', ''), ',', '.')
+                        ELSE {valor} END AS valor
+            FROM tesouraria_mensalidade_staging
+        ) s
+    """
+
+
+def importar_mensalidades(arquivo, competencia=None):
+    """
+    Importa as mensalidades de `arquivo` (file object binário, posicionado no
+    início). Chave nova é inserida como PENDENTE; chave existente e pendente
+    tem o valor atualizado se mudou. Mensalidades já liquidadas ou canceladas
+    não são alteradas e contam como inalteradas. Se a chave se repete no
+    arquivo, vale a última linha.
+
+    Retorna as contagens: total_linhas, inseridas, atualizadas, inalteradas,
+    duplicadas, rejeitadas e exemplos de linhas rejeitadas (nº da linha no
+    arquivo, contando o cabeçalho). Linhas com campos a mais ou a menos que o
+    cabeçalho, ou com CSV malformado, contam como rejeitadas.
+    """
+    if connection.vendor != "postgresql":
+        raise ValueError("A importação de mensalidades requer PostgreSQL (COPY).")
+    if competencia and not _COMPETENCIA_RE.match(competencia):
+        raise ValueError("Competência inválida: use o formato AAAA-MM.")
+
+    encoding, delimitador = formato_da_amostra(arquivo.read(AMOSTRA_BYTES))
+    arquivo.seek(0)
+    texto = io.TextIOWrapper(arquivo, encoding=encoding, errors="replace", newline="")
+    cabecalho = next(csv.reader([texto.readline()], delimiter=delimitador), [])
+    indices = {}
+    for i, nome in enumerate(cabecalho):
+        indices.setdefault(_nome_coluna(nome), i)
+    faltando = [c for c in COLUNAS_OBRIGATORIAS + (() if competencia else ("competencia",)) if c not in indices]
+    if faltando:
+        raise ValueError(f"Colunas obrigatórias ausentes no cabeçalho: {', '.join(faltando)}")
+
+    colunas = [f"c{i}" for i in range(len(cabecalho))]
+    entrada = _EntradaCopy(texto, delimitador, len(cabecalho))
+    normalizadas = _normalizadas(indices, competencia)
+    tabela = Mensalidade._meta.db_table
+    params = {"competencia": competencia, "agora": timezone.now(), "pendente": StatusMensalidade.PENDENTE}
+
+    try:
+        with transaction.atomic(), connection.cursor() as cur:
+            # Dentro de uma transação externa o ON COMMIT DROP não ocorre ao fim desta
+            cur.execute("DROP TABLE IF EXISTS tesouraria_mensalidade_staging")
+            cur.execute(
+                "CREATE TEMP TABLE tesouraria_mensalidade_staging "
+                f"(linha bigint, {', '.join(f'{c} text' for c in colunas)}) ON COMMIT DROP"
+            )
+            cur.copy_expert(
+                f"COPY tesouraria_mensalidade_staging (linha, {', '.join(colunas)}) FROM STDIN WITH (FORMAT csv)",
+                entrada,
+            )
+
+            cur.execute(
+                f"""
+                WITH normalizadas AS ({normalizadas}),
+                ultimas AS (
+                    SELECT DISTINCT ON (competencia, cpf, matricula) competencia, cpf, matricula, valor
+                    FROM normalizadas
+                    WHERE valida
+                    ORDER BY competencia, cpf, matricula, linha DESC
+                ),
+                gravadas AS (
+                    INSERT INTO {tabela}
+                        (id, competencia, cpf, matricula, status, valor,
+                         data_importacao, atualizado_em, observacoes)
+                    SELECT gen_random_uuid(), competencia, cpf, matricula, %(pendente)s,
+                           valor::numeric(10, 2), %(agora)s, %(agora)s, ''
+                    FROM ultimas
+                    ON CONFLICT (competencia, cpf, matricula) DO UPDATE
+                        SET valor = EXCLUDED.valor, atualizado_em = EXCLUDED.atualizado_em
+                        WHERE {tabela}.status = %(pendente)s
+                          AND {tabela}.valor IS DISTINCT FROM EXCLUDED.valor
+                    RETURNING (xmax = 0) AS inserida
+                )
+                SELECT
+                    (SELECT count(*) FROM normalizadas),
+                    (SELECT count(*) FROM normalizadas WHERE valida),
+                    (SELECT count(*) FROM ultimas),
+                    count(*) FILTER (WHERE inserida),
+                    count(*) FILTER (WHERE NOT inserida)
+                FROM gravadas
+                """,
+                params,
+            )
+            copiadas, validas, distintas, inseridas, atualizadas = cur.fetchone()
+
+            exemplos = entrada.exemplos
+            if copiadas > validas:
+                cur.execute(
+                    f"SELECT linha FROM ({normalizadas}) n WHERE NOT valida ORDER BY linha LIMIT {LIMITE_EXEMPLOS}",
+                    params,
+                )
+                exemplos = sorted(exemplos + [linha for linha, in cur.fetchall()])[:LIMITE_EXEMPLOS]
+            cur.execute("DROP TABLE tesouraria_mensalidade_staging")
+    finally:
+        texto.detach()
+
+    total = copiadas + entrada.rejeitadas
+    return {
+        "total_linhas": total,
+        "inseridas": inseridas,
+        "atualizadas": atualizadas,
+        "inalteradas": distintas - inseridas - atualizadas,
+        "duplicadas": validas - distintas,
+        "rejeitadas": total - validas,
+        "linhas_rejeitadas": exemplos,
+    }
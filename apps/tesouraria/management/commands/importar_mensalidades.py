@@ -0,0 +1,29 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.tesouraria.importacao import importar_mensalidades
+
+
+class Command(BaseCommand):
+    help = "Importa mensalidades de um CSV/TXT (COPY + upsert por competência, CPF e matrícula)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("arquivo", help="Caminho do CSV/TXT com cabeçalho")
+        parser.add_argument("--competencia", default=None,
+                            help="Competência AAAA-MM de todas as linhas (se o arquivo não tiver a coluna)")
+
+    def handle(self, *args, **opts):
+        inicio = time.monotonic()
+        try:
+            with open(opts["arquivo"], "rb") as fh:
+                r = importar_mensalidades(fh, competencia=opts["competencia"])
+        except (OSError, ValueError) as e:
+            raise CommandError(str(e))
+        self.stdout.write(self.style.SUCCESS(
+            f"{r['total_linhas']} linhas em {time.monotonic() - inicio:.1f}s: "
+            f"{r['inseridas']} inseridas, {r['atualizadas']} atualizadas, {r['inalteradas']} inalteradas, "
+            f"{r['duplicadas']} duplicadas, {r['rejeitadas']} rejeitadas"
+        ))
+        if r["linhas_rejeitadas"]:
+            self.stdout.write(f"Linhas rejeitadas (primeiras): {', '.join(map(str, r['linhas_rejeitadas']))}")
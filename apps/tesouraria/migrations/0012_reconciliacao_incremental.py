@@ -0,0 +1,38 @@
+# Generated by Django 5.2.18 on 2026-10-17 21:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tesouraria', '0011_alter_processotesouraria_status'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='mensalidade',
+            name='atualizado_em',
+            field=models.DateTimeField(auto_now=True, db_index=True),
+        ),
+        migrations.AddField(
+            model_name='reconciliacaolog',
+            name='competencia',
+            field=models.CharField(blank=True, help_text='Vazio: todas as competências', max_length=7),
+        ),
+        migrations.AddField(
+            model_name='reconciliacaolog',
+            name='completa',
+            field=models.BooleanField(default=False, help_text='Varredura completa das mensalidades pendentes'),
+        ),
+        migrations.AddField(
+            model_name='reconciliacaolog',
+            name='estado_competencias',
+            field=models.JSONField(blank=True, default=dict, help_text='Por competência: processados, conciliados e pendentes após a execução'),
+        ),
+        migrations.AddField(
+            model_name='reconciliacaolog',
+            name='watermark',
+            field=models.DateTimeField(blank=True, help_text='Início da execução: alterações até este instante já foram consideradas', null=True),
+        ),
+    ]
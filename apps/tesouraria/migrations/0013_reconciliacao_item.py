@@ -0,0 +1,50 @@
+# Generated by Django 5.2.18 on 2026-10-17 21:47
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cadastros', '0011_parcelaantecipacao_competencia'),
+        ('tesouraria', '0012_reconciliacao_incremental'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='reconciliacaolog',
+            name='total_cadastro_nao_encontrado',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='reconciliacaolog',
+            name='total_parcela_nao_encontrada',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='reconciliacaolog',
+            name='total_valor_divergente',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.CreateModel(
+            name='ReconciliacaoItem',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('resultado', models.CharField(choices=[('CONCILIADO', 'Conciliado'), ('CADASTRO_NAO_ENCONTRADO', 'Cadastro não encontrado ou inativo'), ('PARCELA_NAO_ENCONTRADA', 'Parcela não encontrada'), ('VALOR_DIVERGENTE', 'Valor divergente')], max_length=30)),
+                ('competencia', models.CharField(max_length=7)),
+                ('cpf', models.CharField(max_length=14)),
+                ('matricula', models.CharField(max_length=50)),
+                ('valor', models.DecimalField(decimal_places=2, help_text='Valor da mensalidade', max_digits=10)),
+                ('diferenca', models.DecimalField(blank=True, decimal_places=2, help_text='Valor da mensalidade menos o da parcela', max_digits=12, null=True)),
+                ('log', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='itens', to='tesouraria.reconciliacaolog')),
+                ('mensalidade', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='tesouraria.mensalidade')),
+                ('parcela', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='cadastros.parcelaantecipacao')),
+            ],
+            options={
+                'verbose_name': 'Item de Reconciliação',
+                'verbose_name_plural': 'Itens de Reconciliação',
+                'indexes': [models.Index(fields=['log', 'id'], name='tesouraria_recitem_log_idx'), models.Index(fields=['log', 'resultado', 'id'], name='tesouraria_recitem_res_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-17 22:10
+
+import django.contrib.postgres.indexes
+import django.db.models.functions.text
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tesouraria', '0013_reconciliacao_item'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='mensalidade',
+            index=models.Index(django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Replace(django.db.models.functions.text.Replace(models.F('cpf'), models.Value('.'), models.Value('')), models.Value('-'), models.Value('')), name='text_pattern_ops'), name='tesouraria_mens_cpf_digitos'),
+        ),
+        migrations.AddIndex(
+            model_name='mensalidade',
+            index=models.Index(fields=['matricula'], name='tesouraria_mens_matricula_idx', opclasses=['varchar_pattern_ops']),
+        ),
+    ]
@@ -5,9 +5,13 @@ Esta app gerencia movimentações de recursos de organizações sem fins lucrati
 focando em gestão transparente de entradas e saídas de tesouraria.
 """
 
+from django.contrib.postgres.indexes import OpClass
 from django.db import models
+from django.db.models import F, Value
+from django.db.models.functions import Replace
 from django.contrib.auth.models import User
 import uuid
+from apps.cadastros.status_mapping import SincronizaStatusUnificado
 
 
 class MovimentacaoTesouraria(models.Model):
@@ -91,6 +95,11 @@ class StatusMensalidade(models.TextChoices):
     CANCELADA = 'CANCELADA', 'Cancelada'
 
 
+def cpf_digitos():
+    """Expressão SQL do CPF da mensalidade sem pontuação (como Cadastro.cpf)"""
+    return Replace(Replace(F('cpf'), Value('.'), Value('')), Value('-'), Value(''))
+
+
 class Mensalidade(models.Model):
     """
     Modelo para mensalidades importadas de arquivos CSV/TXT
@@ -105,11 +114,17 @@ class Mensalidade(models.Model):
     valor = models.DecimalField(max_digits=10, decimal_places=2)
     data_importacao = models.DateTimeField(auto_now_add=True)
     data_liquidacao = models.DateTimeField(null=True, blank=True)
+    atualizado_em = models.DateTimeField(auto_now=True, db_index=True)
     observacoes = models.TextField(blank=True)
     
     class Meta:
         unique_together = ['competencia', 'cpf', 'matricula']
         ordering = ['-competencia', 'cpf']
+        indexes = [
+            # Prefixo do CPF/matrícula na busca da listagem; igualdade do CPF na reconciliação
+            models.Index(OpClass(cpf_digitos(), name='text_pattern_ops'), name='tesouraria_mens_cpf_digitos'),
+            models.Index(fields=['matricula'], name='tesouraria_mens_matricula_idx', opclasses=['varchar_pattern_ops']),
+        ]
         verbose_name = 'Mensalidade'
         verbose_name_plural = 'Mensalidades'
     
@@ -124,8 +139,24 @@ class ReconciliacaoLog(models.Model):
     data_execucao = models.DateTimeField(auto_now_add=True)
     total_processados = models.IntegerField(default=0)
     total_conciliados = models.IntegerField(default=0)
+    total_cadastro_nao_encontrado = models.IntegerField(default=0)
+    total_parcela_nao_encontrada = models.IntegerField(default=0)
+    total_valor_divergente = models.IntegerField(default=0)
+    # Texto das execuções antigas; as novas gravam um ReconciliacaoItem por mensalidade
     detalhes = models.TextField(blank=True)
     executado_por = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True)
+    # Execução incremental: só entram mensalidades importadas/alteradas e
+    # cadastros/parcelas alterados depois do watermark da execução anterior
+    competencia = models.CharField(max_length=7, blank=True, help_text="Vazio: todas as competências")
+    completa = models.BooleanField(default=False, help_text="Varredura completa das mensalidades pendentes")
+    watermark = models.DateTimeField(
+        null=True, blank=True,
+        help_text="Início da execução: alterações até este instante já foram consideradas"
+    )
+    estado_competencias = models.JSONField(
+        default=dict, blank=True,
+        help_text="Por competência: processados, conciliados e pendentes após a execução"
+    )
     
     class Meta:
         ordering = ['-data_execucao']
@@ -136,6 +167,63 @@ class ReconciliacaoLog(models.Model):
         return f"Reconciliação {self.data_execucao.strftime('%d/%m/%Y %H:%M')}"
 
 
+class ResultadoReconciliacao(models.TextChoices):
+    CONCILIADO = 'CONCILIADO', 'Conciliado'
+    CADASTRO_NAO_ENCONTRADO = 'CADASTRO_NAO_ENCONTRADO', 'Cadastro não encontrado ou inativo'
+    PARCELA_NAO_ENCONTRADA = 'PARCELA_NAO_ENCONTRADA', 'Parcela não encontrada'
+    VALOR_DIVERGENTE = 'VALOR_DIVERGENTE', 'Valor divergente'
+
+
+class ReconciliacaoItem(models.Model):
+    """
+    Resultado da reconciliação de uma mensalidade numa execução.
+    
+    Competência, CPF, matrícula e valor são copiados da mensalidade para que o
+    item continue legível se ela for removida; a mensagem é montada na exibição.
+    """
+    log = models.ForeignKey(ReconciliacaoLog, on_delete=models.CASCADE, related_name='itens')
+    resultado = models.CharField(max_length=30, choices=ResultadoReconciliacao.choices)
+    mensalidade = models.ForeignKey(Mensalidade, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    parcela = models.ForeignKey(
+        'cadastros.ParcelaAntecipacao', on_delete=models.SET_NULL, null=True, blank=True, related_name='+'
+    )
+    competencia = models.CharField(max_length=7)
+    cpf = models.CharField(max_length=14)
+    matricula = models.CharField(max_length=50)
+    valor = models.DecimalField(max_digits=10, decimal_places=2, help_text="Valor da mensalidade")
+    diferenca = models.DecimalField(
+        max_digits=12, decimal_places=2, null=True, blank=True,
+        help_text="Valor da mensalidade menos o da parcela"
+    )
+    
+    class Meta:
+        indexes = [
+            # paginação por keyset do visualizador (log_id, id > ?), com e sem filtro de resultado
+            models.Index(fields=['log', 'id'], name='tesouraria_recitem_log_idx'),
+            models.Index(fields=['log', 'resultado', 'id'], name='tesouraria_recitem_res_idx'),
+        ]
+        verbose_name = 'Item de Reconciliação'
+        verbose_name_plural = 'Itens de Reconciliação'
+    
+    def __str__(self):
+        return f"{self.competencia} - {self.cpf} - {self.resultado}"
+    
+    @property
+    def valor_parcela(self):
+        return None if self.diferenca is None else self.valor - self.diferenca
+    
+    @property
+    def mensagem(self):
+        if self.resultado == ResultadoReconciliacao.CONCILIADO:
+            return f"✓ Conciliado: {self.competencia} - {self.cpf}"
+        if self.resultado == ResultadoReconciliacao.CADASTRO_NAO_ENCONTRADO:
+            return f"⚠ Cadastro não encontrado ou inativo: {self.cpf} - {self.matricula}"
+        if self.resultado == ResultadoReconciliacao.PARCELA_NAO_ENCONTRADA:
+            return f"⚠ Parcela não encontrada: {self.competencia} - {self.cpf}"
+        return (f"⚠ Valor divergente: {self.competencia} - {self.cpf} - "
+                f"Parcela: {self.valor_parcela} / Mensalidade: {self.valor}")
+
+
 class StatusProcessoTesouraria(models.TextChoices):
     """Choices para status dos processos da tesouraria"""
     PENDENTE = 'pendente', 'Pendentes'
@@ -146,7 +234,7 @@ class StatusProcessoTesouraria(models.TextChoices):
     REJEITADO = 'rejeitado', 'Rejeitado'
     
 
-class ProcessoTesouraria(models.Model):
+class ProcessoTesouraria(SincronizaStatusUnificado, models.Model):
     """
     Modelo para processos que chegam da análise para a tesouraria.
     
@@ -1,66 +1,221 @@
+import re
+from collections import Counter, defaultdict, deque
+from decimal import Decimal
+
 from django.utils import timezone
-from django.db.models import Q
+from django.db import transaction
+from django.db.models import Count, FilteredRelation, Q
 from apps.cadastros.models import Cadastro, StatusCadastro, ParcelaAntecipacao
-from .models import Mensalidade, StatusMensalidade, ReconciliacaoLog
+from apps.cadastros.choices import StatusParcela
+from .models import (
+    cpf_digitos, Mensalidade, StatusMensalidade, ReconciliacaoLog, ReconciliacaoItem, ResultadoReconciliacao,
+)
+
+# Diferença máxima entre o valor da mensalidade e o da parcela para conciliar
+TOLERANCIA_VALOR = Decimal("0.01")
+
+# Tamanho dos blocos de bulk_create dos itens da execução
+ITENS_BATCH_SIZE = 5000
+
+# Contador do log para cada resultado
+CONTADORES = {
+    ResultadoReconciliacao.CONCILIADO: 'total_conciliados',
+    ResultadoReconciliacao.CADASTRO_NAO_ENCONTRADO: 'total_cadastro_nao_encontrado',
+    ResultadoReconciliacao.PARCELA_NAO_ENCONTRADA: 'total_parcela_nao_encontrada',
+    ResultadoReconciliacao.VALOR_DIVERGENTE: 'total_valor_divergente',
+}
+
+
+def _chave(cpf, matricula):
+    """(cpf só com dígitos, matrícula sem espaços): casa mensalidade com cadastro"""
+    return re.sub(r"\D", "", cpf or ""), (matricula or "").strip()
+
 
 class ReconciliacaoService:
-    
+
     @staticmethod
-    def executar_reconciliacao(user=None):
-        log = ReconciliacaoLog.objects.create(executado_por=user)
-        detalhes = []
-        total_processados = 0
-        total_conciliados = 0
-        
-        mensalidades_pendentes = Mensalidade.objects.filter(
-            status=StatusMensalidade.PENDENTE
+    def _watermark_anterior(competencia=None):
+        """
+        Watermark da última execução que cobriu a competência: uma execução
+        geral cobre todas; uma restrita a uma competência só vale para ela.
+        """
+        escopos = ['', competencia] if competencia else ['']
+        return (
+            ReconciliacaoLog.objects
+            .filter(watermark__isnull=False, competencia__in=escopos)
+            .order_by('-watermark')
+            .values_list('watermark', flat=True)
+            .first()
         )
+
+    @staticmethod
+    def _mensalidades_candidatas(pendentes, watermark):
+        """
+        Pendentes a reprocessar numa execução incremental: as importadas ou
+        alteradas desde o watermark e as de CPFs cujo cadastro ou parcela mudou.
+        Entram também as demais pendentes desses CPFs, para que a ordem de
+        conciliação por competência seja a mesma da varredura completa.
+        """
+        cpfs_alterados = Cadastro.objects.filter(
+            Q(updated_at__gte=watermark) | Q(parcelas__atualizado_em__gte=watermark)
+        ).values('cpf')
+        novas = pendentes.filter(
+            Q(data_importacao__gte=watermark)
+            | Q(atualizado_em__gte=watermark)
+            | Q(cpf_digitos__in=cpfs_alterados)
+        ).values('cpf_digitos')
+        return pendentes.filter(cpf_digitos__in=novas)
+
+    @staticmethod
+    def _parcelas_pendentes(cpfs):
+        """
+        Cadastros efetivados dos CPFs com as parcelas pendentes, numa única
+        consulta (LEFT JOIN: cadastro sem parcela pendente vem com parcela nula).
+        Retorna {(cpf, matricula): deque([(parcela_id, valor), ...])} em ordem de
+        número; com mais de um cadastro na chave vale o mais recente, como o
+        .first() da ordenação padrão de Cadastro.
+        """
+        linhas = (
+            Cadastro.objects
+            .filter(cpf__in=cpfs, status=StatusCadastro.EFFECTIVATED)
+            .annotate(pendentes=FilteredRelation(
+                'parcelas', condition=Q(parcelas__status=StatusParcela.PENDENTE)
+            ))
+            .order_by('-created_at', 'id', 'pendentes__numero')
+            .values_list('id', 'cpf', 'matricula_servidor', 'pendentes__id', 'pendentes__valor')
+        )
+        parcelas, cadastro_da_chave = {}, {}
+        for cadastro_id, cpf, matricula, parcela_id, valor in linhas:
+            chave = _chave(cpf, matricula)
+            if cadastro_da_chave.setdefault(chave, cadastro_id) != cadastro_id:
+                continue
+            fila = parcelas.setdefault(chave, deque())
+            if parcela_id is not None:
+                fila.append((parcela_id, valor))
+        return parcelas
+
+    @staticmethod
+    def executar_reconciliacao(user=None, competencia=None, completa=False):
+        """
+        Concilia as mensalidades pendentes (opcionalmente de uma competência)
+        com a parcela pendente mais antiga do cadastro efetivado de mesmo CPF e
+        matrícula. Cadastros e parcelas vêm numa consulta; o casamento por valor
+        (TOLERANCIA_VALOR) é feito em memória e as liquidações são gravadas com
+        dois UPDATEs em lote, com as linhas casadas travadas: o par que deixou de
+        estar pendente nesse meio tempo não é liquidado (PARCELA_NAO_ENCONTRADA).
+        Mensalidades do mesmo cadastro são conciliadas da competência mais
+        antiga para a mais nova, cada uma com a próxima parcela.
+        O resultado de cada mensalidade vira um ReconciliacaoItem (bulk_create)
+        e o log guarda os totais por resultado.
         
-        for mensalidade in mensalidades_pendentes:
-            total_processados += 1
-            
-            cadastros_ativos = Cadastro.objects.filter(
-                cpf=mensalidade.cpf,
-                matricula=mensalidade.matricula,
-                status=StatusCadastro.EFFECTIVATED
+        A execução é incremental: a partir do watermark da execução anterior só
+        são consideradas mensalidades e cadastros novos ou alterados (ver
+        _mensalidades_candidatas). `completa=True`, ou a falta de execução
+        anterior, faz a varredura de todas as pendentes.
+        """
+        inicio = timezone.now()
+        watermark = None if completa else ReconciliacaoService._watermark_anterior(competencia)
+        log = ReconciliacaoLog.objects.create(
+            executado_por=user,
+            competencia=competencia or '',
+            completa=watermark is None,
+        )
+
+        pendentes = Mensalidade.objects.filter(status=StatusMensalidade.PENDENTE).annotate(cpf_digitos=cpf_digitos())
+        if competencia:
+            pendentes = pendentes.filter(competencia=competencia)
+        if watermark is not None:
+            pendentes = ReconciliacaoService._mensalidades_candidatas(pendentes, watermark)
+        mensalidades = list(
+            pendentes.order_by('competencia', 'cpf')
+            .values_list('id', 'competencia', 'cpf', 'matricula', 'valor')
+        )
+
+        parcelas = ReconciliacaoService._parcelas_pendentes(
+            {_chave(cpf, matricula)[0] for _, _, cpf, matricula, _ in mensalidades}
+        )
+
+        itens, conciliados = [], []
+        contagem = Counter()
+        estado = defaultdict(lambda: {'processados': 0, 'conciliados': 0, 'pendentes': 0})
+        for mensalidade_id, comp, cpf, matricula, valor in mensalidades:
+            estado[comp]['processados'] += 1
+            item = ReconciliacaoItem(
+                log=log, mensalidade_id=mensalidade_id,
+                competencia=comp, cpf=cpf, matricula=matricula, valor=valor,
             )
-            
-            if cadastros_ativos.exists():
-                cadastro = cadastros_ativos.first()
-                
-                parcelas_pendentes = ParcelaAntecipacao.objects.filter(
-                    cadastro=cadastro,
-                    status='PENDENTE'
-                )
-                
-                if parcelas_pendentes.exists():
-                    parcela = parcelas_pendentes.first()
-                    
-                    if abs(parcela.valor - mensalidade.valor) <= 0.01:
-                        parcela.status = 'LIQUIDADA'
-                        parcela.save()
-                        
-                        mensalidade.status = StatusMensalidade.LIQUIDADA
-                        mensalidade.data_liquidacao = timezone.now()
-                        mensalidade.save()
-                        
-                        total_conciliados += 1
-                        detalhes.append(f"✓ Conciliado: {mensalidade.competencia} - {mensalidade.cpf}")
-                    else:
-                        detalhes.append(f"⚠ Valor divergente: {mensalidade.competencia} - {mensalidade.cpf} - Parcela: {parcela.valor} / Mensalidade: {mensalidade.valor}")
-                else:
-                    detalhes.append(f"⚠ Parcela não encontrada: {mensalidade.competencia} - {mensalidade.cpf}")
+            fila = parcelas.get(_chave(cpf, matricula))
+            if fila is None:
+                item.resultado = ResultadoReconciliacao.CADASTRO_NAO_ENCONTRADO
+            elif not fila:
+                item.resultado = ResultadoReconciliacao.PARCELA_NAO_ENCONTRADA
             else:
-                detalhes.append(f"⚠ Cadastro não encontrado ou inativo: {mensalidade.cpf} - {mensalidade.matricula}")
-        
-        log.total_processados = total_processados
-        log.total_conciliados = total_conciliados
-        log.detalhes = "\n".join(detalhes)
-        log.save()
-        
+                item.parcela_id, valor_parcela = fila[0]
+                item.diferenca = valor - valor_parcela
+                if abs(item.diferenca) <= TOLERANCIA_VALOR:
+                    fila.popleft()
+                    item.resultado = ResultadoReconciliacao.CONCILIADO
+                    conciliados.append(item)
+                    estado[comp]['conciliados'] += 1
+                else:
+                    item.resultado = ResultadoReconciliacao.VALOR_DIVERGENTE
+            contagem[item.resultado] += 1
+            itens.append(item)
+
+        with transaction.atomic():
+            agora = timezone.now()
+            # Trava os dois lados: o par só é liquidado se parcela e mensalidade
+            # continuam pendentes (outra execução ou edição pode ter chegado antes)
+            parcelas_pendentes = set(
+                ParcelaAntecipacao.objects.select_for_update()
+                .filter(id__in=[i.parcela_id for i in conciliados], status=StatusParcela.PENDENTE)
+                .order_by('id').values_list('id', flat=True)
+            )
+            mensalidades_pendentes = set(
+                Mensalidade.objects.select_for_update()
+                .filter(id__in=[i.mensalidade_id for i in conciliados], status=StatusMensalidade.PENDENTE)
+                .order_by('id').values_list('id', flat=True)
+            )
+            liquidados = []
+            for item in conciliados:
+                if item.parcela_id in parcelas_pendentes and item.mensalidade_id in mensalidades_pendentes:
+                    liquidados.append(item)
+                    continue
+                item.resultado = ResultadoReconciliacao.PARCELA_NAO_ENCONTRADA
+                contagem[ResultadoReconciliacao.CONCILIADO] -= 1
+                contagem[ResultadoReconciliacao.PARCELA_NAO_ENCONTRADA] += 1
+                estado[item.competencia]['conciliados'] -= 1
+
+            ParcelaAntecipacao.objects.filter(id__in=[i.parcela_id for i in liquidados]).update(
+                status=StatusParcela.LIQUIDADA, atualizado_em=agora
+            )
+            Mensalidade.objects.filter(id__in=[i.mensalidade_id for i in liquidados]).update(
+                status=StatusMensalidade.LIQUIDADA, data_liquidacao=agora, atualizado_em=agora
+            )
+
+            # Pendentes que restam nas competências processadas
+            restantes = (
+                Mensalidade.objects
+                .filter(status=StatusMensalidade.PENDENTE, competencia__in=list(estado))
+                .values_list('competencia')
+                .annotate(total=Count('id'))
+                .order_by()
+            )
+            for comp, total in restantes:
+                estado[comp]['pendentes'] = total
+
+            ReconciliacaoItem.objects.bulk_create(itens, batch_size=ITENS_BATCH_SIZE)
+
+            log.total_processados = len(mensalidades)
+            for resultado, campo in CONTADORES.items():
+                setattr(log, campo, contagem[resultado])
+            log.watermark = inicio
+            log.estado_competencias = dict(sorted(estado.items()))
+            log.save()
+
         return {
-            'total_processados': total_processados,
-            'total_conciliados': total_conciliados,
-            'detalhes': detalhes,
+            'total_processados': log.total_processados,
+            **{campo: getattr(log, campo) for campo in CONTADORES.values()},
+            'completa': log.completa,
             'log_id': log.id
-        }
\ No newline at end of file
+        }
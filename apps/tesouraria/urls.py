@@ -24,8 +24,11 @@ urlpatterns = [
     
     # Mensalidades e Reconciliação
     path('mensalidades/', views.mensalidades_list, name='mensalidades_list'),
+    path('mensalidades/importar/', views.importar_mensalidades_view, name='importar_mensalidades'),
     path('reconciliacao/executar/', views.executar_reconciliacao, name='executar_reconciliacao'),
     path('reconciliacao/logs/', views.reconciliacao_logs, name='reconciliacao_logs'),
+    path('reconciliacao/logs/<int:log_id>/', views.reconciliacao_itens, name='reconciliacao_itens'),
+    path('reconciliacao/logs/<int:log_id>/itens/', views.reconciliacao_itens_linhas, name='reconciliacao_itens_linhas'),
     
     # Processos da Tesouraria
     path('processos/', views.processos_tesouraria, name='processos'),
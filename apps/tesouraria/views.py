@@ -14,11 +14,15 @@ from django.db.models import Q, Sum
 from django.utils import timezone
 from django.db import transaction
 from django.http import JsonResponse
+from django.urls import reverse
 from datetime import datetime, timedelta
 
-from .models import MovimentacaoTesouraria, Mensalidade, ReconciliacaoLog, StatusMensalidade, ProcessoTesouraria, StatusProcessoTesouraria
+from .models import cpf_digitos, MovimentacaoTesouraria, Mensalidade, ReconciliacaoLog, ResultadoReconciliacao, StatusMensalidade, ProcessoTesouraria, StatusProcessoTesouraria
+from .forms import ImportarMensalidadesForm
+from .importacao import importar_mensalidades
 from .services import ReconciliacaoService
 from apps.accounts.decorators import admin_required, tesouraria_required
+from apps.cadastros.busca import DOCUMENTO, buscar_cadastros, tipo_da_busca
 # Remove unused import
 
 
@@ -275,6 +279,20 @@ def relatorio_tesouraria(request):
 
 # ========== VIEWS DE MENSALIDADES E RECONCILIAÇÃO ==========
 
+def _buscar_mensalidades(mensalidades, search):
+    """
+    Busca por prefixo do CPF (sem pontuação) ou da matrícula, com a mesma
+    leitura do termo da busca de associados (apps.cadastros.busca).
+    """
+    tipo, valor = tipo_da_busca(search)
+    if tipo is None:
+        return mensalidades
+    if tipo == DOCUMENTO:
+        return mensalidades.annotate(cpf_digitos=cpf_digitos()).filter(
+            Q(cpf_digitos__startswith=valor) | Q(matricula__startswith=valor)
+        )
+    return mensalidades.filter(matricula__startswith=search.strip())
+
 @login_required
 @admin_required
 def mensalidades_list(request):
@@ -290,10 +308,7 @@ def mensalidades_list(request):
     
     search = request.GET.get('search')
     if search:
-        mensalidades = mensalidades.filter(
-            Q(cpf__icontains=search) |
-            Q(matricula__icontains=search)
-        )
+        mensalidades = _buscar_mensalidades(mensalidades, search)
     
     paginator = Paginator(mensalidades, 25)
     page_number = request.GET.get('page')
@@ -308,11 +323,41 @@ def mensalidades_list(request):
     }
     return render(request, 'tesouraria/mensalidades_list.html', context)
 
+@login_required
+@admin_required
+def importar_mensalidades_view(request):
+    """Importa um arquivo de mensalidades (COPY + upsert, ver importacao.py)."""
+    form = ImportarMensalidadesForm(request.POST or None, request.FILES or None)
+    if request.method == 'POST' and form.is_valid():
+        try:
+            r = importar_mensalidades(
+                form.cleaned_data['arquivo'], competencia=form.cleaned_data['competencia'] or None
+            )
+        except ValueError as e:
+            form.add_error('arquivo', str(e))
+        else:
+            messages.success(
+                request,
+                f"Importação concluída: {r['inseridas']} inseridas, {r['atualizadas']} atualizadas, "
+                f"{r['inalteradas']} inalteradas de {r['total_linhas']} linhas"
+            )
+            if r['rejeitadas']:
+                messages.warning(
+                    request,
+                    f"{r['rejeitadas']} linhas rejeitadas (ex.: linhas {', '.join(map(str, r['linhas_rejeitadas']))})"
+                )
+            return redirect('tesouraria:mensalidades_list')
+    return render(request, 'tesouraria/importar_mensalidades.html', {'form': form})
+
 @login_required
 @admin_required
 def executar_reconciliacao(request):
     if request.method == 'POST':
-        resultado = ReconciliacaoService.executar_reconciliacao(user=request.user)
+        resultado = ReconciliacaoService.executar_reconciliacao(
+            user=request.user,
+            competencia=request.POST.get('competencia', '').strip() or None,
+            completa=bool(request.POST.get('completa')),
+        )
         messages.success(
             request, 
             f"Reconciliação executada: {resultado['total_conciliados']} de {resultado['total_processados']} processados"
@@ -324,7 +369,8 @@ def executar_reconciliacao(request):
 @login_required
 @admin_required
 def reconciliacao_logs(request):
-    logs = ReconciliacaoLog.objects.all()
+    # detalhes (texto das execuções antigas) só é lido no visualizador de itens
+    logs = ReconciliacaoLog.objects.select_related('executado_por').defer('detalhes')
     
     paginator = Paginator(logs, 10)
     page_number = request.GET.get('page')
@@ -333,6 +379,60 @@ def reconciliacao_logs(request):
     return render(request, 'tesouraria/reconciliacao_logs.html', {'page_obj': page_obj})
 
 
+
+# Itens por página no visualizador (paginação por keyset em id)
+PAGINA_ITENS = 100
+
+
+def _pagina_itens(log, params):
+    """Próxima página de itens (keyset: log_id, id > apos), com filtros de resultado e CPF."""
+    itens = log.itens.all()
+    if params.get('resultado'):
+        itens = itens.filter(resultado=params['resultado'])
+    busca = (params.get('q') or '').strip()
+    if busca:
+        itens = itens.filter(Q(cpf__startswith=busca) | Q(matricula__startswith=busca))
+    apos = params.get('apos', '')
+    if apos.isdigit():
+        itens = itens.filter(id__gt=int(apos))
+    itens = list(itens.order_by('id')[:PAGINA_ITENS + 1])
+    proxima_url = None
+    if len(itens) > PAGINA_ITENS:
+        itens = itens[:PAGINA_ITENS]
+        proximos = params.copy()
+        proximos['apos'] = itens[-1].id
+        proxima_url = f"{reverse('tesouraria:reconciliacao_itens_linhas', args=[log.pk])}?{proximos.urlencode()}"
+    return {'itens': itens, 'proxima_url': proxima_url}
+
+
+@login_required
+@admin_required
+def reconciliacao_itens(request, log_id):
+    """Resultados de uma execução da reconciliação, por mensalidade."""
+    log = get_object_or_404(ReconciliacaoLog.objects.select_related('executado_por'), pk=log_id)
+    params = request.GET.copy()
+    params.pop('apos', None)
+    context = {
+        'log': log,
+        'filtros': params,
+        'resultados': [
+            (ResultadoReconciliacao.CONCILIADO, 'Conciliados', log.total_conciliados),
+            (ResultadoReconciliacao.CADASTRO_NAO_ENCONTRADO, 'Cadastro não encontrado', log.total_cadastro_nao_encontrado),
+            (ResultadoReconciliacao.PARCELA_NAO_ENCONTRADA, 'Parcela não encontrada', log.total_parcela_nao_encontrada),
+            (ResultadoReconciliacao.VALOR_DIVERGENTE, 'Valor divergente', log.total_valor_divergente),
+        ],
+        **_pagina_itens(log, params),
+    }
+    return render(request, 'tesouraria/reconciliacao_itens.html', context)
+
+
+@login_required
+@admin_required
+def reconciliacao_itens_linhas(request, log_id):
+    """Fragmento HTMX: linhas da tabela de itens (filtros + keyset)."""
+    log = get_object_or_404(ReconciliacaoLog.objects.only('id'), pk=log_id)
+    return render(request, 'tesouraria/partials/_reconciliacao_itens_linhas.html', _pagina_itens(log, request.GET))
+
 # ========== VIEWS DE PROCESSOS DA TESOURARIA ==========
 
 def _base_queryset_tesouraria(request):
@@ -350,12 +450,8 @@ def _base_queryset_tesouraria(request):
         processos = processos.filter(agente_responsavel_id=agente_filter)
     
     if search:
-        processos = processos.filter(
-            Q(cadastro__nome_completo__icontains=search) |
-            Q(cadastro__cpf__icontains=search) |
-            Q(cadastro__cnpj__icontains=search) |
-            Q(cadastro__matricula_servidor__icontains=search)
-        )
+        processos = buscar_cadastros(processos, search, prefixo='cadastro__')
+        return processos.order_by('-relevancia', '-data_entrada')
     
     return processos.order_by('-data_entrada')
 
@@ -33,6 +33,7 @@ DJANGO_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
 ]
 
 LOCAL_APPS = [
@@ -195,4 +196,19 @@ PRIVATE_MEDIA_ROOT = BASE_DIR / "_private"
 # Em DEV local, mantenha False (Django serve com FileResponse).
 # Em PRODUÇÃO (VPS), troque para True e configure o Nginx conforme abaixo.
 PRIVATE_ACCEL_ENABLED = False
-PRIVATE_ACCEL_INTERNAL_URL = "/_private_internal"
\ No newline at end of file
+PRIVATE_ACCEL_INTERNAL_URL = "/_private_internal"
+# Staging em disco dos uploads do importador (_private/importador_staging/)
+IMPORTADOR_STAGING_TTL_HOURS = 24
+
+# Importações (TXT de contribuições e planilhas de cadastros) rodam no worker
+# `manage.py processar_importacoes`. Com False, executam na própria requisição.
+IMPORTACOES_EM_SEGUNDO_PLANO = True
+
+# Importação em lote de contribuições: nº máximo de processos de leitura/conciliação
+# (None = quantidade de CPUs).
+IMPORTADOR_LOTE_PROCESSOS = None
+
+# Localidade dos feriados estaduais/municipais (cadastro Feriado) usados no
+# calendário de dias úteis; vazio = só os nacionais e os sem UF.
+CALENDARIO_UF = ""
+CALENDARIO_MUNICIPIO = ""